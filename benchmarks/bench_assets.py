@@ -0,0 +1,49 @@
+"""
+Benchmark: peak memory of inline versus extracted data: URI images.
+
+Quill pastes images as base64 data: URIs, so image-heavy documents are
+mostly encoded image bytes. Inline, every image is copied into the Typst
+output; with an AssetStore each distinct image is decoded, written to the
+asset directory once and replaced by a short path. The input document is
+allocated before tracing starts, so peaks cover the translation only.
+"""
+
+import sys
+import os
+import tempfile
+import time
+import tracemalloc
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html2typst import translate_html_to_typst, AssetStore
+from corpus import generate_document
+
+
+def measure(html: str, **kwargs):
+    """Return (seconds, peak traced bytes, output characters) of one translation."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = translate_html_to_typst(html, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(result)
+
+
+def main():
+    """Print time, peak memory and output size with and without extraction."""
+    print(f"{'input MB':>9} {'mode':>8} {'ms':>9} {'peak MB':>9} {'output KB':>10}")
+    for size in (1 << 20, 8 << 20, 32 << 20):
+        html = generate_document('base64_images', size)
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode, kwargs in (('inline', {}), ('assets', {'assets': AssetStore(tmp)})):
+                elapsed, peak, length = measure(html, **kwargs)
+                print(f"{len(html) / 1e6:>9.1f} {mode:>8} {elapsed * 1000:>9.1f} "
+                      f"{peak / 1e6:>9.2f} {length / 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
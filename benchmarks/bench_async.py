@@ -0,0 +1,66 @@
+"""
+Benchmark: event-loop responsiveness while large documents are translated.
+
+A ticker coroutine measures how late it wakes up while a stream of large
+documents is converted, first by calling translate_html_to_typst directly on
+the loop and then through AsyncTranslator with a process pool.
+"""
+
+import sys
+import os
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from html2typst import translate_html_to_typst, AsyncTranslator
+
+
+LARGE_DOCUMENT = '<p>' + '<span style="color: red;">styled</span> <em>run</em> ' * 20000 + '</p>'
+
+
+def percentile(values, fraction):
+    """Return the given percentile of a list of numbers."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def measure(convert, documents: int = 8):
+    """Return ticker lateness samples (ms) while converting documents."""
+    lateness = []
+    done = asyncio.Event()
+    
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lateness.append((time.perf_counter() - start - 0.001) * 1000)
+    
+    task = asyncio.ensure_future(ticker())
+    for _ in range(documents):
+        await convert(LARGE_DOCUMENT)
+        await asyncio.sleep(0.002)  # Let the ticker observe the stall
+    done.set()
+    await task
+    return lateness
+
+
+async def blocking(html):
+    """Translate directly on the event loop."""
+    return translate_html_to_typst(html)
+
+
+def main():
+    """Print ticker lateness percentiles for blocking and offloaded translation."""
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        translator = AsyncTranslator(executor=executor, max_concurrency=2)
+        for name, convert in (('blocking', blocking), ('offloaded', translator.translate)):
+            lateness = asyncio.run(measure(convert))
+            print(f"{name:>10}: p50 {percentile(lateness, 0.5):7.2f} ms   "
+                  f"p99 {percentile(lateness, 0.99):7.2f} ms   max {max(lateness):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark: batch translation throughput with translate_many().
+
+Translates the same synthetic corpus with an increasing number of worker
+processes and reports documents per second and the speedup over a single
+in-process worker.
+"""
+
+import sys
+import os
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from html2typst import translate_many
+
+
+def build_document(index: int) -> str:
+    """Build a medium-sized Quill-style document."""
+    parts = [f'<h2>Section {index}</h2>']
+    for i in range(40):
+        parts.append(
+            f'<p class="ql-align-justify">Paragraph {i} with <strong>bold</strong>, '
+            f'<em>italic</em> and <span style="color: rgb(230, 0, 0);">colored</span> '
+            f'text, plus a <a href="https://example.com/{i}">link</a>.</p>'
+        )
+    parts.append('<ul>' + ''.join(
+        f'<li class="ql-indent-{i % 3}">Item {i}</li>' for i in range(20)) + '</ul>')
+    return ''.join(parts)
+
+
+def main():
+    """Print throughput for several worker counts."""
+    documents = [build_document(i) for i in range(400)]
+    cpus = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>9} {'docs/s':>9} {'speedup':>8}")
+    for workers in counts:
+        start = time.perf_counter()
+        for _ in translate_many(documents, workers=workers, chunksize=16):
+            pass
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline = elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {len(documents) / elapsed:>9.1f} "
+              f"{baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: Quill Delta input translated directly versus via HTML.
+
+Builds the same document as Delta ops and as the HTML Quill renders for it,
+then compares translate_delta_to_typst() with translate_html_to_typst().
+"""
+
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html2typst import translate_html_to_typst, translate_delta_to_typst
+from corpus import best_time
+
+
+def document(paragraphs: int):
+    """Return (ops, html) for a Quill document with mixed formatting."""
+    ops = []
+    html = []
+    for i in range(paragraphs):
+        ops += [
+            {'insert': f'Paragraph {i} with '},
+            {'insert': 'bold', 'attributes': {'bold': True}},
+            {'insert': ', '},
+            {'insert': 'italic', 'attributes': {'italic': True}},
+            {'insert': ' and '},
+            {'insert': 'red', 'attributes': {'color': 'rgb(230, 0, 0)'}},
+            {'insert': ' text.'},
+            {'insert': '\n', 'attributes': {'align': 'justify'}},
+        ]
+        html.append(f'<p class="ql-align-justify">Paragraph {i} with <strong>bold</strong>, '
+                    f'<em>italic</em> and <span style="color: rgb(230, 0, 0);">red</span> text.</p>')
+    return ops, ''.join(html)
+
+
+def main():
+    """Print translation time of both input paths."""
+    print(f"{'paragraphs':>10} {'html ms':>9} {'delta ms':>9} {'speedup':>8}")
+    for paragraphs in (100, 1000, 10000):
+        ops, html = document(paragraphs)
+        assert translate_delta_to_typst(ops) == translate_html_to_typst(html)
+        
+        via_html = best_time(lambda: translate_html_to_typst(html))
+        direct = best_time(lambda: translate_delta_to_typst(ops))
+        
+        print(f"{paragraphs:>10} {via_html * 1000:>9.2f} {direct * 1000:>9.2f} "
+              f"{via_html / direct:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Benchmark: parse once, render twice.
+
+Getting both the production and the debug Typst of a document used to take
+two full translations, each tokenizing the HTML. parse_document() tokenizes
+once into a ParsedDocument, and render_typst() replays its events for each
+output. This prints, per corpus shape, the time of two full translations
+against one parse plus a production and a debug render, and the share of
+the time saved.
+"""
+
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html2typst import translate_html_to_typst, parse_document, render_typst
+from corpus import SHAPES, generate_document, best_time
+
+
+def main():
+    """Print two translations against parse + two renders, per shape."""
+    size = 256 * 1024
+    print(f"{'shape':>16} {'events':>8} {'2 x translate':>14} {'parse':>8} "
+          f"{'2 x render':>11} {'total':>8} {'saved':>6}")
+    for shape in SHAPES:
+        html = generate_document(shape, size)
+        document = parse_document(html)
+        assert render_typst(document, debug=True) == translate_html_to_typst(html, debug=True)
+        twice = best_time(lambda: (translate_html_to_typst(html),
+                                   translate_html_to_typst(html, debug=True)))
+        parse = best_time(lambda: parse_document(html))
+        render = best_time(lambda: (render_typst(document), render_typst(document, debug=True)))
+        total = parse + render
+        print(f"{shape:>16} {len(document):>8} {twice * 1000:>14.1f} {parse * 1000:>8.1f} "
+              f"{render * 1000:>11.1f} {total * 1000:>8.1f} {1 - total / twice:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
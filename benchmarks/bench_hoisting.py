@@ -0,0 +1,67 @@
+"""
+Benchmark: output size and compile time with hoisted styles.
+
+hoist_styles=True translates in two passes: the first counts how the text
+is styled, the second renders runs without the font and size a preamble
+sets for the whole document, and with #let shorthands for repeated wrapper
+combinations. This prints, per corpus shape, the output size and the
+translation time of both modes. If the typst package is installed, it also
+compiles both outputs to PDF and prints the compile times, or '-' for
+documents typst rejects.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html2typst import translate_html_to_typst
+from corpus import generate_document, best_time
+
+try:
+    import typst
+except ImportError:
+    typst = None
+
+SHAPES = ('pasted_word', 'heavy_styles', 'tiny_spans', 'mixed')
+
+
+def compile_time(source: str, directory: str) -> str:
+    """Return the best time typst takes to compile source to PDF, formatted in ms."""
+    path = os.path.join(directory, 'document.typ')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    try:
+        return f'{best_time(lambda: typst.compile(path)) * 1000:.1f}'
+    except typst.TypstError:
+        return '-'
+
+
+def main():
+    """Print output size, translation time and compile time per shape, regular vs hoisted."""
+    size = 256 * 1024
+    columns = f"{'shape':>14} {'out KB':>8} {'hoisted':>8} {'saved':>6} {'ms':>8} {'hoisted':>8}"
+    if typst is not None:
+        columns += f" {'compile ms':>11} {'hoisted':>8}"
+    print(columns)
+    with tempfile.TemporaryDirectory() as tmp:
+        for shape in SHAPES:
+            html = generate_document(shape, size)
+            regular = translate_html_to_typst(html)
+            hoisted = translate_html_to_typst(html, hoist_styles=True)
+            regular_ms = best_time(lambda: translate_html_to_typst(html)) * 1000
+            hoisted_ms = best_time(lambda: translate_html_to_typst(html, hoist_styles=True)) * 1000
+            regular_kb = len(regular.encode('utf-8')) / 1024
+            hoisted_kb = len(hoisted.encode('utf-8')) / 1024
+            row = (f"{shape:>14} {regular_kb:>8.1f} {hoisted_kb:>8.1f} "
+                   f"{1 - hoisted_kb / regular_kb:>6.1%} {regular_ms:>8.1f} {hoisted_ms:>8.1f}")
+            if typst is not None:
+                row += f" {compile_time(regular, tmp):>11} {compile_time(hoisted, tmp):>8}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
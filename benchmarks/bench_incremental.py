@@ -0,0 +1,56 @@
+"""
+Benchmark: keystroke latency of IncrementalTranslator in a live preview.
+
+Simulates typing into one paragraph of documents of growing length and
+compares the per-keystroke time of a full translate_html_to_typst run with
+IncrementalTranslator.update().
+"""
+
+import sys
+import os
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from html2typst import translate_html_to_typst, IncrementalTranslator
+
+
+def paragraph(index: int, extra: str = '') -> str:
+    """Return one Quill-style paragraph."""
+    return (f'<p class="ql-align-justify">Paragraph {index} with <strong>bold</strong>, '
+            f'<em>italic</em> and <span style="color: rgb(230, 0, 0);">red</span> text{extra}.</p>')
+
+
+def keystrokes(paragraphs: int, count: int = 50):
+    """Yield successive versions of a document while typing into its middle."""
+    middle = paragraphs // 2
+    before = ''.join(paragraph(i) for i in range(middle))
+    after = ''.join(paragraph(i) for i in range(middle + 1, paragraphs))
+    for typed in range(count):
+        yield before + paragraph(middle, ' ' + 'x' * typed) + after
+
+
+def main():
+    """Print mean keystroke latency for full and incremental translation."""
+    print(f"{'paragraphs':>10} {'full ms':>9} {'incremental ms':>15}")
+    for paragraphs in (50, 100, 250, 500, 1000):
+        versions = list(keystrokes(paragraphs))
+        
+        start = time.perf_counter()
+        for html in versions:
+            translate_html_to_typst(html)
+        full = (time.perf_counter() - start) / len(versions)
+        
+        preview = IncrementalTranslator()
+        preview.update(versions[0])
+        start = time.perf_counter()
+        for html in versions[1:]:
+            preview.update(html)
+        incremental = (time.perf_counter() - start) / (len(versions) - 1)
+        
+        print(f"{paragraphs:>10} {full * 1000:>9.2f} {incremental * 1000:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark: translation cost per text node as nesting depth grows.
+
+Each document holds a fixed number of text runs inside ``depth`` levels of
+nested wrapper elements. With O(1) formatting lookups the time per text node
+should stay roughly flat as the depth increases.
+"""
+
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html2typst import translate_html_to_typst
+from corpus import best_time
+
+
+WRAPPERS = ['div', 'u', 'span style="color: red;"', 's', 'strong']
+
+
+def build_document(depth: int, runs: int = 2000) -> str:
+    """Build a paragraph with ``runs`` text nodes nested ``depth`` levels deep."""
+    opening = []
+    closing = []
+    for level in range(depth):
+        wrapper = WRAPPERS[level % len(WRAPPERS)]
+        opening.append(f'<{wrapper}>')
+        closing.append(f'</{wrapper.split()[0]}>')
+    body = ''.join(f'<em>run {i}</em> ' for i in range(runs))
+    return '<p>' + ''.join(opening) + body + ''.join(reversed(closing)) + '</p>'
+
+
+def main():
+    """Print time per text node for increasing nesting depths."""
+    runs = 2000
+    print(f"{'depth':>6} {'total ms':>10} {'us/text node':>14}")
+    for depth in (1, 4, 16, 64, 256):
+        html = build_document(depth, runs)
+        elapsed = best_time(lambda: translate_html_to_typst(html))
+        # Each run contributes the <em> text and the separating space
+        per_node = elapsed / (runs * 2) * 1e6
+        print(f"{depth:>6} {elapsed * 1000:>10.2f} {per_node:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark: re-rendering stored documents without tokenizing them.
+
+A document saved with save_document() after parse_document() loads back
+with load_document() by memory-mapping the file and copying its arrays
+and string tables out, so re-rendering it after the rendering rules change
+skips HTMLParser entirely. This prints, per corpus shape, the HTML and
+serialized sizes, the time of a full translate_html_to_typst(), and the
+time of load_document() plus render_typst().
+"""
+
+import sys
+import os
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html2typst import (translate_html_to_typst, parse_document, render_typst,
+                        save_document, load_document)
+from corpus import SHAPES, generate_document, best_time
+
+
+def main():
+    """Print a full translation against load + render, per shape."""
+    size = 1024 * 1024
+    print(f"{'shape':>16} {'html KB':>8} {'saved KB':>9} {'translate':>10} "
+          f"{'load':>7} {'render':>8} {'total':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'document.h2td')
+        for shape in SHAPES:
+            html = generate_document(shape, size)
+            save_document(parse_document(html), path)
+            document = load_document(path)
+            assert render_typst(document) == translate_html_to_typst(html)
+            translate = best_time(lambda: translate_html_to_typst(html))
+            load = best_time(lambda: load_document(path))
+            render = best_time(lambda: render_typst(document))
+            total = load + render
+            print(f"{shape:>16} {len(html.encode('utf-8')) / 1024:>8.1f} "
+                  f"{os.path.getsize(path) / 1024:>9.1f} {translate * 1000:>10.1f} "
+                  f"{load * 1000:>7.1f} {render * 1000:>8.1f} {total * 1000:>8.1f} "
+                  f"{translate / total:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
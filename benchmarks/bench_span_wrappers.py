@@ -0,0 +1,55 @@
+"""
+Benchmark: output bytes per styled run.
+
+Each run is a span around one short word, between plain words so that
+runs are not coalesced. The bytes beyond those of the same paragraph
+without spans are the markup the styles cost. Color, size and font share
+a single #text() call, and nested spans render their text with one set
+of merged wrappers, so markup per run should stay close to one wrapper's
+worth however many properties or levels of nesting carry the style.
+"""
+
+import sys
+import os
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from html2typst import translate_html_to_typst
+
+
+STYLES = (
+    ('color', '<span style="color: red;">{}</span>'),
+    ('color_size', '<span style="color: red; font-size: 14pt;">{}</span>'),
+    ('color_size_font', '<span class="ql-size-large ql-font-serif" style="color: red;">{}</span>'),
+    ('with_highlight', '<span style="color: red; background-color: yellow; font-size: 14pt;">{}</span>'),
+    ('nested_2', '<span style="color: red;"><span style="font-size: 14pt;">{}</span></span>'),
+    ('nested_3', '<span style="color: red;"><span class="ql-size-large">'
+                 '<span class="ql-font-serif">{}</span></span></span>'),
+)
+
+
+def styled_runs(template: str, count: int) -> str:
+    """A paragraph of count styled runs, each followed by a plain word."""
+    return '<p>' + ''.join(template.format(f'word{i % 10}') + ' and ' for i in range(count)) + '</p>'
+
+
+def main():
+    """Print output bytes and markup bytes per run, and time per run, for each style."""
+    count = 10000
+    plain = len(translate_html_to_typst(styled_runs('{}', count)).encode('utf-8'))
+    print(f"{'style':>16} {'runs':>7} {'out KB':>8} {'B/run':>7} {'markup B/run':>13} {'us/run':>7}")
+    for name, template in STYLES:
+        html = styled_runs(template, count)
+        start = time.perf_counter()
+        result = translate_html_to_typst(html)
+        elapsed = time.perf_counter() - start
+        size = len(result.encode('utf-8'))
+        markup = size - plain
+        print(f"{name:>16} {count:>7} {size / 1024:>8.1f} {size / count:>7.1f} "
+              f"{markup / count:>13.1f} {elapsed / count * 1e6:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: cold versus warm conversion with the persistent TranslationStore.
+
+Converts a synthetic corpus (10,000 documents by default) three times:
+without a cache, into an empty store (cold), and again from a freshly
+opened store on the same file, as a restarted worker would (warm).
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from html2typst import translate_html_to_typst, TranslationStore
+
+
+def build_document(index: int) -> str:
+    """Build a small Quill-style document."""
+    return ''.join(
+        f'<p>Document {index}, paragraph {i}: <strong>bold</strong> and '
+        f'<span style="color: rgb(230, 0, 0);">red</span> text.</p>'
+        for i in range(8)
+    )
+
+
+def run(documents, cache=None) -> float:
+    """Translate every document and return the elapsed seconds."""
+    start = time.perf_counter()
+    for html in documents:
+        translate_html_to_typst(html, cache=cache)
+    return time.perf_counter() - start
+
+
+def main():
+    """Print timings for uncached, cold-store and warm-store runs."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    documents = [build_document(i) for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'translations.db')
+        uncached = run(documents)
+        store = TranslationStore(path)
+        cold = run(documents, store)
+        store.close()
+        store = TranslationStore(path)
+        warm = run(documents, store)
+        stats = store.stats()
+        store.close()
+    
+    print(f"documents: {count}   stored: {stats['entries']}   hits: {stats['hits']}")
+    for name, elapsed in (('uncached', uncached), ('cold', cold), ('warm', warm)):
+        print(f"{name:>9}: {elapsed:7.2f} s   {count / elapsed:9.0f} docs/s")
+    print(f"warm speedup over uncached: {uncached / warm:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
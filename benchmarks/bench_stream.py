@@ -0,0 +1,64 @@
+"""
+Benchmark: peak memory of one-shot versus streaming translation.
+
+Translates a large synthetic document held in a file, once by reading it
+whole and calling translate_html_to_typst, once by feeding 64 KB chunks to
+translate_stream and writing the pieces out as they arrive.
+"""
+
+import sys
+import os
+import tempfile
+import time
+import tracemalloc
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from html2typst import translate_html_to_typst, translate_stream
+
+
+def write_document(path: str, paragraphs: int = 30000):
+    """Write a large Quill-style document to ``path``."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(paragraphs):
+            f.write(f'<p>Paragraph {i} with <strong>bold</strong> and '
+                    f'<span style="color: red;">red</span> text.</p>')
+
+
+def one_shot(source: str, target: str):
+    """Read, translate and write the whole document at once."""
+    with open(source, encoding='utf-8') as f:
+        html = f.read()
+    with open(target, 'w', encoding='utf-8') as f:
+        f.write(translate_html_to_typst(html))
+
+
+def streamed(source: str, target: str):
+    """Translate the document chunk by chunk."""
+    with open(source, encoding='utf-8') as f, open(target, 'w', encoding='utf-8') as out:
+        chunks = iter(lambda: f.read(65536), '')
+        for piece in translate_stream(chunks):
+            out.write(piece)
+
+
+def main():
+    """Print time and peak traced memory for both approaches."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'input.html')
+        write_document(source)
+        size_mb = os.path.getsize(source) / 1e6
+        print(f"input: {size_mb:.1f} MB")
+        for name, run in (('one-shot', one_shot), ('streamed', streamed)):
+            target = os.path.join(tmp, f'{name}.typ')
+            tracemalloc.start()
+            start = time.perf_counter()
+            run(source, target)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:>9}: {elapsed:6.2f} s   peak {peak / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: Quill subset tokenizer versus html.parser.HTMLParser.
+
+Times tokenization alone (events delivered to HTMLParser's no-op handlers)
+and the full translation with tokenizer='html.parser' and tokenizer='quill'
+on typical Quill documents.
+"""
+
+import sys
+import os
+from html.parser import HTMLParser
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html2typst import translate_html_to_typst, feed_quill_subset
+from corpus import best_time
+
+
+def quill_document(paragraphs: int) -> str:
+    """Return a Quill-style document with mixed formatting."""
+    parts = []
+    for i in range(paragraphs):
+        parts.append(
+            f'<p class="ql-align-justify">Paragraph {i} with <strong>bold</strong>, '
+            f'<em>italic</em>, <a href="https://example.com/?a=1&amp;b={i}">a link</a> and '
+            f'<span class="ql-size-large" style="color: rgb(230, 0, 0);">red &amp; large</span> text.</p>'
+        )
+        if i % 10 == 9:
+            parts.append('<ol><li>First</li><li class="ql-indent-1">Nested <u>item</u></li></ol><p><br></p>')
+    return ''.join(parts)
+
+
+def tokenize_html_parser(html: str):
+    """Tokenize with HTMLParser, discarding the events."""
+    parser = HTMLParser()
+    parser.feed(html)
+    parser.close()
+
+
+def tokenize_quill(html: str):
+    """Tokenize with the Quill subset tokenizer, discarding the events."""
+    assert feed_quill_subset(HTMLParser(), html)
+
+
+def main():
+    """Print tokenization and translation times for both tokenizers."""
+    print(f"{'paragraphs':>10} {'stage':>10} {'html.parser ms':>15} {'quill ms':>9} {'speedup':>8}")
+    for paragraphs in (100, 1000, 10000):
+        html = quill_document(paragraphs)
+        assert translate_html_to_typst(html, tokenizer='quill') == translate_html_to_typst(html)
+        
+        stages = (
+            ('tokenize', lambda: tokenize_html_parser(html), lambda: tokenize_quill(html)),
+            ('translate', lambda: translate_html_to_typst(html),
+             lambda: translate_html_to_typst(html, tokenizer='quill')),
+        )
+        for stage, baseline, fast in stages:
+            slow_time = best_time(baseline)
+            fast_time = best_time(fast)
+            print(f"{paragraphs:>10} {stage:>10} {slow_time * 1000:>15.2f} {fast_time * 1000:>9.2f} "
+                  f"{slow_time / fast_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
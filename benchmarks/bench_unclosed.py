@@ -0,0 +1,58 @@
+"""
+Benchmark: end-tag handling on malformed input as documents grow.
+
+Pasted HTML often leaves <span>, <font> and <li> elements unclosed and
+carries end tags that match nothing. Each shape below piles up open
+elements and then closes, or fails to close, against them. With O(1)
+end-tag matching the time per tag should stay roughly flat as the number
+of elements grows.
+"""
+
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html2typst import translate_html_to_typst
+from corpus import best_time
+
+
+def stray_end_tags(count: int) -> str:
+    """Unclosed spans, each followed by an end tag that matches nothing."""
+    return '<p>' + ''.join(f'<span style="color: red;">w{i} </em>' for i in range(count)) + '</p>'
+
+
+def buried_elements(count: int) -> str:
+    """Open divs under a pile of unclosed fonts, then close the divs."""
+    return ('<div>' * count + ''.join(f'<font>w{i} ' for i in range(count))
+            + '</div>' * count)
+
+
+def unclosed_list_items(count: int) -> str:
+    """List items left open, each with a misnested span and a stray close."""
+    items = ''.join(f'<li><span>item {i}</li></span></li>' for i in range(count))
+    return '<ul>' + items + '</ul><p>after</p>'
+
+
+SHAPES = (
+    ('stray_end_tags', stray_end_tags),
+    ('buried_elements', buried_elements),
+    ('unclosed_list_items', unclosed_list_items),
+)
+
+
+def main():
+    """Print time per tag for each shape at increasing element counts."""
+    print(f"{'shape':>20} {'elements':>9} {'total ms':>10} {'us/tag':>8}")
+    for name, build in SHAPES:
+        for count in (1000, 4000, 16000):
+            html = build(count)
+            elapsed = best_time(lambda: translate_html_to_typst(html))
+            tags = html.count('<')
+            print(f"{name:>20} {count:>9} {elapsed * 1000:>10.2f} {elapsed / tags * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Deterministic generators for synthetic Quill documents.
+
+Every shape stresses a different part of the translator. The same
+(shape, size, seed) always yields the same document, so results from
+different runs and machines are comparable.
+
+    >>> from corpus import generate_document
+    >>> html = generate_document('indent_lists', 64 * 1024)
+
+best_time() is the timing helper the benchmarks share.
+"""
+
+import base64
+import random
+import time
+from typing import Callable, Dict, List
+
+
+WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit',
+         'sed', 'do', 'eiusmod', 'tempor', 'incididunt', 'labore', 'et', 'dolore',
+         'magna', 'aliqua', 'café', 'naïve', 'a*b', 'snake_case', '#tag', '$5',
+         'AT&amp;T', '1 &lt; 2', '(note)', 'end.')
+COLORS = ('rgb(230, 0, 0)', 'rgb(0, 138, 0)', '#06c', 'orange', 'rgb(153, 51, 255)')
+SIZES = ('small', 'large', 'huge')
+FONTS = ('serif', 'monospace')
+ALIGNS = ('center', 'right', 'justify')
+
+_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 * 1024}
+
+
+def parse_size(text: str) -> int:
+    """Parse a size such as '64KB' or '50MB' into bytes."""
+    text = text.strip().upper()
+    for unit in ('MB', 'KB', 'B'):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * _UNITS[unit])
+    return int(text)
+
+
+def format_size(size: int) -> str:
+    """Format a byte count the way parse_size reads it."""
+    for unit in ('MB', 'KB'):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f'{size // _UNITS[unit]}{unit}'
+    return f'{size}B'
+
+
+def best_time(function, repeat: int = 5) -> float:
+    """Return the best wall-clock time of ``repeat`` calls of function."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def _tiny_spans(rng: random.Random, budget: int) -> str:
+    """A paragraph made of many one- or two-word formatted runs."""
+    runs = []
+    for _ in range(min(rng.randint(20, 40), budget // 25 + 1)):
+        text = _words(rng, rng.randint(1, 2))
+        kind = rng.randrange(5)
+        if kind == 0:
+            runs.append(f'<strong>{text}</strong>')
+        elif kind == 1:
+            runs.append(f'<em>{text}</em>')
+        elif kind == 2:
+            runs.append(f'<span style="color: {rng.choice(COLORS)};">{text}</span>')
+        elif kind == 3:
+            runs.append(f'<u>{text}</u>')
+        else:
+            runs.append(text)
+        runs.append(' ')
+    return f'<p>{"".join(runs)}</p>'
+
+
+def _indent_lists(rng: random.Random, budget: int) -> str:
+    """A long ordered or bullet list with nested ql-indent levels."""
+    tag = rng.choice(('ol', 'ul'))
+    items = []
+    level = 0
+    for _ in range(min(rng.randint(100, 200), budget // 50 + 1)):
+        level = max(0, min(8, level + rng.choice((-1, 0, 0, 1))))
+        attr = f' class="ql-indent-{level}"' if level else ''
+        items.append(f'<li{attr}>{_words(rng, rng.randint(3, 10))}</li>')
+    return f'<{tag}>{"".join(items)}</{tag}>'
+
+
+def _large_pre(rng: random.Random, budget: int) -> str:
+    """A large code block with escaped markup characters."""
+    lines = []
+    for i in range(min(rng.randint(500, 1500), budget // 80 + 1)):
+        indent = '    ' * rng.randint(0, 3)
+        lines.append(f'{indent}value_{i} = compute(a &lt; b &amp;&amp; c &gt; d)  # {_words(rng, 3)}')
+    return f'<pre class="ql-syntax" spellcheck="false">{chr(10).join(lines)}\n</pre>'
+
+
+def _deep_nesting(rng: random.Random, budget: int) -> str:
+    """A paragraph of inline elements nested a few hundred levels deep."""
+    tags = ('strong', 'em', 'span', 'u', 's', 'sup', 'sub', 'a')
+    depth = min(rng.randint(100, 300), budget // 20 + 1)
+    opened = [rng.choice(tags) for _ in range(depth)]
+    parts = ['<p>']
+    for tag in opened:
+        attr = ' href="https://example.com"' if tag == 'a' else ''
+        parts.append(f'<{tag}{attr}>{rng.choice(WORDS)} ')
+    parts.append(_words(rng, 5))
+    parts.extend(f'</{tag}>' for tag in reversed(opened))
+    parts.append('</p>')
+    return ''.join(parts)
+
+
+def _heavy_styles(rng: random.Random, budget: int) -> str:
+    """A paragraph whose runs carry several classes and inline styles each."""
+    runs = []
+    for _ in range(min(rng.randint(5, 15), budget // 250 + 1)):
+        style = (f'color: {rng.choice(COLORS)}; background-color: {rng.choice(COLORS)}; '
+                 f'font-size: {rng.randint(10, 24)}px; font-family: "Georgia", serif; '
+                 f'font-weight: {rng.choice(("bold", "400"))}; font-style: italic; '
+                 f'text-decoration: underline;')
+        classes = f'ql-size-{rng.choice(SIZES)} ql-font-{rng.choice(FONTS)}'
+        runs.append(f'<span class="{classes}" style="{style}">{_words(rng, rng.randint(2, 6))}</span> ')
+    align = rng.choice(ALIGNS)
+    return f'<p class="ql-align-{align} ql-indent-{rng.randint(1, 3)}">{"".join(runs)}</p>'
+
+
+def _base64_images(rng: random.Random, budget: int) -> str:
+    """A paragraph followed by an inline base64 image, as Quill pastes them."""
+    length = min(rng.randint(2048, 49152), budget * 3 // 4 + 1)
+    payload = base64.b64encode(rng.randbytes(length)).decode('ascii')
+    return (f'<p>{_words(rng, rng.randint(10, 30))}</p>'
+            f'<p><img src="data:image/png;base64,{payload}"></p>')
+
+
+def _fragmented_runs(rng: random.Random, budget: int) -> str:
+    """A paragraph whose formatting is split into many adjacent identical elements."""
+    runs = []
+    for _ in range(min(rng.randint(10, 20), budget // 80 + 1)):
+        word = rng.choice(WORDS)
+        cut = rng.randint(1, max(1, len(word) - 1))
+        kind = rng.randrange(3)
+        if kind == 0:
+            runs.append(f'<strong>{word[:cut]}</strong><strong>{word[cut:]}</strong>')
+        elif kind == 1:
+            runs.append(f'<em>{_words(rng, 2)}</em> <em>{_words(rng, 2)}</em>')
+        else:
+            color = rng.choice(COLORS)
+            runs.append(''.join(f'<span style="color: {color};">{rng.choice(WORDS)} </span>'
+                                for _ in range(rng.randint(2, 4))))
+    return f'<p>{" ".join(runs)}</p>'
+
+
+def _pasted_word(rng: random.Random, budget: int) -> str:
+    """A paragraph pasted from a word processor: every run repeats the same font and size."""
+    base = 'font-family: Calibri; font-size: 11pt;'
+    runs = []
+    for _ in range(min(rng.randint(3, 8), budget // 120 + 1)):
+        style = base
+        if rng.random() < 0.3:
+            style += f' color: {rng.choice(COLORS[:2])};'
+        run = f'<span style="{style}">{_words(rng, rng.randint(3, 12))}</span>'
+        runs.append(f'<strong>{run}</strong>' if rng.random() < 0.15 else run)
+    return f'<p>{" ".join(runs)}</p>'
+
+
+def _mixed(rng: random.Random, budget: int) -> str:
+    """A realistic blend of headings, paragraphs, lists, quotes and code."""
+    kind = rng.randrange(10)
+    if kind == 0:
+        level = rng.randint(1, 3)
+        return f'<h{level}>{_words(rng, 4)}</h{level}>'
+    if kind == 1:
+        return _indent_lists(rng, 400)
+    if kind == 2:
+        return f'<blockquote>{_words(rng, 20)}</blockquote>'
+    if kind == 3:
+        return f'<pre class="ql-syntax" spellcheck="false">{_words(rng, 30)}\n</pre>'
+    if kind == 4:
+        return '<p><br></p>'
+    return _tiny_spans(rng, budget)
+
+
+SHAPES: Dict[str, Callable[[random.Random, int], str]] = {
+    'tiny_spans': _tiny_spans,
+    'indent_lists': _indent_lists,
+    'large_pre': _large_pre,
+    'deep_nesting': _deep_nesting,
+    'heavy_styles': _heavy_styles,
+    'base64_images': _base64_images,
+    'fragmented_runs': _fragmented_runs,
+    'pasted_word': _pasted_word,
+    'mixed': _mixed,
+}
+
+
+def generate_document(shape: str, size: int, seed: int = 0) -> str:
+    """
+    Return a document of the given shape of at least ``size`` UTF-8 bytes.
+
+    Blocks are appended until the size is reached; each block is told how
+    many bytes remain, so large blocks shrink to fit small documents.
+    """
+    block = SHAPES[shape]
+    rng = random.Random(f'{shape}:{size}:{seed}')
+    parts: List[str] = []
+    total = 0
+    while total < size:
+        part = block(rng, size - total)
+        parts.append(part)
+        total += len(part.encode('utf-8'))
+    return ''.join(parts)
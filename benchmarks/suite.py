@@ -0,0 +1,232 @@
+"""
+Benchmark suite: throughput, latency and memory on synthetic Quill corpora.
+
+Runs translate_html_to_typst over every (shape, size) pair from corpus.py and
+records documents/s, MB/s, per-call latency percentiles and peak traced
+memory. Results are saved as JSON; compare mode flags regressions against a
+saved baseline and exits non-zero so it can gate a release.
+
+    python benchmarks/suite.py run -o baseline.json
+    python benchmarks/suite.py run -o current.json --baseline baseline.json
+    python benchmarks/suite.py compare baseline.json current.json --threshold 0.15
+
+Comparing a --hoist-styles run against a regular one shows what the style
+preamble saves in output size and what its first pass costs in time.
+"""
+
+import sys
+import os
+import argparse
+import datetime
+import json
+import platform
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from html2typst import translate_html_to_typst, TOKENIZERS, __version__
+from corpus import SHAPES, generate_document, parse_size, format_size
+
+DEFAULT_SIZES = '1KB,64KB,1MB'
+FULL_SIZES = '1KB,64KB,1MB,10MB,50MB'
+MB = 1024 * 1024
+
+# Metrics compared against a baseline, and whether larger values are better
+COMPARED_METRICS = (
+    ('mb_per_s', True),
+    ('p99_ms', False),
+    ('peak_mb', False),
+    ('output_bytes', False),
+)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of an ascending list."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(html: str, debug: bool, tokenizer: str, seconds: float,
+            min_calls: int, max_calls: int, hoist_styles: bool = False) -> Dict[str, Any]:
+    """Time repeated translations of one document and trace one more for memory."""
+    options = {'debug': debug, 'tokenizer': tokenizer, 'hoist_styles': hoist_styles}
+    start = time.perf_counter()
+    output = translate_html_to_typst(html, **options)
+    warmup = time.perf_counter() - start
+    calls = max(min_calls, min(max_calls, int(seconds / max(warmup, 1e-9))))
+
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        translate_html_to_typst(html, **options)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    total = sum(latencies)
+
+    tracemalloc.start()
+    translate_html_to_typst(html, **options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = len(html.encode('utf-8'))
+    return {
+        'bytes': size,
+        'output_bytes': len(output.encode('utf-8')),
+        'calls': calls,
+        'docs_per_s': calls / total,
+        'mb_per_s': size * calls / total / MB,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p90_ms': percentile(latencies, 0.90) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_mb': peak / MB,
+    }
+
+
+def run_suite(shapes: List[str], sizes: List[int], debug: bool = False,
+              tokenizer: str = 'html.parser', seconds: float = 1.0,
+              min_calls: int = 3, max_calls: int = 1000, seed: int = 0,
+              hoist_styles: bool = False) -> Dict[str, Any]:
+    """Measure every (shape, size) pair and return the JSON-ready report."""
+    results = []
+    for size in sizes:
+        for shape in shapes:
+            html = generate_document(shape, size, seed)
+            result = {'shape': shape, 'size': format_size(size)}
+            result.update(measure(html, debug, tokenizer, seconds, min_calls, max_calls, hoist_styles))
+            results.append(result)
+            print_result(result)
+    return {
+        'meta': {
+            'version': __version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'debug': debug,
+            'tokenizer': tokenizer,
+            'hoist_styles': hoist_styles,
+            'seed': seed,
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+
+
+def print_header():
+    """Print the column headings used by print_result."""
+    print(f"{'shape':>14} {'size':>6} {'docs/s':>10} {'MB/s':>7} {'p50 ms':>9} "
+          f"{'p90 ms':>9} {'p99 ms':>9} {'peak MB':>8} {'out KB':>9}")
+
+
+def print_result(result: Dict[str, Any]):
+    """Print one measurement as a table row."""
+    print(f"{result['shape']:>14} {result['size']:>6} {result['docs_per_s']:>10.1f} "
+          f"{result['mb_per_s']:>7.2f} {result['p50_ms']:>9.3f} {result['p90_ms']:>9.3f} "
+          f"{result['p99_ms']:>9.3f} {result['peak_mb']:>8.2f} {result['output_bytes'] / 1024:>9.1f}")
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Return a description of every metric that regressed beyond threshold.
+
+    threshold is relative: 0.10 flags throughput more than 10% lower, or
+    latency and memory more than 10% higher, than the baseline.
+    """
+    previous = {(r['shape'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"{'shape':>14} {'size':>6} {'metric':>12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in current['results']:
+        old = previous.get((result['shape'], result['size']))
+        if old is None:
+            print(f"{result['shape']:>14} {result['size']:>6}   (not in baseline)")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            if metric not in old:
+                continue
+            change = (result[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            worse = -change if higher_is_better else change
+            flag = '  REGRESSION' if worse > threshold else ''
+            print(f"{result['shape']:>14} {result['size']:>6} {metric:>12} {old[metric]:>10.3f} "
+                  f"{result[metric]:>10.3f} {change:>+7.1%}{flag}")
+            if flag:
+                regressions.append(f"{result['shape']} {result['size']} {metric}: "
+                                   f"{old[metric]:.3f} -> {result[metric]:.3f} ({change:+.1%})")
+    return regressions
+
+
+def load(path: str) -> Dict[str, Any]:
+    """Read a saved report."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def report_regressions(regressions: List[str], threshold: float) -> int:
+    """Print the verdict of a comparison and return the exit status."""
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions beyond {threshold:.0%}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point; returns 1 when compare finds regressions."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='measure and optionally compare with a baseline')
+    run.add_argument('--shapes', default=','.join(SHAPES),
+                     help=f'comma-separated shapes (default: all of {", ".join(SHAPES)})')
+    run.add_argument('--sizes', default=DEFAULT_SIZES,
+                     help=f'comma-separated sizes (default: {DEFAULT_SIZES})')
+    run.add_argument('--full', action='store_true', help=f'use sizes {FULL_SIZES}')
+    run.add_argument('--seconds', type=float, default=1.0,
+                     help='timing budget per case (default: 1.0)')
+    run.add_argument('--seed', type=int, default=0, help='corpus seed (default: 0)')
+    run.add_argument('--debug', action='store_true', help='translate in debug mode')
+    run.add_argument('--tokenizer', choices=TOKENIZERS, default='html.parser')
+    run.add_argument('--hoist-styles', action='store_true',
+                     help='translate in two passes with a style preamble')
+    run.add_argument('-o', '--output', help='write the report as JSON to this file')
+    run.add_argument('--baseline', help='compare against this saved report')
+    run.add_argument('--threshold', type=float, default=0.10,
+                     help='relative regression threshold (default: 0.10)')
+
+    diff = commands.add_parser('compare', help='compare two saved reports')
+    diff.add_argument('baseline')
+    diff.add_argument('current')
+    diff.add_argument('--threshold', type=float, default=0.10,
+                      help='relative regression threshold (default: 0.10)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        return report_regressions(compare(load(args.baseline), load(args.current), args.threshold),
+                                  args.threshold)
+
+    shapes = args.shapes.split(',')
+    unknown = [shape for shape in shapes if shape not in SHAPES]
+    if unknown:
+        parser.error(f'unknown shape(s): {", ".join(unknown)}')
+    sizes = [parse_size(size) for size in (FULL_SIZES if args.full else args.sizes).split(',')]
+
+    print_header()
+    report = run_suite(shapes, sizes, debug=args.debug, tokenizer=args.tokenizer,
+                       seconds=args.seconds, seed=args.seed, hoist_styles=args.hoist_styles)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.baseline:
+        print()
+        return report_regressions(compare(load(args.baseline), report, args.threshold),
+                                  args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,67 @@
 """HTML to Typst translator package."""
 
-from .html2typst import translate_html_to_typst
+from .html2typst import (
+    translate_html_to_typst,
+    translate_many,
+    atranslate_html_to_typst,
+    atranslate_many,
+    AsyncTranslator,
+    StreamingTranslator,
+    translate_stream,
+    IncrementalTranslator,
+    translate_delta_to_typst,
+    ParsedDocument,
+    parse_document,
+    render_typst,
+    render_plain_text,
+    save_document,
+    load_document,
+    TranslationStats,
+    Limits,
+    LimitExceeded,
+    AssetStore,
+    TagHandler,
+    TagRegistry,
+    tag_registry,
+    convert_file,
+    convert_directory,
+    ResultCache,
+    result_cache,
+    TranslationStore,
+    cache_key,
+    style_plan_cache,
+    __version__,
+)
 
-__all__ = ['translate_html_to_typst']
+__all__ = [
+    'translate_html_to_typst',
+    'translate_many',
+    'atranslate_html_to_typst',
+    'atranslate_many',
+    'AsyncTranslator',
+    'StreamingTranslator',
+    'translate_stream',
+    'IncrementalTranslator',
+    'translate_delta_to_typst',
+    'ParsedDocument',
+    'parse_document',
+    'render_typst',
+    'render_plain_text',
+    'save_document',
+    'load_document',
+    'TranslationStats',
+    'Limits',
+    'LimitExceeded',
+    'AssetStore',
+    'TagHandler',
+    'TagRegistry',
+    'tag_registry',
+    'convert_file',
+    'convert_directory',
+    'ResultCache',
+    'result_cache',
+    'TranslationStore',
+    'cache_key',
+    'style_plan_cache',
+    '__version__',
+]
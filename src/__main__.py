@@ -0,0 +1,7 @@
+"""Allow running the translator with ``python -m src``."""
+
+import sys
+
+from .html2typst import main
+
+sys.exit(main())
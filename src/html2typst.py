@@ -9,393 +9,3407 @@ Key features:
 - Fail-safe design: structure/style may simplify, text never lost
 """
 
+from html import unescape
 from html.parser import HTMLParser
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Iterator, Deque, Union, Callable
 from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, Future
+from itertools import islice, accumulate, chain
+from urllib.parse import unquote_to_bytes
+from array import array
+import argparse
+import asyncio
+import binascii
+import codecs
+import fnmatch
+import hashlib
+import itertools
+import mmap
+import os
 import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import weakref
+
+
+# Bump whenever rendering rules change: cached results are keyed on it
+__version__ = '0.8.0'
+
+
+class StylePlan:
+    """Compiled formatting decisions for one (class, style) attribute pair.
+    
+    Plans are immutable once built and shared between every element that
+    carries the same attributes, in this document and later ones.
+    """
+    __slots__ = ('align', 'indent', 'color', 'background', 'size', 'font',
+                 'wrappers', 'bold', 'italic', 'unsupported', 'prefix', 'suffix')
+    
+    def __init__(self):
+        self.align: Optional[str] = None  # ql-align-* or text-align
+        self.indent = 0  # ql-indent-* level
+        self.color: Optional[str] = None
+        self.background: Optional[str] = None
+        self.size: Optional[str] = None  # Typst size, e.g. 1.5em
+        self.font: Optional[str] = None
+        self.wrappers: Tuple[str, ...] = ()  # e.g. '#text(fill: red, size: 1.5em)', outermost first
+        self.bold = False
+        self.italic = False
+        self.unsupported: Tuple[str, ...] = ()  # Reported in debug mode only
+        # Typst markup wrapped around each text run inside a span
+        self.prefix = ''
+        self.suffix = ''
+
+
+def parse_inline_styles(style_str: str) -> Dict[str, str]:
+    """Parse inline style string to dictionary."""
+    styles = {}
+    if not style_str:
+        return styles
+    
+    for part in style_str.split(';'):
+        if ':' in part:
+            key, value = part.split(':', 1)
+            styles[key.strip().lower()] = value.strip()
+    return styles
+
+
+# Characters that are Typst markup wherever they appear, escaped in one
+# str.translate pass once a search has found at least one of them
+_MARKUP_CHARS = re.compile(r'[\\*_`#$@<\[\]~]')
+_MARKUP_TABLE = str.maketrans({char: '\\' + char for char in '\\*_`#$@<[]~'})
+
+# Markers that only count at the start of a line: headings, list and enum
+# items, term lists. Escaping the first marker character is enough.
+_LINE_START_MARKER = re.compile(r'(?m)^([ \t]*)(?=(?:=+|[+\-/]|\d+\.)(?:[ \t]|$))')
+_LINE_START_CHARS = frozenset('=+-/0123456789')
+
+# A slash that could form a comment delimiter: before another slash, or
+# first or last, where a neighbouring fragment may supply a '/' or a '*'
+# delimiter. '/*' and '*/' inside the text are defused by escaping '*'.
+_COMMENT_SLASH = re.compile(r'\A/|/(?=/|\Z)')
+
+# Escapes inside a Typst string literal ("...")
+_STRING_CHARS = re.compile(r'[\\"\n\r\t]')
+_STRING_TABLE = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t'})
+
+_BACKTICK_RUN = re.compile('`+')
+
+
+def escape_markup(text: str) -> str:
+    """
+    Escape text for Typst markup so it renders literally.
+    
+    Covers \\ * _ ` # $ @ < [ ] ~ anywhere, '//' comments, and =, -, +, /
+    and "1." markers at the start of a line. Text without any of these is
+    returned unchanged; otherwise the characters are escaped in one pass.
+    """
+    if _MARKUP_CHARS.search(text):
+        text = text.translate(_MARKUP_TABLE)
+    if '//' in text or text[:1] == '/' or text[-1:] == '/':
+        text = _COMMENT_SLASH.sub(r'\\/', text)
+    if '\n' in text or text.lstrip(' \t')[:1] in _LINE_START_CHARS:
+        text = _LINE_START_MARKER.sub(r'\1\\', text)
+    return text
+
+
+def escape_string(text: str) -> str:
+    """Escape text for a Typst string literal (link URLs, image paths, font names)."""
+    if _STRING_CHARS.search(text):
+        text = text.translate(_STRING_TABLE)
+    return text
+
+
+def raw_inline(text: str) -> str:
+    """Return text as inline raw (code) content, which needs no escaping."""
+    if '`' not in text:
+        return f'`{text}`'
+    # A backtick would end `...` early; a raw() call can hold anything
+    return f'#raw("{escape_string(text)}")'
+
+
+def longest_backtick_run(text: str) -> int:
+    """Return the length of the longest run of backticks in text."""
+    if '`' not in text:
+        return 0
+    return max(map(len, _BACKTICK_RUN.findall(text)))
+
+
+def compile_style_plan(class_str: str, style_str: str, debug: bool = False) -> StylePlan:
+    """Decode a class/style attribute pair into a StylePlan."""
+    plan = StylePlan()
+    classes = class_str.split()
+    styles = parse_inline_styles(style_str)
+    
+    # Block alignment (p, div, li)
+    for cls in classes:
+        if cls.startswith('ql-align-'):
+            plan.align = cls.replace('ql-align-', '')
+            break
+    
+    if not plan.align:
+        plan.align = styles.get('text-align')
+    
+    # List indent (li)
+    for cls in classes:
+        if cls.startswith('ql-indent-'):
+            try:
+                plan.indent = int(cls.replace('ql-indent-', ''))
+            except ValueError:
+                pass
+            break
+    
+    # Span styles
+    unsupported = []
+    
+    # Handle color
+    if 'color' in styles:
+        color = styles['color']
+        if color and color != 'windowtext':
+            plan.color = color
+        elif color == 'windowtext' and debug:
+            unsupported.append(f'color: {color}')
+    
+    # Handle background-color
+    if 'background-color' in styles:
+        bgcolor = styles['background-color']
+        if bgcolor:
+            plan.background = bgcolor
+    
+    # Handle font-size
+    size = None
+    for cls in classes:
+        if cls.startswith('ql-size-'):
+            size = cls.replace('ql-size-', '')
+            break
+    
+    if not size and 'font-size' in styles:
+        size = styles['font-size']
+    
+    if size:
+        size_map = {
+            'small': '0.75em',
+            'large': '1.5em',
+            'huge': '2.5em',
+        }
+        plan.size = size_map.get(size, size)
+    
+    # Handle font-family
+    font = None
+    for cls in classes:
+        if cls.startswith('ql-font-'):
+            font = cls.replace('ql-font-', '')
+            break
+    
+    if not font and 'font-family' in styles:
+        font = styles['font-family']
+    
+    if font:
+        font = font.strip('\'"')
+        plan.font = font
+    
+    # Handle font-weight (bold)
+    if 'font-weight' in styles:
+        weight = styles['font-weight']
+        if weight in ('bold', '700', '800', '900'):
+            plan.bold = True
+        elif debug:
+            unsupported.append(f'font-weight: {weight}')
+    
+    # Handle font-style (italic)
+    if 'font-style' in styles:
+        style = styles['font-style']
+        if style == 'italic':
+            plan.italic = True
+        elif debug:
+            unsupported.append(f'font-style: {style}')
+    
+    plan.unsupported = tuple(unsupported)
+    render_span_markup(plan)
+    return plan
+
+
+def render_span_markup(plan: StylePlan,
+                       shorthands: Optional[Dict[Tuple[str, ...], str]] = None):
+    """
+    Pre-render the markup a plan wraps around each text run inside a span.
+    
+    Color, size and font share one #text() call; a background needs its own
+    #highlight() wrapper, kept outermost. Bold and italic go innermost as
+    *...* and _..._. Unsupported styles (only collected in debug mode) are
+    reported in a comment before the markup. ``shorthands`` maps wrapper
+    combinations to a #let function that stands in for them.
+    """
+    args = []
+    if plan.color:
+        args.append(f'fill: {plan.color}')
+    if plan.size:
+        args.append(f'size: {plan.size}')
+    if plan.font:
+        args.append(f'font: "{escape_string(plan.font)}"')
+    wrappers = []
+    if plan.background:
+        wrappers.append(f'#highlight(fill: {plan.background})')
+    if args:
+        wrappers.append(f'#text({", ".join(args)})')
+    if shorthands and tuple(wrappers) in shorthands:
+        wrappers = [shorthands[tuple(wrappers)]]
+    plan.wrappers = tuple(wrappers)
+    
+    prefix = ('_' if plan.italic else '') + ('*' if plan.bold else '')
+    suffix = ('*' if plan.bold else '') + ('_' if plan.italic else '')
+    prefix = ''.join(f'{wrapper}[' for wrapper in wrappers) + prefix
+    suffix = suffix + ']' * len(wrappers)
+    if plan.unsupported:
+        prefix = f'/* unsupported styles: {", ".join(plan.unsupported)} */ {prefix}'
+    plan.prefix = prefix
+    plan.suffix = suffix
+
+
+def _nested_size(outer: Optional[str], inner: Optional[str]) -> Optional[str]:
+    """Return the size of a span nested in another: em sizes scale the outer one."""
+    if not outer or not inner or not inner.endswith('em'):
+        return inner or outer
+    try:
+        factor = float(inner[:-2])
+    except ValueError:
+        return inner
+    if outer.endswith('em'):
+        try:
+            return f'{float(outer[:-2]) * factor:g}em'
+        except ValueError:
+            pass
+    return f'{outer} * {factor:g}'
+
+
+def nest_style_plans(outer: StylePlan, inner: StylePlan) -> StylePlan:
+    """
+    Combine the plan of a span with that of the span it is nested in.
+    
+    Text inside the inner span renders with one set of wrappers, so it
+    takes the outer span's properties unless it sets its own, as CSS
+    inherits them. Unsupported styles are the inner span's own: the outer
+    span's are reported with its own text.
+    """
+    plan = StylePlan()
+    plan.align = inner.align
+    plan.indent = inner.indent
+    plan.color = inner.color or outer.color
+    plan.background = inner.background or outer.background
+    plan.size = _nested_size(outer.size, inner.size)
+    plan.font = inner.font or outer.font
+    plan.bold = inner.bold or outer.bold
+    plan.italic = inner.italic or outer.italic
+    plan.unsupported = inner.unsupported
+    render_span_markup(plan)
+    return plan
+
+
+# Plan shared by elements without class or style attributes
+EMPTY_STYLE_PLAN = compile_style_plan('', '')
+
+
+class StylePlanCache:
+    """Process-wide bounded LRU cache of compiled style plans.
+    
+    Production and debug plans are cached separately so debug traffic never
+    evicts the plans used for production output.
+    """
+    
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._production = lru_cache(maxsize=maxsize)(
+            lambda class_str, style_str: compile_style_plan(class_str, style_str, False))
+        self._debug = lru_cache(maxsize=maxsize)(
+            lambda class_str, style_str: compile_style_plan(class_str, style_str, True))
+        # Plans are compared by identity, so each pair is combined once
+        self._nested = lru_cache(maxsize=maxsize)(nest_style_plans)
+    
+    def get(self, class_str: str, style_str: str, debug: bool = False) -> StylePlan:
+        """Return the plan for an attribute pair, compiling it on a miss."""
+        if debug:
+            return self._debug(class_str, style_str)
+        return self._production(class_str, style_str)
+    
+    def nested(self, outer: StylePlan, inner: StylePlan) -> StylePlan:
+        """Return the plan of a span with plan inner nested in one with plan outer."""
+        return self._nested(outer, inner)
+    
+    @property
+    def hits(self) -> int:
+        """Number of lookups answered from the cache."""
+        return self._production.cache_info().hits + self._debug.cache_info().hits
+    
+    @property
+    def misses(self) -> int:
+        """Number of lookups that compiled a new plan."""
+        return self._production.cache_info().misses + self._debug.cache_info().misses
+    
+    def info(self) -> Dict[str, Any]:
+        """Return hit/miss/size counters for both modes."""
+        return {
+            'production': self._production.cache_info()._asdict(),
+            'debug': self._debug.cache_info()._asdict(),
+            'nested': self._nested.cache_info()._asdict(),
+        }
+    
+    def clear(self):
+        """Drop all cached plans and reset the counters."""
+        self._production.cache_clear()
+        self._debug.cache_clear()
+        self._nested.cache_clear()
+
+
+style_plan_cache = StylePlanCache()
+
+
+@dataclass
+class _StyleHoisting:
+    """
+    Styles hoisted out of a document's runs into a preamble.
+    
+    ``font`` and ``size`` are set for the whole document with ``#set text``
+    and dropped from every run; ``shorthands`` maps the wrapper combinations
+    runs repeat often enough to ``#let`` functions defined once.
+    """
+    font: Optional[str] = None
+    size: Optional[str] = None
+    shorthands: Dict[Tuple[str, ...], str] = field(default_factory=dict)
+    
+    def apply(self, plan: StylePlan) -> StylePlan:
+        """Return plan as rendered under the preamble; unchanged plans are returned as they are."""
+        if not plan.wrappers:
+            return plan
+        hoisted = _copy_plan(plan)
+        if hoisted.font == self.font:
+            hoisted.font = None
+        if hoisted.size == self.size:
+            hoisted.size = None
+        render_span_markup(hoisted, self.shorthands)
+        return plan if hoisted.prefix == plan.prefix else hoisted
+    
+    @property
+    def preamble(self) -> str:
+        """The #set and #let lines that go before the body, or '' if nothing is hoisted."""
+        lines = []
+        args = []
+        if self.font:
+            args.append(f'font: "{escape_string(self.font)}"')
+        if self.size:
+            args.append(f'size: {self.size}')
+        if args:
+            lines.append(f'#set text({", ".join(args)})\n')
+        for wrappers, name in self.shorthands.items():
+            lines.append(f'#let {name[1:]}(body) = {_wrapper_call(wrappers)}\n')
+        return ''.join(lines) + '\n' if lines else ''
+
+
+def _copy_plan(plan: StylePlan) -> StylePlan:
+    """Return a new plan with the same attributes."""
+    copy = StylePlan()
+    for name in StylePlan.__slots__:
+        setattr(copy, name, getattr(plan, name))
+    return copy
+
+
+def _wrapper_call(wrappers: Tuple[str, ...]) -> str:
+    """Return wrappers such as ('#highlight(fill: red)',) as one code-mode call around body."""
+    call = 'body'
+    for wrapper in reversed(wrappers):
+        call = f'{wrapper[1:-1]}, {call})'
+    return call
+
+
+def plan_style_hoisting(chars: int, fonts: Dict[str, int], sizes: Dict[str, int],
+                        uses: Dict[StylePlan, int]) -> _StyleHoisting:
+    """
+    Decide what to hoist from a census of a document's text.
+    
+    A font is set for the document only if all its text, ``chars``
+    characters, is in it, and a size likewise; ``sizes`` is left empty when
+    some text is sized relative to its surroundings (headings, scripts,
+    code). ``uses`` counts the text nodes each span plan renders. A wrapper
+    combination gets a shorthand when that saves more than its definition
+    costs.
+    """
+    hoisting = _StyleHoisting()
+    if chars:
+        hoisting.font = next((font for font, count in fonts.items() if count == chars), None)
+        hoisting.size = next((size for size, count in sizes.items() if count == chars), None)
+    
+    combinations: Dict[Tuple[str, ...], int] = {}
+    for plan, count in uses.items():
+        wrappers = hoisting.apply(plan).wrappers
+        if wrappers:
+            combinations[wrappers] = combinations.get(wrappers, 0) + count
+    for wrappers, count in sorted(combinations.items(), key=lambda item: -item[1]):
+        name = f'#s{len(hoisting.shorthands) + 1}'
+        inline = sum(len(wrapper) + 2 for wrapper in wrappers)  # wrapper[ ... ]
+        definition = len(f'#let {name[1:]}(body) = {_wrapper_call(wrappers)}\n')
+        if count * (inline - len(name) - 2) > definition:
+            hoisting.shorthands[wrappers] = name
+    return hoisting
+
+
+class _HoistedStylePlans:
+    """Style plan source that renders plans under a document's hoisted styles."""
+    
+    def __init__(self, cache: StylePlanCache, hoisting: _StyleHoisting):
+        self.cache = cache
+        self.hoisting = hoisting
+        # Hoisted plans by original and back, so that nesting combines the
+        # original plans and equal plans stay identical
+        self.hoisted: Dict[StylePlan, StylePlan] = {}
+        self.originals: Dict[StylePlan, StylePlan] = {}
+    
+    def hoist(self, plan: StylePlan) -> StylePlan:
+        hoisted = self.hoisted.get(plan)
+        if hoisted is None:
+            hoisted = self.hoisted[plan] = self.hoisting.apply(plan)
+            self.originals[hoisted] = plan
+        return hoisted
+    
+    def get(self, class_str: str, style_str: str, debug: bool = False) -> StylePlan:
+        return self.hoist(self.cache.get(class_str, style_str, debug))
+    
+    def nested(self, outer: StylePlan, inner: StylePlan) -> StylePlan:
+        return self.hoist(self.cache.nested(self.originals.get(outer, outer),
+                                            self.originals.get(inner, inner)))
+
+
+class NewlineCollapser:
+    """
+    Collapse runs of four or more newlines to three, incrementally.
+    
+    Text is written in pieces; runs of newlines are collapsed even when they
+    span several pieces, so the concatenated output matches a single
+    ``\\n{4,}`` -> ``\\n\\n\\n`` substitution over the whole document.
+    """
+    
+    _EXCESS_NEWLINES = re.compile(r'\n{4,}')
+    
+    def __init__(self):
+        self.run = 0  # Length of the newline run at the end of the output so far
+    
+    def write(self, text: str) -> str:
+        """Return ``text`` with newline runs collapsed, given what came before."""
+        if not text:
+            return ''
+        if text[0] != '\n':
+            # Most pieces: nothing joins the run so far, text passes through
+            keep = 0
+            body = text
+        else:
+            body = text.lstrip('\n')
+            lead = len(text) - len(body)
+            # Newlines to add so the run spanning the boundary ends at min(run, 3)
+            keep = min(self.run + lead, 3) - min(self.run, 3)
+            if not body:
+                self.run += lead
+                return '\n' * keep
+        
+        self.run = len(body) - len(body.rstrip('\n')) if body[-1] == '\n' else 0
+        if '\n\n\n\n' in body:
+            body = self._EXCESS_NEWLINES.sub('\n\n\n', body)
+        return '\n' * keep + body if keep else body
+
+
+class OutputSink:
+    """
+    Where a parser writes its output: a list, a file-like object (anything
+    with ``write``, e.g. ``io.StringIO`` or an open file) or a callable.
+    
+    Newline runs are collapsed as text is written, so the target receives
+    the final output without a separate cleanup pass.
+    """
+    
+    def __init__(self, out: Any):
+        if isinstance(out, list):
+            self._write = out.append
+        elif hasattr(out, 'write'):
+            self._write = out.write
+        elif callable(out):
+            self._write = out
+        else:
+            raise TypeError(f'out must be a list, a file-like object or a callable, '
+                            f'got {type(out).__name__}')
+        self.collapser = NewlineCollapser()
+    
+    def write(self, text: str):
+        """Write a piece of output to the target."""
+        text = self.collapser.write(text)
+        if text:
+            self._write(text)
+
+
+# File extensions of the data: URI media types extracted as image assets
+_IMAGE_EXTENSIONS = {
+    'image/png': 'png', 'image/jpeg': 'jpg', 'image/jpg': 'jpg', 'image/gif': 'gif',
+    'image/svg+xml': 'svg', 'image/webp': 'webp',
+}
+
+
+class AssetStore:
+    """
+    Receives the images embedded in ``data:`` URIs, for
+    translate_html_to_typst(assets=...).
+    
+    Each image is decoded and named by a hash of its content plus an
+    extension for its media type. A name is stored once per store: written
+    into ``directory`` unless a file of that name is already there, or
+    passed to ``save(name, data)``. Identical images, within a document or
+    across documents, so share one file. The output references
+    ``prefix + name`` instead of carrying the encoded image.
+    
+    Args:
+        directory: Directory to write images into, created when needed
+        prefix: Prepended to names in the output; defaults to ``directory``
+            with a trailing slash, or '' with ``save``
+        save: Callable taking (name, bytes), instead of a directory
+    
+    URIs of other media types, and ones that do not decode, are kept as they are.
+    """
+    
+    def __init__(self, directory: Optional[str] = None, prefix: Optional[str] = None,
+                 save: Optional[Callable[[str, bytes], Any]] = None):
+        if (directory is None) == (save is None):
+            raise ValueError('AssetStore needs exactly one of directory or save')
+        if prefix is None:
+            prefix = '' if directory is None else directory.replace(os.sep, '/').rstrip('/') + '/'
+        self.directory = directory
+        self.prefix = prefix
+        self.save = save if save is not None else self._write_file
+        self.names: set = set()  # Names stored (or found on disk) so far
+        self.lock = threading.Lock()
+        self.stored = 0
+        self.reused = 0
+    
+    def reference(self, src: str) -> str:
+        """Store the image of a data: URI and return its path, or return other sources unchanged."""
+        decoded = _decode_data_uri(src)
+        if decoded is None:
+            return src
+        extension, data = decoded
+        name = _asset_name(extension, data)
+        self._add(name, data)
+        return self.prefix + name
+    
+    def _add(self, name: str, data: bytes):
+        """Store an image under its content name, unless this store already has it."""
+        with self.lock:
+            known = name in self.names
+            self.names.add(name)
+            if known:
+                self.reused += 1
+            else:
+                self.stored += 1
+        if not known:
+            self.save(name, data)
+    
+    def _write_file(self, name: str, data: bytes):
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):  # Written by an earlier run; the name is the content
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Written under a temporary name so a reader never sees a partial file
+        partial_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(partial_path, 'wb') as f:
+            f.write(data)
+        os.replace(partial_path, path)
+
+
+class _DeferredAssets:
+    """
+    Names data: URI images for a pass whose output may still be discarded;
+    commit() hands them to the AssetStore once it is kept.
+    """
+    
+    def __init__(self, assets: AssetStore):
+        self.assets = assets
+        self.pending: List[Tuple[str, bytes]] = []
+    
+    def reference(self, src: str) -> str:
+        """Return the path the image of a data: URI will be stored at, or other sources unchanged."""
+        decoded = _decode_data_uri(src)
+        if decoded is None:
+            return src
+        extension, data = decoded
+        name = _asset_name(extension, data)
+        self.pending.append((name, data))
+        return self.assets.prefix + name
+    
+    def commit(self):
+        """Store the images named so far."""
+        for name, data in self.pending:
+            self.assets._add(name, data)
+        self.pending.clear()
+
+
+def _asset_name(extension: str, data: bytes) -> str:
+    """Return the content-derived file name of an image."""
+    return f'{hashlib.blake2b(data, digest_size=16).hexdigest()}.{extension}'
+
+
+def _decode_data_uri(src: str) -> Optional[Tuple[str, bytes]]:
+    """Return (extension, content) of an image data: URI, or None for anything else."""
+    if src[:5].lower() != 'data:':
+        return None
+    comma = src.find(',')
+    if comma < 0:
+        return None
+    params = src[5:comma].lower().split(';')
+    extension = _IMAGE_EXTENSIONS.get(params[0].strip())
+    if extension is None:
+        return None
+    try:
+        if 'base64' in params[1:]:
+            # a2b_base64 reads ASCII str directly and skips embedded whitespace
+            return extension, binascii.a2b_base64(src[comma + 1:])
+        return extension, unquote_to_bytes(src[comma + 1:])
+    except (binascii.Error, ValueError):  # Bad padding, non-ASCII characters
+        return None
+
+
+# Elements that cannot have content or an end tag
+_VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                        'link', 'meta', 'source', 'track', 'wbr'))
+
+
+class ElementFrame:
+    """An open HTML element with its class and style attributes decoded.
+    
+    Frames are built once in handle_starttag so text nodes only read the
+    pre-computed fields instead of re-parsing attributes.
+    """
+    __slots__ = ('tag', 'roles', 'handler', 'href', 'style', 'closed', 'extra')
+    
+    def __init__(self, tag: str, handler: Optional['TagHandler']):
+        self.tag = tag
+        self.roles = handler.roles if handler is not None else ()
+        self.handler = handler
+        self.href = ''
+        self.style = EMPTY_STYLE_PLAN
+        self.closed = False
+        self.extra: Any = None  # Free for TagHandler hooks to keep state in
+
+
+@dataclass
+class RenderContext:
+    """Context for rendering HTML nodes to Typst."""
+    debug: bool = False
+    in_ordered_list: bool = False
+    in_pre: bool = False
+    list_item_started: bool = False  # Track if we've output the list marker
+    assets: Optional[AssetStore] = None  # Where data: URI images are extracted to
+    hoisting: Optional[_StyleHoisting] = None  # Styles set once in a preamble
+    
+    
+class TagHandler:
+    """
+    How one kind of element renders; registered for tag names in a TagRegistry.
+    
+    ``roles`` names the formatting rules the element takes part in. Elements
+    sharing a role shadow each other: for each text node only the innermost
+    open element of each role has its ``data`` hook called, role by role in
+    registry order. Hooks left as the no-op defaults are never called.
+    
+    Attributes:
+        roles: Formatting roles of the element
+        block: The element's output is final once it closes, so it is then
+            written to the sink (or returned when streaming)
+        wraps: ``data`` only adds markup before and after ``text``, which it
+            neither reads nor changes. Adjacent text nodes whose elements
+            all wrap, and format alike, are then rendered as one run: the
+            hooks render the first node, and are called once more with a
+            placeholder text to find the markup that closes the run.
+    """
+    roles: Tuple[str, ...] = ()
+    block = False
+    wraps = False
+    
+    def start(self, parser: 'HTML2TypstParser', frame: Optional[ElementFrame],
+              attrs: List[Tuple[str, Optional[str]]]):
+        """Handle the start tag. ``frame`` is None for void elements such as <br>."""
+    
+    def end(self, parser: 'HTML2TypstParser', frame: ElementFrame):
+        """Handle the end tag of an open element."""
+    
+    def self_closing(self, parser: 'HTML2TypstParser', attrs: List[Tuple[str, Optional[str]]]):
+        """Handle a self-closing tag such as <br/>."""
+    
+    def data(self, parser: 'HTML2TypstParser', frame: ElementFrame, role: str,
+             text: str, source: str) -> str:
+        """
+        Render a text node inside the element for one of its roles.
+        
+        ``text`` is the node as rendered so far, ``source`` its original
+        text. Returning '' drops the node.
+        """
+        return text
+
+
+class _StrongHandler(TagHandler):
+    roles = ('strong',)
+    wraps = True
+    
+    def data(self, parser, frame, role, text, source):
+        # Function syntax when markup delimiters would collide: after ], * or
+        # _ (patterns like ]*text* or **text*), or nested in emphasis
+        if parser.last_char in (']', '*', '_') or parser.open_roles['em']:
+            return f'#strong[{text}]'
+        return f'*{text}*'
+
+
+class _EmphasisHandler(TagHandler):
+    roles = ('em',)
+    wraps = True
+    
+    def data(self, parser, frame, role, text, source):
+        if parser.last_char in (']', '*', '_') or parser.open_roles['strong']:
+            return f'#emph[{text}]'
+        return f'_{text}_'
+
+
+class _ScriptHandler(TagHandler):
+    roles = ('script',)
+    wraps = True
+    
+    def data(self, parser, frame, role, text, source):
+        if frame.tag == 'sup':
+            return f'#super[{text}]'
+        return f'#sub[{text}]'
+
+
+class _BlockHandler(TagHandler):
+    roles = ('block',)
+    block = True
+    wraps = True
+    
+    def end(self, parser, frame):
+        parser.emit('\n\n')
+    
+    def data(self, parser, frame, role, text, source):
+        align = frame.style.align
+        if not align:
+            return text
+        if align in ('center', 'right'):
+            # For list items with alignment, we handle it differently
+            if frame.tag == 'li':
+                # Just note it in debug mode
+                if parser.context.debug:
+                    text = f'/* list item with alignment: {align} */ {text}'
+            else:
+                text = f'#align({align})[{text}]'
+        elif align and align != 'left' and parser.context.debug:
+            text = f'/* unknown alignment: {align} */ {text}'
+        return text
+
+
+class _HeadingHandler(TagHandler):
+    roles = ('heading',)
+    block = True
+    
+    def end(self, parser, frame):
+        parser.emit('\n\n')
+    
+    def data(self, parser, frame, role, text, source):
+        # Headings drop inline formatting
+        return f"{'=' * int(frame.tag[1])} {parser.escape_text(source)}"
+
+
+class _ListItemHandler(_BlockHandler):
+    roles = ('li', 'block')
+    
+    def start(self, parser, frame, attrs):
+        parser.context.list_item_started = False  # Reset for new list item
+    
+    def end(self, parser, frame):
+        parser.emit('\n')
+    
+    def data(self, parser, frame, role, text, source):
+        if role == 'block':
+            return _BlockHandler.data(self, parser, frame, role, text, source)
+        # Only add marker if this is the first text in the list item
+        context = parser.context
+        if not context.list_item_started:
+            indent = '  ' * frame.style.indent
+            marker = '+' if context.in_ordered_list else '-'
+            text = f'{indent}{marker} {text}'
+            context.list_item_started = True
+        return text
+
+
+class _OrderedListHandler(TagHandler):
+    def start(self, parser, frame, attrs):
+        parser.context.in_ordered_list = True
+    
+    def end(self, parser, frame):
+        parser.context.in_ordered_list = False
+
+
+class _BlockquoteHandler(TagHandler):
+    roles = ('blockquote',)
+    wraps = True
+    block = True
+    
+    def end(self, parser, frame):
+        parser.emit('\n\n')
+    
+    def data(self, parser, frame, role, text, source):
+        return f'> {text}'
+
+
+class _CodeHandler(TagHandler):
+    # Read by HTML2TypstParser.escape_text: inline code is raw
+    roles = ('code',)
+
+
+class _PreHandler(TagHandler):
+    block = True
+    
+    def start(self, parser, frame, attrs):
+        parser.context.in_pre = True
+        parser.raw_fence = len(parser.result)
+        parser.raw_ticks = 0
+        parser.emit('```\n')
+    
+    def end(self, parser, frame):
+        parser.close_raw_block()
+        parser.context.in_pre = False
+
+
+class _LinkHandler(TagHandler):
+    roles = ('link',)
+    wraps = True
+    
+    def data(self, parser, frame, role, text, source):
+        if frame.href:
+            return f'#link("{frame.href}")[{text}]'
+        if parser.context.debug:
+            return f'/* link without href */ {text}'
+        return text
+
+
+class _SpanHandler(TagHandler):
+    roles = ('span',)
+    wraps = True
+    
+    def start(self, parser, frame, attrs):
+        # Only the innermost span wraps a text node, so it carries the
+        # styles of the spans around it too
+        spans = parser.open_roles['span']
+        if len(spans) > 1 and spans[-2].style is not EMPTY_STYLE_PLAN:
+            outer = spans[-2].style
+            if frame.style is EMPTY_STYLE_PLAN and not outer.unsupported:
+                frame.style = outer
+            else:
+                frame.style = parser.style_plans.nested(outer, frame.style)
+    
+    def data(self, parser, frame, role, text, source):
+        return parser.apply_span_styles(text, frame)
+
+
+# Inline formatting elements that Quill puts a format's color, background,
+# size and font on, as in <strong style="color: red;">, instead of a <span>
+_STYLED_INLINE_TAGS = frozenset(('strong', 'b', 'em', 'i', 'u', 's', 'sup', 'sub', 'a', 'code'))
+
+
+class _StyledInlineHandler(TagHandler):
+    """
+    An inline formatting element whose class or style attributes set a color,
+    background, size or font: it formats its text as its own handler does,
+    inside the #highlight() and #text() wrappers a span would add. Bold,
+    italic and unsupported styles on it are ignored, as on unstyled ones.
+    """
+    
+    def __init__(self, inner: Optional[TagHandler]):
+        self.inner = inner if inner is not None else TagHandler()
+        self.roles = self.inner.roles + ('span',)
+        self.wraps = self.inner.wraps or not self.inner.roles
+    
+    def data(self, parser, frame, role, text, source):
+        if role == 'span':
+            wrappers = frame.style.wrappers
+            return ''.join(f'{wrapper}[' for wrapper in wrappers) + text + ']' * len(wrappers)
+        return self.inner.data(parser, frame, role, text, source)
+
+
+class _LineBreakHandler(TagHandler):
+    def start(self, parser, frame, attrs):
+        parser.emit('\n' if parser.context.in_pre else '\\\n')
+    
+    def self_closing(self, parser, attrs):
+        self.start(parser, None, attrs)
+
+
+class _ImageHandler(TagHandler):
+    def start(self, parser, frame, attrs):
+        self.self_closing(parser, attrs)
+    
+    def self_closing(self, parser, attrs):
+        attr_dict = {k: v or '' for k, v in attrs}
+        alt = attr_dict.get('alt', '')
+        src = attr_dict.get('src', '')
+        if src:
+            if parser.context.assets is not None:
+                src = parser.context.assets.reference(src)
+            if alt:
+                parser.emit(f'#image("{escape_string(src)}", alt: "{escape_string(alt)}")\n\n')
+            else:
+                parser.emit(f'#image("{escape_string(src)}")\n\n')
+        elif alt:
+            parser.emit(escape_markup(alt))
+        elif parser.context.debug:
+            parser.emit('/* image without src or alt */\n')
+
+
+# Stands in for the text of a node while wrapping hooks render its markup
+_RUN_MARK = '\x00'
+
+
+def _continues_run(open_roles: Dict[str, List[ElementFrame]], roles: Tuple[str, ...],
+                   run_frames: List[ElementFrame]) -> bool:
+    """Whether the open elements of roles render text like the frames of a run."""
+    for role, other in zip(roles, run_frames):
+        frame = open_roles[role][-1]
+        if frame is not other and (
+                frame.handler is not other.handler or frame.tag != other.tag
+                or frame.style is not other.style or frame.href != other.href
+                or frame.extra is not None or other.extra is not None):
+            return False
+    return True
+
+
+# Built-in roles in the order their data hooks wrap a text node, innermost
+# formatting first. Roles of registered tags come before all of them.
+_BUILTIN_ROLES = ('strong', 'em', 'script', 'heading', 'li', 'blockquote',
+                  'code', 'link', 'span', 'block')
+
+
+def _builtin_handlers() -> Dict[str, TagHandler]:
+    """Return the handlers of the tags the translator supports out of the box."""
+    block = _BlockHandler()
+    heading = _HeadingHandler()
+    handlers: Dict[str, TagHandler] = {
+        'strong': _StrongHandler(), 'em': _EmphasisHandler(),
+        'sup': _ScriptHandler(), 'li': _ListItemHandler(), 'ol': _OrderedListHandler(),
+        'blockquote': _BlockquoteHandler(), 'code': _CodeHandler(), 'pre': _PreHandler(),
+        'a': _LinkHandler(), 'span': _SpanHandler(), 'p': block, 'div': block,
+        'br': _LineBreakHandler(), 'img': _ImageHandler(),
+    }
+    handlers['b'] = handlers['strong']
+    handlers['i'] = handlers['em']
+    handlers['sub'] = handlers['sup']
+    for level in range(1, 7):
+        handlers[f'h{level}'] = heading
+    return handlers
+
+
+class _Dispatch:
+    """A TagRegistry compiled into the lookup tables the parser reads."""
+    __slots__ = ('handlers', 'start', 'end', 'self_closing', 'styled',
+                 'role_names', 'role_bits', 'wrapping_roles', 'sequences', 'block_tags')
+    
+    def __init__(self, handlers: Dict[str, TagHandler], role_names: Tuple[str, ...]):
+        def overrides(handler: TagHandler, hook: str) -> bool:
+            return getattr(type(handler), hook) is not getattr(TagHandler, hook)
+        
+        self.handlers = handlers
+        # Bound hooks, only for the tags whose handler implements them
+        self.start = {tag: handler.start for tag, handler in handlers.items()
+                      if overrides(handler, 'start')}
+        self.end = {tag: handler.end for tag, handler in handlers.items()
+                    if overrides(handler, 'end')}
+        self.self_closing = {tag: handler.self_closing for tag, handler in handlers.items()
+                             if overrides(handler, 'self_closing')}
+        self.role_names = role_names
+        # Roles whose elements render text get a bit each, in order, so the
+        # set of open ones is one int; the rest only mark context
+        data_roles = {role for handler in handlers.values() if overrides(handler, 'data')
+                      for role in handler.roles}
+        self.role_bits = dict.fromkeys(role_names, 0)
+        for bit, role in enumerate(role for role in role_names if role in data_roles):
+            self.role_bits[role] = 1 << bit
+        # Roles whose every element's data hook wraps, so their text can run on
+        self.wrapping_roles = frozenset(
+            role for role in data_roles
+            if all(handler.wraps for handler in handlers.values() if role in handler.roles))
+        # Open role bits -> sequence(bits), filled in by the parser as seen
+        self.sequences: Dict[int, Tuple[Tuple[str, ...], bool]] = {0: ((), True)}
+        self.block_tags = frozenset(tag for tag, handler in handlers.items() if handler.block)
+        # Stand-in handlers for inline formatting elements that carry styles
+        self.styled = {}
+        for tag in _STYLED_INLINE_TAGS:
+            handler = handlers.get(tag)
+            if handler is None or not (handler.block or 'span' in handler.roles):
+                self.styled[tag] = _StyledInlineHandler(handler)
+    
+    def sequence(self, mask: int) -> Tuple[Tuple[str, ...], bool]:
+        """Return the roles whose data hooks run for a set of open role bits, and whether all wrap."""
+        roles = tuple(role for role, bit in self.role_bits.items() if bit & mask)
+        return roles, all(role in self.wrapping_roles for role in roles)
+
+
+class TagRegistry:
+    """
+    Maps tag names to TagHandlers, compiled once into dispatch tables.
+    
+    ``tag_registry`` holds the built-in tags and is what the translator
+    uses; register custom tags on it before translating. Registering
+    changes output for the same input, so results cached before then (and
+    translations in worker processes started before then) do not see it.
+    
+    Examples:
+        >>> class Mention(TagHandler):
+        ...     roles = ('mention',)
+        ...     def data(self, parser, frame, role, text, source):
+        ...         return f'#underline[{text}]'
+        >>> tag_registry.register('mention', Mention())
+    """
+    
+    def __init__(self, handlers: Optional[Dict[str, TagHandler]] = None):
+        self._handlers: Dict[str, TagHandler] = dict(handlers or {})
+        self._lock = threading.Lock()
+        self._compiled: Optional[_Dispatch] = None
+    
+    def register(self, tags: Union[str, Iterable[str]], handler: TagHandler):
+        """Render the given tag name(s) with handler, replacing any previous handler."""
+        if isinstance(tags, str):
+            tags = [tags]
+        with self._lock:
+            for tag in tags:
+                self._handlers[tag.lower()] = handler
+            self._compiled = None
+    
+    def unregister(self, tag: str):
+        """Stop handling a tag; its elements then render their text only."""
+        with self._lock:
+            self._handlers.pop(tag.lower(), None)
+            self._compiled = None
+    
+    def get(self, tag: str) -> Optional[TagHandler]:
+        """Return the handler registered for a tag, if any."""
+        return self._handlers.get(tag)
+    
+    def compiled(self) -> _Dispatch:
+        """Return the dispatch tables, compiling them after a change."""
+        dispatch = self._compiled
+        if dispatch is None:
+            with self._lock:
+                roles = [role for handler in self._handlers.values() for role in handler.roles]
+                custom = [role for role in dict.fromkeys(roles) if role not in _BUILTIN_ROLES]
+                dispatch = _Dispatch(dict(self._handlers), tuple(custom) + _BUILTIN_ROLES)
+                self._compiled = dispatch
+        return dispatch
+
+
+tag_registry = TagRegistry(_builtin_handlers())
+
+
+class HTML2TypstParser(HTMLParser):
+    """Parser that converts HTML to Typst."""
+    
+    # Where build_frame gets compiled style plans; the profiler and style
+    # hoisting swap in a wrapper per instance
+    style_plans = style_plan_cache
+    # How each tag renders
+    registry = tag_registry
+    
+    def __init__(self, context: RenderContext, sink: Optional[OutputSink] = None):
+        super().__init__()
+        self.context = context
+        dispatch = self.registry.compiled()
+        self.tag_handlers = dispatch.handlers
+        self.styled_handlers = dispatch.styled
+        self.start_hooks = dispatch.start
+        self.end_hooks = dispatch.end
+        self.self_closing_hooks = dispatch.self_closing
+        self.role_bits = dispatch.role_bits
+        self.role_sequences = dispatch.sequences
+        self.role_sequence = dispatch.sequence
+        self.block_tags = dispatch.block_tags
+        # With a sink, result only holds the open block: it is written out
+        # whenever a block closes
+        self.sink = sink
+        self.result: List[str] = []
+        # Open elements by tag name, innermost last, so an end tag finds the
+        # element it closes without walking the whole document tree
+        self.open_tags: Dict[str, List[ElementFrame]] = {}
+        self.depth = 0  # Number of open elements
+        # Open elements grouped by the formatting rule they drive, innermost
+        # last, so handle_data can read the nearest ancestor of each kind.
+        # An element closed out of order stays in place, marked closed, until
+        # the elements above it close; the last frame is always open.
+        self.open_roles: Dict[str, List[ElementFrame]] = {
+            role: [] for role in dispatch.role_names
+        }
+        # role_bits of the roles with an open element
+        self.active_roles = 0
+        # Last non-whitespace character of the most recent output fragment
+        self.last_char = ''
+        # Where the open code block's fence was emitted, and the longest
+        # backtick run in its content; the fence is lengthened past it
+        self.raw_fence = 0
+        self.raw_ticks = 0
+        # The last text run, which the next text node joins if nothing was
+        # emitted in between and it is formatted alike: run_end is the
+        # length of result after the run (-1 once it cannot be extended),
+        # run_mask and run_frames its formatting, and run_last_char the
+        # last_char its data hooks saw. The frames list also identifies the
+        # run for run_split (its closing markup, run_suffix, is a fragment
+        # of its own) and run_gap (whitespace was dropped after it).
+        self.run_end = -1
+        self.run_mask = 0
+        self.run_frames: List[ElementFrame] = []
+        self.run_last_char = ''
+        self.run_split: Optional[List[ElementFrame]] = None
+        self.run_suffix = ''
+        self.run_gap: Optional[List[ElementFrame]] = None
+        # Length of result when whitespace between inline text was dropped,
+        # kept as one space if the next text node follows right after it
+        self.space_at = -1
+        hoisting = context.hoisting
+        if hoisting is not None:
+            # Runs render without the styles the preamble sets
+            self.style_plans = _HoistedStylePlans(style_plan_cache, hoisting)
+            if hoisting.preamble:
+                self.result.append(hoisting.preamble)
+    
+    def emit(self, fragment: str):
+        """Append an output fragment and remember how it ends."""
+        self.result.append(fragment)
+        self.last_char = fragment.rstrip()[-1:]
+    
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> Optional[ElementFrame]:
+        """Handle opening HTML tags; return the element's frame, or None for a void element."""
+        # Void elements such as <br> never have content, so they are not
+        # kept open waiting for an end tag
+        if tag not in _VOID_TAGS:
+            frame = self.build_frame(tag, attrs)
+            frames = self.open_tags.get(tag)
+            if frames is None:
+                self.open_tags[tag] = [frame]
+            else:
+                frames.append(frame)
+            self.depth += 1
+            for role in frame.roles:
+                frames = self.open_roles[role]
+                if not frames:
+                    self.active_roles |= self.role_bits[role]
+                frames.append(frame)
+        else:
+            frame = None
+        
+        hook = self.start_hooks.get(tag)
+        if hook is not None:
+            hook(self, frame, attrs)
+        return frame
+    
+    def handle_endtag(self, tag: str):
+        """
+        Handle closing HTML tags.
+        
+        An end tag closes the innermost open element with the same name and
+        nothing else: elements opened inside it stay open, and an end tag
+        with no open element of its name is ignored.
+        """
+        frames = self.open_tags.get(tag)
+        if not frames:
+            return
+        frame = frames.pop()
+        frame.closed = True
+        self.depth -= 1
+        for role in frame.roles:
+            self._close_role(role)
+        
+        hook = self.end_hooks.get(tag)
+        if hook is not None:
+            hook(self, frame)
+        
+        if tag in self.block_tags:
+            self.run_end = -1  # Text never runs on across a block boundary
+            # A closed block is final, except inside a code block whose
+            # opening fence may still be lengthened
+            if self.sink is not None and not self.context.in_pre:
+                self.flush()
+    
+    def close_raw_block(self):
+        """Emit the closing fence of a code block, lengthening both fences if needed."""
+        fence = '```'
+        if self.context.in_pre:  # Not when a nested block already closed it
+            if self.raw_ticks >= len(fence):
+                # The content has a backtick run that would end the block early
+                fence = '`' * (self.raw_ticks + 1)
+                self.result[self.raw_fence] = fence + '\n'
+            if self.result[-1].endswith('`'):
+                # Keep trailing content backticks from merging into the fence
+                self.emit('\n')
+        self.emit(fence + '\n\n')
+    
+    def flush(self):
+        """Write the fragments held in result to the sink, if there is one."""
+        if self.sink is not None and self.result:
+            self.sink.write(''.join(self.result))
+            self.result.clear()
+            self.run_end = -1
+            self.space_at = -1
+    
+    def _close_role(self, role: str):
+        """Pop closed elements off the top of a role stack."""
+        frames = self.open_roles[role]
+        while frames and frames[-1].closed:
+            frames.pop()
+        if not frames:
+            self.active_roles &= ~self.role_bits[role]
+    
+    def build_frame(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> ElementFrame:
+        """Create the frame for an opening tag, decoding the attributes its roles use."""
+        frame = ElementFrame(tag, self.tag_handlers.get(tag))
+        if not attrs or not (frame.roles or tag in self.styled_handlers):
+            return frame
+        
+        class_str = ''
+        style_str = ''
+        for name, value in attrs:
+            if name == 'class':
+                class_str = value or ''
+            elif name == 'style':
+                style_str = value or ''
+            elif name == 'href':
+                frame.href = escape_string(value or '')
+        if class_str or style_str:
+            frame.style = self.style_plans.get(class_str, style_str, self.context.debug)
+            styled = self.styled_handlers.get(tag)
+            if styled is not None and frame.style.wrappers:
+                # Styled like a span, on top of the spans it sits in
+                frame.handler = styled
+                frame.roles = styled.roles
+                spans = self.open_roles['span']
+                if spans and spans[-1].style is not EMPTY_STYLE_PLAN:
+                    frame.style = self.style_plans.nested(spans[-1].style, frame.style)
+        return frame
+    
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        """Handle self-closing tags."""
+        hook = self.self_closing_hooks.get(tag)
+        if hook is not None:
+            hook(self, attrs)
+    
+    def escape_text(self, data: str) -> str:
+        """Escape a text node for where it lands: inline code is raw, the rest markup."""
+        if self.open_roles['code']:
+            return raw_inline(data)
+        return escape_markup(data)
+    
+    def handle_data(self, data: str):
+        """Handle text content."""
+        if self.context.in_pre:
+            # Code block content is raw: emitted verbatim, whitespace included,
+            # with no escaping or formatting
+            if '`' in data:
+                self.raw_ticks = max(self.raw_ticks, longest_backtick_run(data))
+            self.emit(data)
+            return
+        
+        if not data.strip():
+            # Kept as a space if the next node continues the run, or else
+            # if it follows inline text
+            result = self.result
+            if self.run_end == len(result):
+                self.run_gap = self.run_frames
+            if result and not result[-1][-1:].isspace():
+                self.space_at = len(result)
+            return
+        
+        # Escape BEFORE applying formatting to avoid escaping formatting
+        # delimiters (escape_text, inlined)
+        open_roles = self.open_roles
+        text = raw_inline(data) if open_roles['code'] else escape_markup(data)
+        
+        # The innermost open element of each role formats the node
+        mask = self.active_roles
+        if (mask == self.run_mask and self.run_end == len(self.result)
+                and _continues_run(open_roles, self.role_sequences[mask][0], self.run_frames)
+                and self.extend_run(text)):
+            return
+        if self.space_at == len(self.result):
+            self.emit(' ')
+        
+        sequence = self.role_sequences.get(mask)
+        if sequence is None:
+            sequence = self.role_sequences[mask] = self.role_sequence(mask)
+        active, wraps = sequence
+        if wraps:
+            frames = []
+            for role in active:
+                frame = open_roles[role][-1]
+                frames.append(frame)
+                text = frame.handler.data(self, frame, role, text, data)
+        else:
+            for role in active:
+                frame = open_roles[role][-1]
+                text = frame.handler.data(self, frame, role, text, data)
+            if not text:
+                return
+        
+        # Add spacing to avoid Typst syntax errors and improve readability
+        # After a closing bracket ] or paren ), add a space before most text
+        last_char = self.last_char
+        if last_char:
+            first_stripped = text.lstrip()
+            first_char = first_stripped[:1]
+            
+            # Add space if last char is ] or ) and next text doesn't start with certain safe chars
+            # Safe chars after ]: newline, space (already handled by lstrip), and certain punctuation
+            if last_char in (']', ')') and first_char and first_char not in ('\n', ',', '.', ';', ':', '!', '?', ')', ']'):
+                self.emit(' ')
+            
+            # Add space before block comments (/*) if previous char is * or /
+            # This prevents patterns like *//* which cause "unexpected end of block comment" errors
+            if first_stripped[:2] == '/*' and last_char in ('*', '/'):
+                self.emit(' ')
+
+            # A * or _ delimiter touching a letter or digit is read as part of
+            # the word, leaving the delimiter open: separate them with an
+            # empty content block
+            if ((last_char in ('*', '_') and text[:1].isalnum())
+                    or (text[:1] in ('*', '_') and last_char.isalnum())):
+                previous = self.result[-1] if self.result else ''
+                if previous[-1:] == last_char and previous[-2:-1] != '\\':
+                    self.emit('#[]')
+
+        self.emit(text)
+        if wraps:
+            self.run_end = len(self.result)
+            self.run_mask = mask
+            self.run_frames = frames
+            self.run_last_char = last_char
+        else:
+            self.run_end = -1
+    
+    def extend_run(self, text: str) -> bool:
+        """
+        Add an escaped text node to the last run, inside its closing markup.
+        
+        Returns False, leaving the node to be rendered on its own, when the
+        run's markup cannot be split around its text.
+        """
+        result = self.result
+        frames = self.run_frames
+        if self.run_split is not frames:
+            # Re-render the run's markup around a marker, in the state its
+            # hooks first saw, to find the closing markup
+            last_char = self.last_char
+            self.last_char = self.run_last_char
+            marked = _RUN_MARK
+            for role, frame in zip(self.role_sequences[self.run_mask][0], frames):
+                marked = frame.handler.data(self, frame, role, marked, _RUN_MARK)
+            self.last_char = last_char
+            suffix = marked.rpartition(_RUN_MARK)[2]
+            if not result[-1].endswith(suffix):
+                self.run_end = -1
+                return False
+            if suffix:
+                result[-1] = result[-1][:-len(suffix)]
+                result.append(suffix)
+            self.run_split = frames
+            self.run_suffix = suffix
+        
+        if self.run_gap is frames:
+            text = ' ' + text
+            self.run_gap = None
+        self.emit(text)
+        suffix = self.run_suffix
+        if suffix:
+            # Keep the closing markup last
+            result[-2], result[-1] = result[-1], result[-2]
+            self.last_char = suffix.rstrip()[-1:] or self.last_char
+        self.run_end = len(result)
+        return True
+    
+    def apply_span_styles(self, content: str, frame: ElementFrame) -> str:
+        """Apply span styles to content."""
+        if not content:
+            return ''
+        style = frame.style
+        return f'{style.prefix}{content}{style.suffix}'
+    
+    def get_output(self) -> str:
+        """Get the final Typst output."""
+        return ''.join(self.result)
+
+
+# Tokenizers selectable through translate_html_to_typst(tokenizer=...)
+TOKENIZERS = ('html.parser', 'quill')
+
+# One token of the narrow, well-formed subset Quill emits: a text run, a start
+# tag with double-quoted attributes (optionally self-closing) or an end tag.
+_QUILL_TOKEN = re.compile(
+    r'([^<]+)'
+    r'|<([a-zA-Z][a-zA-Z0-9]*)'
+    r'((?:[ \t\n\r\f]+[a-zA-Z_:][-a-zA-Z0-9_:.]*="[^"]*")*)[ \t\n\r\f]*(/?)>'
+    r'|</([a-zA-Z][a-zA-Z0-9]*)[ \t\n\r\f]*>'
+)
+_QUILL_ATTR = re.compile(r'([a-zA-Z_:][-a-zA-Z0-9_:.]*)="([^"]*)"')
+
+# Elements whose content HTMLParser reads as raw text rather than markup
+_RAW_TEXT_TAGS = frozenset(('script', 'style', 'textarea', 'title', 'xmp', 'iframe',
+                            'noembed', 'noframes', 'noscript', 'plaintext'))
+
+
+def feed_quill_subset(parser: HTML2TypstParser, html: str) -> bool:
+    """
+    Drive the parser's handlers over html with the Quill subset tokenizer.
+    
+    Delivers the same handle_starttag/handle_endtag/handle_startendtag/
+    handle_data events HTMLParser would. Returns False as soon as the input
+    leaves the subset (comments, doctypes, unquoted or single-quoted
+    attributes, a stray '<', raw text elements such as <script>); events may
+    already have been delivered by then, so the caller must discard the
+    parser and start over with HTMLParser.
+    """
+    pos = 0
+    for match in _QUILL_TOKEN.finditer(html):
+        if match.start() != pos:
+            return False
+        pos = match.end()
+        text, tag, attrs, closed, end_tag = match.groups()
+        if text is not None:
+            parser.handle_data(unescape(text) if '&' in text else text)
+        elif end_tag is not None:
+            parser.handle_endtag(end_tag.lower())
+        else:
+            tag = tag.lower()
+            if tag in _RAW_TEXT_TAGS:
+                return False
+            attr_list = [
+                (name.lower(), unescape(value) if '&' in value else value)
+                for name, value in _QUILL_ATTR.findall(attrs)
+            ] if attrs else []
+            if closed:
+                parser.handle_startendtag(tag, attr_list)
+            else:
+                parser.handle_starttag(tag, attr_list)
+    return pos == len(html)
+
+
+def cache_key(html: str, debug: bool = False, hoist_styles: bool = False) -> str:
+    """
+    Return the content-addressed cache key for a translation.
+    
+    The key covers the input, the debug and hoist_styles flags and the
+    translator version, so results from older rendering rules are never
+    reused.
+    """
+    digest = hashlib.blake2b(html.encode('utf-8', 'surrogatepass'), digest_size=16)
+    mode = f'{int(debug)}h' if hoist_styles else f'{int(debug)}'
+    return f'{__version__}:{mode}:{digest.hexdigest()}'
+
+
+class ResultCache:
+    """
+    Thread-safe in-memory LRU cache of translation results.
+    
+    Eviction is bounded by the total size in bytes of the cached strings
+    rather than the number of entries. Results larger than ``max_bytes`` are
+    not cached.
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0  # Bytes currently cached
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        """Return the memory held by one cache entry."""
+        return sys.getsizeof(key) + sys.getsizeof(value)
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached result for ``key``, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: str, value: str):
+        """Store a result, evicting least recently used entries as needed."""
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= self._entry_size(key, old)
+            self._entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                old_key, old_value = self._entries.popitem(last=False)
+                self.size -= self._entry_size(old_key, old_value)
+                self.evictions += 1
+    
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and current usage."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+            }
+    
+    def clear(self):
+        """Drop all cached results and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = self.misses = self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared cache for callers that pass cache=result_cache
+result_cache = ResultCache()
+
+
+class TranslationStore:
+    """
+    Persistent translation cache in a SQLite file, shared across processes.
+    
+    Works anywhere a ResultCache does (``cache=store``). Keys come from
+    cache_key(), so entries written by another translator version are never
+    served; processes of several versions (e.g. during a rolling deploy) can
+    share one file. The file uses write-ahead logging, so worker processes
+    on one host can read and write it concurrently. Once the total UTF-8
+    size of stored results exceeds ``max_bytes``, entries of other versions
+    are removed first, then the least recently used ones. A hit only rewrites an entry's access time when the
+    stored one is more than TOUCH_INTERVAL seconds old, so reads of hot
+    entries do not turn into writes.
+    """
+    
+    # Puts between automatic size checks
+    GC_INTERVAL = 256
+    # Seconds an access time stays current before a hit refreshes it
+    TOUCH_INTERVAL = 60.0
+    
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024, timeout: float = 30.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = None
+        with self._lock:
+            self._connect()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Return this process's connection, opening it after a fork or on first use."""
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS translations ('
+                'key TEXT PRIMARY KEY, version TEXT NOT NULL, value TEXT NOT NULL, '
+                'size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed)')
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored result for ``key``, or None."""
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT value, accessed FROM translations WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[1] > self.TOUCH_INTERVAL:
+                connection.execute(
+                    'UPDATE translations SET accessed = ? WHERE key = ?', (now, key))
+            self.hits += 1
+            return row[0]
+    
+    def put(self, key: str, value: str):
+        """Store a result, collecting garbage every GC_INTERVAL puts."""
+        size = len(value.encode('utf-8', 'surrogatepass'))  # max_bytes is in bytes
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO translations (key, version, value, size, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, __version__, value, size, time.time()),
+            )
+            self._puts += 1
+            if self._puts % self.GC_INTERVAL == 0:
+                self._collect()
+    
+    def gc(self) -> int:
+        """Delete least recently used entries until under max_bytes; return the count."""
+        with self._lock:
+            return self._collect()
+    
+    def _collect(self) -> int:
+        """Size-based garbage collection; the caller holds the lock."""
+        connection = self._connect()
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM translations').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        # Trim to 90% of the budget so the next few puts do not trigger another pass
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # Entries no process of this version can hit go first
+            rows = connection.execute(
+                'SELECT key, size FROM translations ORDER BY version = ?, accessed', (__version__,))
+            doomed = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            connection.executemany('DELETE FROM translations WHERE key = ?', doomed)
+            removed = len(doomed)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return removed
+    
+    def stats(self) -> Dict[str, int]:
+        """Return this process's hit/miss counters and the store's usage."""
+        with self._lock:
+            entries, size = self._connect().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translations').fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+    
+    def clear(self):
+        """Delete every stored result and reset the counters."""
+        with self._lock:
+            self._connect().execute('DELETE FROM translations')
+            self.hits = self.misses = 0
+    
+    def close(self):
+        """Close this process's connection."""
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+    
+    def __len__(self) -> int:
+        return self.stats()['entries']
+
+
+# What translate_html_to_typst does when a Limits budget runs out
+LIMIT_POLICIES = ('raise', 'plain_text')
+
+
+class LimitExceeded(Exception):
+    """A translation ran over one of the budgets in its Limits."""
+    
+    def __init__(self, limit: str, maximum: float):
+        super().__init__(f'{limit} exceeded (limit {maximum})')
+        self.limit = limit  # Name of the Limits field that ran out
+        self.maximum = maximum
+
+
+@dataclass(frozen=True)
+class Limits:
+    """
+    Resource budgets for one translate_html_to_typst() call; None means
+    unlimited.
+    
+    Attributes:
+        max_input_bytes: UTF-8 size of the HTML, checked before parsing
+        max_depth: Open elements at any point of the parse
+        max_output_bytes: UTF-8 size of the Typst produced so far
+        max_seconds: Wall time for the whole translation, checked between
+            parser events
+        on_exceed: 'raise' to raise LimitExceeded, or 'plain_text' to return
+            the document's text, escaped, with a paragraph break after each
+            block. The plain text keeps every text node but is not itself
+            limited.
+    """
+    max_input_bytes: Optional[int] = None
+    max_depth: Optional[int] = None
+    max_output_bytes: Optional[int] = None
+    max_seconds: Optional[float] = None
+    on_exceed: str = 'raise'
+    
+    def __post_init__(self):
+        if self.on_exceed not in LIMIT_POLICIES:
+            raise ValueError(f'on_exceed must be one of {LIMIT_POLICIES}, got {self.on_exceed!r}')
+        for name in ('max_input_bytes', 'max_depth', 'max_output_bytes', 'max_seconds'):
+            value = getattr(self, name)
+            if value is not None and value < 0:
+                raise ValueError(f'{name} must not be negative, got {value}')
+    
+    def check_input(self, html: str):
+        """Raise LimitExceeded if html is over max_input_bytes."""
+        maximum = self.max_input_bytes
+        # Every character takes 1 to 4 bytes, so only sizes in between are encoded
+        if maximum is not None and len(html) * 4 > maximum:
+            if len(html) > maximum or len(html.encode('utf-8', 'surrogatepass')) > maximum:
+                raise LimitExceeded('max_input_bytes', maximum)
+
+
+def translate_html_to_typst(html: str, debug: bool = False,
+                            cache: Optional[Union[ResultCache, TranslationStore]] = None,
+                            tokenizer: str = 'html.parser',
+                            profile: bool = False,
+                            out: Any = None,
+                            limits: Optional[Limits] = None,
+                            assets: Optional[AssetStore] = None,
+                            hoist_styles: bool = False) -> Union[str, None, Tuple[Optional[str], 'TranslationStats']]:
+    """
+    Translate HTML (generated by Quill.js) to Typst code.
+    
+    Args:
+        html: HTML string to convert
+        debug: If True, include debug comments and warnings in output
+        cache: Optional result cache (``result_cache``, a ResultCache or a
+            TranslationStore); repeated translations of the same input are
+            then answered from it
+        tokenizer: 'html.parser' (default) or 'quill', a faster tokenizer
+            for the HTML subset Quill emits that falls back to HTMLParser
+            on anything else; output is the same either way
+        profile: If True, time the translation (the cache is not consulted)
+            and return ``(typst, TranslationStats)``
+        out: Optional target for the output instead of returning it: a list
+            (pieces are appended), a file-like object such as an open file,
+            socket file or ``io.StringIO``, or a callable taking each piece
+        limits: Optional Limits on input size, nesting depth, output size
+            and wall time. Cached results are returned as they are, and
+            plain-text fallbacks are not cached. With ``out`` and the
+            'plain_text' policy, output is held back until the translation
+            completes, so ``out`` never receives a partial translation.
+        assets: Optional AssetStore that receives the images embedded as
+            ``data:`` URIs; the output then references the stored files.
+            Cannot be combined with ``cache``, as a cached result would
+            skip storing the images.
+        hoist_styles: If True, translate in two passes: the first counts
+            how the text is styled, and the output starts with a preamble
+            that sets the font and size all of the text shares
+            (``#set text(...)``) and defines ``#let`` shorthands for
+            wrapper combinations repeated often enough to pay for one.
+            Cannot be combined with ``profile`` or ``limits``.
+    
+    Returns:
+        Typst code as a string, or None when written to ``out``; profiling
+        returns a (typst, TranslationStats) pair instead, with typst None
+        when written to ``out``
+    
+    Raises:
+        LimitExceeded: A budget in ``limits`` ran out and its policy is 'raise'
+    
+    Examples:
+        >>> translate_html_to_typst("<p>Hello <strong>world</strong></p>")
+        'Hello *world*\\n\\n'
+        
+        >>> translate_html_to_typst("<h1>Title</h1><p>Content</p>")
+        '= Title\\n\\nContent\\n\\n'
+    """
+    if tokenizer not in TOKENIZERS:
+        raise ValueError(f'tokenizer must be one of {TOKENIZERS}, got {tokenizer!r}')
+    if profile and limits is not None:
+        raise ValueError('profile cannot be combined with limits')
+    if assets is not None and cache is not None:
+        raise ValueError('assets cannot be combined with cache')
+    if hoist_styles and (profile or limits is not None):
+        raise ValueError('hoist_styles cannot be combined with profile or limits')
+    sink = None if out is None else OutputSink(out)
+    if profile:
+        return _profile(html, debug, tokenizer, sink, assets)
+    if limits is not None:
+        return _translate_within(html, debug, tokenizer, limits, cache, sink, assets)
+    if cache is not None:
+        key = cache_key(html, debug, hoist_styles)
+        result = cache.get(key)
+        if result is None:
+            result = _translate(html, debug, tokenizer, hoist_styles=hoist_styles)
+            cache.put(key, result)
+        if sink is not None:
+            sink.write(result)
+            return None
+        return result
+    if sink is not None:
+        _parse(html, debug, tokenizer, sink=sink, assets=assets, hoist_styles=hoist_styles)
+        return None
+    return _translate(html, debug, tokenizer, assets=assets, hoist_styles=hoist_styles)
+
+
+def _parse(html: str, debug: bool, tokenizer: str,
+           parser_class: Any = HTML2TypstParser,
+           sink: Optional[OutputSink] = None,
+           assets: Optional[AssetStore] = None,
+           hoist_styles: bool = False) -> HTML2TypstParser:
+    """Feed a complete document to a fresh parser writing to sink, and return the parser."""
+    if hoist_styles:
+        # Both passes render the same events, so the document is only
+        # tokenized once
+        return _render(parse_document(html, tokenizer), debug, parser_class, sink, assets,
+                       hoist_styles)
+    if tokenizer == 'quill':
+        # The subset tokenizer only checks its input as it goes, so output
+        # and images are held back until it is known not to fall back
+        deferred = None if assets is None else _DeferredAssets(assets)
+        parser = parser_class(RenderContext(debug=debug, assets=deferred))
+        if feed_quill_subset(parser, html):
+            if deferred is not None:
+                deferred.commit()
+            parser.sink = sink
+            parser.flush()
+            return parser
+    
+    # Create rendering context
+    context = RenderContext(debug=debug, assets=assets)
+    
+    # Create parser
+    parser = parser_class(context, sink)
+    
+    # Parse HTML
+    parser.feed(html)
+    parser.close()
+    # Write out whatever an unclosed code block held back
+    parser.flush()
+    return parser
+
+
+def _render(document: 'ParsedDocument', debug: bool,
+            parser_class: Any = HTML2TypstParser,
+            sink: Optional[OutputSink] = None,
+            assets: Optional[AssetStore] = None,
+            hoist_styles: bool = False) -> HTML2TypstParser:
+    """Replay a parsed document into a fresh parser writing to sink, and return the parser."""
+    # A first pass over the document decides which styles to hoist
+    hoisting = _survey_styles(document, debug) if hoist_styles else None
+    parser = parser_class(RenderContext(debug=debug, assets=assets, hoisting=hoisting), sink)
+    document.replay(parser)
+    parser.flush()
+    return parser
+
+
+def _translate(html: str, debug: bool, tokenizer: str = 'html.parser',
+               parser_class: Any = HTML2TypstParser,
+               assets: Optional[AssetStore] = None,
+               hoist_styles: bool = False) -> str:
+    """Run the parser over a complete document."""
+    # Pieces arrive with newline runs already collapsed
+    pieces: List[str] = []
+    _parse(html, debug, tokenizer, parser_class, OutputSink(pieces), assets, hoist_styles)
+    return ''.join(pieces)
+
+
+class _StyleCensus(HTML2TypstParser):
+    """
+    HTML2TypstParser that counts how a document's text is styled instead of
+    rendering it, for plan_style_hoisting().
+    """
+    
+    def __init__(self, context: RenderContext, sink: Optional[OutputSink] = None):
+        super().__init__(context, sink)
+        self.chars = 0  # Characters of text outside code
+        self.fonts: Dict[str, int] = {}
+        self.sizes: Dict[str, int] = {}
+        self.uses: Dict[StylePlan, int] = {}
+        # Text whose size is relative to the text around it
+        self.scaled = False
+    
+    def handle_data(self, data: str):
+        if not data.strip():
+            return
+        open_roles = self.open_roles
+        if self.context.in_pre or open_roles['code']:
+            self.scaled = True
+            if self.context.in_pre:
+                return
+        else:
+            self.chars += len(data)
+        if open_roles['heading'] or open_roles['script']:
+            self.scaled = True
+        spans = open_roles['span']
+        if not spans:
+            return
+        plan = spans[-1].style
+        self.uses[plan] = self.uses.get(plan, 0) + 1
+        if plan.font and not open_roles['code']:
+            self.fonts[plan.font] = self.fonts.get(plan.font, 0) + len(data)
+        if plan.size:
+            self.sizes[plan.size] = self.sizes.get(plan.size, 0) + len(data)
+
+
+def _survey_styles(document: 'ParsedDocument', debug: bool) -> _StyleHoisting:
+    """Take a census of a document's styles and decide which to hoist."""
+    census = _render(document, debug, _StyleCensus)
+    return plan_style_hoisting(census.chars, census.fonts,
+                               {} if census.scaled else census.sizes, census.uses)
+
+
+class _LimitedParser(HTML2TypstParser):
+    """
+    HTML2TypstParser that raises LimitExceeded when a budget runs out.
+    
+    Only translations with limits build one, so the regular parser carries
+    no checks. The deadline is shared by the parsers of one translation.
+    """
+    
+    def __init__(self, context: RenderContext, sink: Optional[OutputSink] = None,
+                 limits: Limits = Limits(), deadline: Optional[float] = None):
+        super().__init__(context, sink)
+        self.limits = limits
+        self.deadline = deadline
+        self.output_bytes = 0
+    
+    def check_deadline(self):
+        """Raise LimitExceeded once the translation's time is up."""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise LimitExceeded('max_seconds', self.limits.max_seconds)
+    
+    def emit(self, fragment: str):
+        super().emit(fragment)
+        maximum = self.limits.max_output_bytes
+        if maximum is not None:
+            self.output_bytes += (len(fragment) if fragment.isascii()
+                                  else len(fragment.encode('utf-8', 'surrogatepass')))
+            if self.output_bytes > maximum:
+                raise LimitExceeded('max_output_bytes', maximum)
+    
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self.check_deadline()
+        frame = super().handle_starttag(tag, attrs)
+        maximum = self.limits.max_depth
+        if maximum is not None and self.depth > maximum:
+            raise LimitExceeded('max_depth', maximum)
+        return frame
+    
+    def handle_endtag(self, tag: str):
+        self.check_deadline()
+        super().handle_endtag(tag)
+    
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self.check_deadline()
+        super().handle_startendtag(tag, attrs)
+    
+    def handle_data(self, data: str):
+        self.check_deadline()
+        super().handle_data(data)
+
+
+class _PlainTextParser(HTMLParser):
+    """Collects every text node as escaped markup, breaking paragraphs after blocks."""
+    
+    def __init__(self, sink: OutputSink):
+        super().__init__()
+        self.sink = sink
+        self.block_tags = HTML2TypstParser.registry.compiled().block_tags
+    
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self.handle_startendtag(tag, attrs)
+    
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag == 'br':
+            self.sink.write('\\\n')
+        elif tag == 'img':
+            alt = dict(attrs).get('alt')
+            if alt:
+                self.sink.write(escape_markup(alt))
+    
+    def handle_endtag(self, tag: str):
+        if tag in self.block_tags:
+            self.sink.write('\n\n')
+    
+    def handle_data(self, data: str):
+        # Whitespace between inline elements still separates words
+        self.sink.write(escape_markup(data) if data.strip() else ' ')
+
+
+def _plain_text(html: str) -> str:
+    """Render the text of a document as Typst paragraphs, without formatting."""
+    pieces: List[str] = []
+    parser = _PlainTextParser(OutputSink(pieces))
+    parser.feed(html)
+    parser.close()
+    return ''.join(pieces)
+
+
+# Kinds of the events in a ParsedDocument
+EVENT_START, EVENT_END, EVENT_SELF_CLOSING, EVENT_TEXT = range(4)
+
+# What each argument of an event kind indexes: t(ags), a(ttribute lists) or
+# (te)x(ts); ParsedDocument.from_bytes() checks each against its own table
+_EVENT_ARG_TABLES = {EVENT_START: b'ta', EVENT_END: b't', EVENT_SELF_CLOSING: b'ta',
+                     EVENT_TEXT: b'x'}
+
+# Leading bytes and layout version of serialized ParsedDocuments. The layout
+# only records tokenizer events, so it is independent of __version__: bump
+# DOCUMENT_FORMAT_VERSION when the layout changes, not the rendering rules.
+DOCUMENT_MAGIC = b'H2TD'
+DOCUMENT_FORMAT_VERSION = 1
+_DOCUMENT_HEADER = struct.Struct('<4sHH')  # Magic, format version, reserved
+_SECTION_SIZE = struct.Struct('<I')
+# Sections after the header: kinds, args, attribute words, then the ends
+# and UTF-8 bytes of the tag, attribute string and text tables
+_DOCUMENT_SECTIONS = 9
+_UINT32 = 'I' if array('I').itemsize == 4 else 'L'
+_NO_VALUE = 0xFFFFFFFF  # Attribute word of an attribute without a value
+
+
+def _pack_section(parts: List[bytes], data: Union[bytes, array]):
+    """Append a length-prefixed, 4-byte aligned little-endian section to parts."""
+    if isinstance(data, array):
+        if sys.byteorder == 'big' and data.itemsize > 1:
+            data = array(data.typecode, data)
+            data.byteswap()
+        data = data.tobytes()
+    parts.append(_SECTION_SIZE.pack(len(data)))
+    parts.append(data)
+    parts.append(b'\0' * (-len(data) % 4))
+
+
+def _pack_strings(parts: List[bytes], strings: List[str]):
+    """Append a string table: the end offset of each string, then their UTF-8 bytes."""
+    _pack_section(parts, array(_UINT32, accumulate(map(len, strings))))
+    _pack_section(parts, ''.join(strings).encode('utf-8', 'surrogatepass'))
+
+
+def _unpack_sections(view: memoryview) -> List[Tuple[int, int]]:
+    """Return the (start, end) offsets of the sections after the header."""
+    sections = []
+    pos = _DOCUMENT_HEADER.size
+    while pos < len(view):
+        if pos + _SECTION_SIZE.size > len(view):
+            raise ValueError('truncated ParsedDocument data')
+        size, = _SECTION_SIZE.unpack_from(view, pos)
+        start = pos + _SECTION_SIZE.size
+        pos = start + size + (-size % 4)
+        if pos > len(view):
+            raise ValueError('truncated ParsedDocument data')
+        sections.append((start, start + size))
+    if len(sections) != _DOCUMENT_SECTIONS:
+        raise ValueError(f'ParsedDocument data has {len(sections)} sections, '
+                         f'expected {_DOCUMENT_SECTIONS}')
+    return sections
+
+
+def _unpack_array(view: memoryview, section: Tuple[int, int], typecode: str) -> array:
+    """Copy a section out of view into an array of typecode."""
+    values = array(typecode)
+    # No slice of view outlives the call, so a memory map under it can close
+    values.frombytes(view[section[0]:section[1]])
+    if sys.byteorder == 'big' and values.itemsize > 1:
+        values.byteswap()
+    return values
+
+
+def _unpack_strings(view: memoryview, ends: Tuple[int, int], blob: Tuple[int, int]) -> List[str]:
+    """Decode a string table from its end offset and UTF-8 sections."""
+    offsets = _unpack_array(view, ends, _UINT32)
+    text = str(view[blob[0]:blob[1]], 'utf-8', 'surrogatepass')
+    if (offsets[-1] if offsets else 0) != len(text):
+        raise ValueError('ParsedDocument string table does not match its offsets')
+    return [text[start:end] for start, end in zip(chain((0,), offsets), offsets)]
+
+
+class ParsedDocument:
+    """
+    A tokenized HTML document as a compact stream of events.
+    
+    Holds the handle_starttag/handle_endtag/handle_startendtag/handle_data
+    calls a tokenizer made, so one parse can be rendered any number of
+    times, with different options or renderers, without tokenizing again.
+    Tag names, attribute lists and text nodes are interned in the tags,
+    attr_lists and texts tables. kinds holds one EVENT_* byte per event,
+    and args the table indexes of each event in order: a tag and an
+    attribute list for starts and self-closing tags, a tag for ends and a
+    text for text.
+    """
+    
+    def __init__(self):
+        self.kinds = array('B')
+        self.args = array(_UINT32)
+        self.tags: List[str] = []
+        self.attr_lists: List[List[Tuple[str, Optional[str]]]] = []
+        self.texts: List[str] = []
+    
+    def __len__(self) -> int:
+        return len(self.kinds)
+    
+    def replay(self, target: Any):
+        """Call target's handle_* methods with the recorded events, in order."""
+        tags = self.tags
+        attr_lists = self.attr_lists
+        texts = self.texts
+        handle_starttag = target.handle_starttag
+        handle_endtag = target.handle_endtag
+        handle_startendtag = target.handle_startendtag
+        handle_data = target.handle_data
+        args = iter(self.args)
+        # zip takes each event's first argument; starts take their second
+        for kind, first in zip(self.kinds, args):
+            if kind == EVENT_TEXT:
+                handle_data(texts[first])
+            elif kind == EVENT_START:
+                handle_starttag(tags[first], attr_lists[next(args)])
+            elif kind == EVENT_END:
+                handle_endtag(tags[first])
+            else:
+                handle_startendtag(tags[first], attr_lists[next(args)])
+    
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the document to DOCUMENT_FORMAT_VERSION bytes.
+        
+        The header (DOCUMENT_MAGIC, the format version) is followed by
+        length-prefixed, 4-byte aligned little-endian sections: the kinds
+        and args arrays, the attribute lists as words (a pair count, then
+        a name and a value index into the attribute string table per pair,
+        _NO_VALUE for a missing value), and the tag, attribute string and
+        text tables, each as the end offsets of its strings followed by
+        their UTF-8 bytes.
+        """
+        attr_strings: List[str] = []
+        attr_ids: Dict[str, int] = {}
+        words = array(_UINT32)
+        for attrs in self.attr_lists:
+            words.append(len(attrs))
+            for name, value in attrs:
+                for string in (name, value):
+                    if string is None:
+                        words.append(_NO_VALUE)
+                        continue
+                    index = attr_ids.get(string)
+                    if index is None:
+                        index = attr_ids[string] = len(attr_strings)
+                        attr_strings.append(string)
+                    words.append(index)
+        
+        parts = [_DOCUMENT_HEADER.pack(DOCUMENT_MAGIC, DOCUMENT_FORMAT_VERSION, 0)]
+        _pack_section(parts, self.kinds)
+        _pack_section(parts, self.args)
+        _pack_section(parts, words)
+        for strings in (self.tags, attr_strings, self.texts):
+            _pack_strings(parts, strings)
+        return b''.join(parts)
+    
+    @classmethod
+    def from_bytes(cls, data: Any) -> 'ParsedDocument':
+        """
+        Load a document serialized by to_bytes() from a bytes-like object,
+        such as bytes or an mmap.
+        
+        Raises:
+            ValueError: data is not a serialized ParsedDocument, has another
+                format version, or is truncated or inconsistent
+        """
+        with memoryview(data) as view:
+            if len(view) < _DOCUMENT_HEADER.size:
+                raise ValueError('not a serialized ParsedDocument')
+            magic, version, _ = _DOCUMENT_HEADER.unpack_from(view)
+            if magic != DOCUMENT_MAGIC:
+                raise ValueError('not a serialized ParsedDocument')
+            if version != DOCUMENT_FORMAT_VERSION:
+                raise ValueError(f'unsupported ParsedDocument format version {version}, '
+                                 f'expected {DOCUMENT_FORMAT_VERSION}')
+            sections = _unpack_sections(view)
+            document = cls()
+            document.kinds = _unpack_array(view, sections[0], 'B')
+            document.args = _unpack_array(view, sections[1], _UINT32)
+            words = _unpack_array(view, sections[2], _UINT32)
+            document.tags = _unpack_strings(view, sections[3], sections[4])
+            attr_strings = _unpack_strings(view, sections[5], sections[6])
+            document.texts = _unpack_strings(view, sections[7], sections[8])
+        
+        kinds = document.kinds
+        if len(document.args) != (len(kinds) + kinds.count(EVENT_START)
+                                  + kinds.count(EVENT_SELF_CLOSING)):
+            raise ValueError('ParsedDocument events do not match their arguments')
+        try:
+            pos = 0
+            while pos < len(words):
+                end = pos + 1 + 2 * words[pos]
+                document.attr_lists.append([
+                    (attr_strings[words[i]],
+                     None if words[i + 1] == _NO_VALUE else attr_strings[words[i + 1]])
+                    for i in range(pos + 1, end, 2)
+                ])
+                pos = end
+        except IndexError:
+            raise ValueError('ParsedDocument attribute lists are truncated') from None
+        document._check_references()
+        return document
+    
+    def _check_references(self):
+        """Raise ValueError unless every event argument indexes its own table."""
+        args = self.args
+        if not args:
+            return
+        top = max(args)
+        # Only tables some argument could overrun need checking
+        tables = [(ord(letter), size) for letter, size in
+                  (('t', len(self.tags)), ('a', len(self.attr_lists)), ('x', len(self.texts)))
+                  if size <= top]
+        if not tables and max(self.kinds) <= EVENT_TEXT:
+            return
+        # Spell out the table of each argument, one letter per argument
+        letters = bytes(self.kinds)
+        if letters.translate(None, bytes(_EVENT_ARG_TABLES)):
+            raise ValueError('ParsedDocument has events of unknown kinds')
+        for kind, kind_letters in _EVENT_ARG_TABLES.items():
+            letters = letters.replace(bytes([kind]), kind_letters)
+        for letter, size in tables:
+            keep = bytearray(256)
+            keep[letter] = 1
+            if max(itertools.compress(args, letters.translate(keep)), default=-1) >= size:
+                raise ValueError('ParsedDocument events refer past the end of their tables')
+
+
+class _EventRecorder(HTMLParser):
+    """Tokenizer that records the events it produces into a ParsedDocument."""
+    
+    def __init__(self):
+        super().__init__()
+        self.document = ParsedDocument()
+        self.tag_ids: Dict[str, int] = {}
+        self.attr_ids: Dict[Tuple[Tuple[str, Optional[str]], ...], int] = {}
+        self.text_ids: Dict[str, int] = {}
+    
+    def intern_tag(self, tag: str) -> int:
+        index = self.tag_ids.get(tag)
+        if index is None:
+            index = self.tag_ids[tag] = len(self.document.tags)
+            self.document.tags.append(tag)
+        return index
+    
+    def intern_attrs(self, attrs: List[Tuple[str, Optional[str]]]) -> int:
+        key = tuple(attrs)
+        index = self.attr_ids.get(key)
+        if index is None:
+            index = self.attr_ids[key] = len(self.document.attr_lists)
+            self.document.attr_lists.append(list(attrs))
+        return index
+    
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self.document.kinds.append(EVENT_START)
+        self.document.args.append(self.intern_tag(tag))
+        self.document.args.append(self.intern_attrs(attrs))
+    
+    def handle_endtag(self, tag: str):
+        self.document.kinds.append(EVENT_END)
+        self.document.args.append(self.intern_tag(tag))
+    
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self.document.kinds.append(EVENT_SELF_CLOSING)
+        self.document.args.append(self.intern_tag(tag))
+        self.document.args.append(self.intern_attrs(attrs))
+    
+    def handle_data(self, data: str):
+        index = self.text_ids.get(data)
+        if index is None:
+            index = self.text_ids[data] = len(self.document.texts)
+            self.document.texts.append(data)
+        self.document.kinds.append(EVENT_TEXT)
+        self.document.args.append(index)
+
+
+def parse_document(html: str, tokenizer: str = 'html.parser') -> ParsedDocument:
+    """
+    Tokenize an HTML document once, for rendering with render_typst() or
+    render_plain_text() as often as needed.
+    
+    Args:
+        html: HTML string to parse
+        tokenizer: 'html.parser' (default) or 'quill', as for
+            translate_html_to_typst()
+    
+    Returns:
+        The document's events
+    
+    Examples:
+        >>> document = parse_document('<p><span style="font-weight: 300;">Hi</span></p>')
+        >>> render_typst(document)
+        'Hi\\n\\n'
+        >>> render_typst(document, debug=True)
+        '/* unsupported styles: font-weight: 300 */ Hi\\n\\n'
+    """
+    if tokenizer not in TOKENIZERS:
+        raise ValueError(f'tokenizer must be one of {TOKENIZERS}, got {tokenizer!r}')
+    if tokenizer == 'quill':
+        recorder = _EventRecorder()
+        if feed_quill_subset(recorder, html):
+            return recorder.document
+    recorder = _EventRecorder()
+    recorder.feed(html)
+    recorder.close()
+    return recorder.document
+
+
+def render_typst(document: ParsedDocument, debug: bool = False, out: Any = None,
+                 assets: Optional[AssetStore] = None,
+                 hoist_styles: bool = False) -> Optional[str]:
+    """
+    Render a parsed document as Typst.
+    
+    The output equals translate_html_to_typst() of the parsed HTML with the
+    same options. debug, out, assets and hoist_styles work as they do there;
+    with hoist_styles, both passes replay the parsed events.
+    
+    Returns:
+        Typst code as a string, or None when written to ``out``
+    """
+    if out is not None:
+        _render(document, debug, sink=OutputSink(out), assets=assets, hoist_styles=hoist_styles)
+        return None
+    pieces: List[str] = []
+    _render(document, debug, sink=OutputSink(pieces), assets=assets, hoist_styles=hoist_styles)
+    return ''.join(pieces)
+
+
+def render_plain_text(document: ParsedDocument) -> str:
+    """Render the text of a parsed document as Typst paragraphs, without formatting."""
+    pieces: List[str] = []
+    document.replay(_PlainTextParser(OutputSink(pieces)))
+    return ''.join(pieces)
+
+
+def save_document(document: ParsedDocument, path: str):
+    """Write a parsed document to path in the ParsedDocument.to_bytes() format."""
+    # Written under a temporary name so a reader never sees a partial file
+    partial_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(partial_path, 'wb') as f:
+        f.write(document.to_bytes())
+    os.replace(partial_path, path)
+
+
+def load_document(path: str) -> ParsedDocument:
+    """
+    Load a parsed document written by save_document(), memory-mapping the
+    file, so it can be rendered again without tokenizing its HTML.
+    
+    Raises:
+        ValueError: The file is not a serialized ParsedDocument of this
+            format version
+    """
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files cannot be mapped
+            raise ValueError('not a serialized ParsedDocument') from None
+        with data:
+            return ParsedDocument.from_bytes(data)
+
+
+def _translate_within(html: str, debug: bool, tokenizer: str, limits: Limits,
+                      cache: Optional[Union[ResultCache, TranslationStore]],
+                      sink: Optional[OutputSink],
+                      assets: Optional[AssetStore] = None) -> Optional[str]:
+    """translate_html_to_typst() under resource limits."""
+    result = None
+    if cache is not None:
+        key = cache_key(html, debug)
+        result = cache.get(key)
+    if result is None:
+        deadline = None if limits.max_seconds is None else time.monotonic() + limits.max_seconds
+        parser_class = partial(_LimitedParser, limits=limits, deadline=deadline)
+        try:
+            limits.check_input(html)
+            if sink is not None and cache is None and limits.on_exceed == 'raise':
+                # Nothing to fall back to, so output can go out as it is made
+                _parse(html, debug, tokenizer, parser_class, sink, assets)
+                return None
+            result = _translate(html, debug, tokenizer, parser_class, assets)
+        except LimitExceeded:
+            if limits.on_exceed == 'raise':
+                raise
+            result = _plain_text(html)
+        else:
+            if cache is not None:
+                cache.put(key, result)
+    if sink is not None:
+        sink.write(result)
+        return None
+    return result
+
+
+# Handlers the parser calls directly; everything else in the parse is tokenizing
+_TOP_LEVEL_STAGES = ('handle_starttag', 'handle_endtag', 'handle_startendtag', 'handle_data')
 
 
 @dataclass
-class RenderContext:
-    """Context for rendering HTML nodes to Typst."""
-    debug: bool = False
-    in_ordered_list: bool = False
-    in_pre: bool = False
-    list_item_started: bool = False  # Track if we've output the list marker
+class TranslationStats:
+    """
+    Timing breakdown of one translation, from translate_html_to_typst(profile=True).
     
+    ``calls`` and ``seconds`` are keyed by stage. Stages:
     
-class HTML2TypstParser(HTMLParser):
-    """Parser that converts HTML to Typst."""
+    - the parser handlers handle_starttag, handle_endtag, handle_startendtag
+      and handle_data
+    - apply_span_styles, called inside handle_data
+    - parse_inline_styles: style plans compiled on a style_plan_cache miss,
+      inside handle_starttag. Cache hits are not counted.
+    - tokenize: parse time spent outside the handlers
+    - postprocess: joining the output pieces (newlines are collapsed as the
+      handlers write, so that time is part of theirs)
+    
+    Times are cumulative, so nested stages are also included in their callers.
+    """
+    calls: Dict[str, int] = field(default_factory=dict)
+    seconds: Dict[str, float] = field(default_factory=dict)
+    text_nodes: int = 0
+    max_depth: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    
+    def add(self, stage: str, seconds: float):
+        """Record one call of a stage."""
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+    
+    @property
+    def total_seconds(self) -> float:
+        """Wall time of the whole translation."""
+        return sum(self.seconds.get(stage, 0.0)
+                   for stage in _TOP_LEVEL_STAGES + ('tokenize', 'postprocess'))
+    
+    def report(self) -> str:
+        """Return the breakdown as a table, slowest stage first."""
+        total = self.total_seconds or 1.0
+        lines = [f"{'stage':<20} {'calls':>9} {'ms':>10} {'share':>7}"]
+        for stage, seconds in sorted(self.seconds.items(), key=lambda item: -item[1]):
+            lines.append(f"{stage:<20} {self.calls[stage]:>9} {seconds * 1000:>10.3f} "
+                         f"{seconds / total:>6.1%}")
+        lines.append(f"text nodes {self.text_nodes}, max depth {self.max_depth}, "
+                     f"{self.bytes_in} bytes in, {self.bytes_out} bytes out")
+        return '\n'.join(lines)
+
+
+class _ProfiledStylePlans:
+    """Style plan source that times the lookups which compile a new plan."""
+    
+    def __init__(self, cache: StylePlanCache, stats: TranslationStats):
+        self.cache = cache
+        self.stats = stats
+    
+    def get(self, class_str: str, style_str: str, debug: bool = False) -> StylePlan:
+        misses = self.cache.misses
+        start = time.perf_counter()
+        plan = self.cache.get(class_str, style_str, debug)
+        elapsed = time.perf_counter() - start
+        if self.cache.misses != misses:
+            self.stats.add('parse_inline_styles', elapsed)
+        return plan
+    
+    def nested(self, outer: StylePlan, inner: StylePlan) -> StylePlan:
+        return self.cache.nested(outer, inner)
+
+
+class _ProfilingParser(HTML2TypstParser):
+    """
+    HTML2TypstParser that times its handlers into ``self.stats``.
+    
+    Only profiled translations build one, so the regular parser carries no
+    timing code at all.
+    """
+    
+    def __init__(self, context: RenderContext, sink: Optional[OutputSink] = None):
+        super().__init__(context, sink)
+        self.stats = TranslationStats()
+        self.style_plans = _ProfiledStylePlans(style_plan_cache, self.stats)
     
-    def __init__(self, context: RenderContext):
-        super().__init__()
-        self.context = context
-        self.result: List[str] = []
-        self.tag_stack: List[Tuple[str, Dict[str, str]]] = []  # (tag, attrs)
-        
     def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
-        """Handle opening HTML tags."""
-        attr_dict = {k: v or '' for k, v in attrs}
-        self.tag_stack.append((tag, attr_dict))
-        
-        # Handle tags that produce output at start
-        if tag == 'br':
-            self.result.append('\\\n')
-        elif tag == 'ol':
-            self.context.in_ordered_list = True
-        elif tag == 'pre':
-            self.context.in_pre = True
-            self.result.append('```\n')
-        elif tag == 'li':
-            self.context.list_item_started = False  # Reset for new list item
+        start = time.perf_counter()
+        frame = super().handle_starttag(tag, attrs)
+        self.stats.add('handle_starttag', time.perf_counter() - start)
+        if self.depth > self.stats.max_depth:
+            self.stats.max_depth = self.depth
+        return frame
     
     def handle_endtag(self, tag: str):
-        """Handle closing HTML tags."""
-        # Find matching opening tag
-        for i in range(len(self.tag_stack) - 1, -1, -1):
-            if self.tag_stack[i][0] == tag:
-                opening_tag, attrs = self.tag_stack.pop(i)
-                
-                # Handle tags that produce output at end
-                if tag in ('p', 'div'):
-                    self.result.append('\n\n')
-                elif tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
-                    self.result.append('\n\n')
-                elif tag == 'li':
-                    self.result.append('\n')
-                elif tag == 'blockquote':
-                    self.result.append('\n\n')
-                elif tag == 'pre':
-                    self.result.append('```\n\n')
-                    self.context.in_pre = False
-                elif tag == 'ol':
-                    self.context.in_ordered_list = False
-                
-                break
+        start = time.perf_counter()
+        super().handle_endtag(tag)
+        self.stats.add('handle_endtag', time.perf_counter() - start)
     
     def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
-        """Handle self-closing tags."""
-        attr_dict = {k: v or '' for k, v in attrs}
-        
-        if tag == 'br':
-            self.result.append('\\\n')
-        elif tag == 'img':
-            alt = attr_dict.get('alt', '')
-            src = attr_dict.get('src', '')
-            if src:
-                if alt:
-                    self.result.append(f'#image("{src}", alt: "{alt}")\n\n')
-                else:
-                    self.result.append(f'#image("{src}")\n\n')
-            elif alt:
-                self.result.append(alt)
-            elif self.context.debug:
-                self.result.append('/* image without src or alt */\n')
+        start = time.perf_counter()
+        super().handle_startendtag(tag, attrs)
+        self.stats.add('handle_startendtag', time.perf_counter() - start)
     
     def handle_data(self, data: str):
-        """Handle text content."""
-        if not data.strip():
-            return
+        start = time.perf_counter()
+        super().handle_data(data)
+        self.stats.add('handle_data', time.perf_counter() - start)
+        self.stats.text_nodes += 1
+    
+    def apply_span_styles(self, content: str, frame: ElementFrame) -> str:
+        start = time.perf_counter()
+        result = super().apply_span_styles(content, frame)
+        self.stats.add('apply_span_styles', time.perf_counter() - start)
+        return result
+
+
+def _profile(html: str, debug: bool, tokenizer: str,
+             sink: Optional[OutputSink] = None,
+             assets: Optional[AssetStore] = None) -> Tuple[Optional[str], TranslationStats]:
+    """Translate a document with a profiling parser and return the stats too."""
+    pieces: List[str] = []
+    # Count the output on its way to the target
+    target = sink._write if sink is not None else pieces.append
+    bytes_out = 0
+    
+    def write(piece: str):
+        nonlocal bytes_out
+        bytes_out += len(piece.encode('utf-8', 'surrogatepass'))
+        target(piece)
+    
+    start = time.perf_counter()
+    parser = _parse(html, debug, tokenizer, _ProfilingParser, OutputSink(write), assets)
+    parsed = time.perf_counter()
+    result = ''.join(pieces) if sink is None else None
+    finished = time.perf_counter()
+    
+    stats = parser.stats
+    handlers = sum(stats.seconds.get(stage, 0.0) for stage in _TOP_LEVEL_STAGES)
+    stats.add('tokenize', max(0.0, parsed - start - handlers))
+    stats.add('postprocess', finished - parsed)
+    stats.bytes_in = len(html.encode('utf-8', 'surrogatepass'))
+    stats.bytes_out = bytes_out
+    return result, stats
+
+
+def _translate_chunk(htmls: List[str], debug: bool, return_exceptions: bool) -> List[Any]:
+    """Translate a chunk of documents, optionally capturing per-item errors."""
+    results = []
+    for html in htmls:
+        try:
+            results.append(translate_html_to_typst(html, debug=debug))
+        except Exception as exc:
+            if not return_exceptions:
+                raise
+            results.append(exc)
+    return results
+
+
+def translate_many(htmls: Iterable[str], debug: bool = False, workers: Optional[int] = 1,
+                   chunksize: int = 32, return_exceptions: bool = False) -> Iterator[Any]:
+    """
+    Translate many HTML documents, yielding Typst results in input order.
+    
+    The input is consumed lazily, so generators of stored documents can be
+    streamed through without materializing them.
+    
+    Args:
+        htmls: Iterable of HTML strings to convert
+        debug: If True, include debug comments and warnings in output
+        workers: Number of worker processes; 1 translates in-process with no
+            pool, None uses one worker per CPU
+        chunksize: Number of documents sent to a worker per task
+        return_exceptions: If True, a document that fails to translate yields
+            its exception instead of aborting the batch
+    
+    Returns:
+        Iterator over Typst strings (or exceptions, see return_exceptions)
+    
+    Examples:
+        >>> list(translate_many(["<p>One</p>", "<p>Two</p>"]))
+        ['One\\n\\n', 'Two\\n\\n']
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f'workers must be at least 1, got {workers}')
+    if chunksize < 1:
+        raise ValueError(f'chunksize must be at least 1, got {chunksize}')
+    
+    if workers == 1:
+        return _translate_in_process(htmls, debug, return_exceptions)
+    return _translate_in_pool(htmls, debug, workers, chunksize, return_exceptions)
+
+
+def _translate_in_process(htmls: Iterable[str], debug: bool,
+                          return_exceptions: bool) -> Iterator[Any]:
+    """Translate documents one by one in the calling process."""
+    for html in htmls:
+        try:
+            yield translate_html_to_typst(html, debug=debug)
+        except Exception as exc:
+            if not return_exceptions:
+                raise
+            yield exc
+
+
+def _translate_in_pool(htmls: Iterable[str], debug: bool, workers: int, chunksize: int,
+                       return_exceptions: bool) -> Iterator[Any]:
+    """Translate documents in a process pool, keeping a bounded window of chunks in flight."""
+    items = iter(htmls)
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque()
+        try:
+            while True:
+                while len(pending) < max_pending:
+                    chunk = list(islice(items, chunksize))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_translate_chunk, chunk, debug, return_exceptions))
+                if not pending:
+                    return
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class AsyncTranslator:
+    """
+    Run translations from asyncio code without blocking the event loop.
+    
+    Documents at or above ``inline_threshold`` characters are offloaded to
+    ``executor`` (the loop's default thread pool when None; pass a
+    ProcessPoolExecutor to keep CPU work off the loop's process entirely).
+    At most ``max_concurrency`` offloaded translations run at once per event
+    loop. Smaller documents are translated inline, which is cheaper than an
+    executor round-trip.
+    """
+    
+    def __init__(self, executor: Optional[Executor] = None, max_concurrency: int = 4,
+                 inline_threshold: int = 8192, timeout: Optional[float] = None):
+        if max_concurrency < 1:
+            raise ValueError(f'max_concurrency must be at least 1, got {max_concurrency}')
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.inline_threshold = inline_threshold
+        self.timeout = timeout
+        # asyncio primitives are bound to one loop, so keep one per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+    
+    def _semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        """Return the concurrency limiter for the given event loop."""
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+    
+    async def translate(self, html: str, debug: bool = False,
+                        timeout: Optional[float] = None) -> str:
+        """
+        Translate one document.
         
-        # Get current context
-        text = data
-        
-        # Check if we need to use function syntax instead of markup syntax
-        # This is needed when the previous output ends with ] (from a function call)
-        # or * or _ (from markup) to avoid delimiter collision errors in Typst
-        use_function_syntax = False
-        if self.result and len(self.result) > 0:
-            last_stripped = self.result[-1].rstrip() if self.result[-1] else ''
-            last_char = last_stripped[-1:] if last_stripped else ''
-            # Use function syntax if previous output ends with ], *, or _
-            # This prevents patterns like ]*text*, **text*, or __text_
-            if last_char in (']', '*', '_'):
-                use_function_syntax = True
-        
-        # Check for nested bold/italic to avoid delimiter collisions
-        # If we have both strong and em in the tag stack, we must use function syntax
-        # to prevent patterns like *_text_* or _*text*_
-        has_strong = any(tag in ('strong', 'b') for tag, _ in self.tag_stack)
-        has_em = any(tag in ('em', 'i') for tag, _ in self.tag_stack)
-        if has_strong and has_em:
-            use_function_syntax = True
-        
-        # Escape literal asterisks and underscores in plain text
-        # Do this BEFORE applying formatting to avoid escaping formatting delimiters
-        # Escape backslashes first to avoid double-escaping
-        text = text.replace('\\', '\\\\')
-        # Escape asterisks and underscores
-        text = text.replace('*', r'\*')
-        text = text.replace('_', r'\_')
-        
-        # Apply formatting based on tag stack
-        for tag, attrs in reversed(self.tag_stack):
-            if tag in ('strong', 'b'):
-                if use_function_syntax:
-                    text = f'#strong[{text}]'
-                else:
-                    text = f'*{text}*'
-                break
+        Args:
+            html: HTML string to convert
+            debug: If True, include debug comments and warnings in output
+            timeout: Seconds to wait for an offloaded translation (defaults
+                to the translator's timeout); raises asyncio.TimeoutError.
+                The time spent waiting for a concurrency slot is included. A
+                translation that already started keeps its slot until it ends.
         
-        for tag, attrs in reversed(self.tag_stack):
-            if tag in ('em', 'i'):
-                if use_function_syntax:
-                    text = f'#emph[{text}]'
-                else:
-                    text = f'_{text}_'
-                break
-        
-        # Handle superscript and subscript (must be processed after bold/italic)
-        for tag, attrs in reversed(self.tag_stack):
-            if tag == 'sup':
-                text = f'#super[{text}]'
-                break
-            elif tag == 'sub':
-                text = f'#sub[{text}]'
-                break
-        
-        # Handle headings
-        for tag, attrs in reversed(self.tag_stack):
-            if tag.startswith('h') and len(tag) == 2 and tag[1].isdigit():
-                level = int(tag[1])
-                prefix = '=' * level
-                text = f'{prefix} {data}'  # Use original data
-                break
-        
-        # Handle list items
-        for tag, attrs in reversed(self.tag_stack):
-            if tag == 'li':
-                # Only add marker if this is the first text in the list item
-                if not self.context.list_item_started:
-                    # Check for indent
-                    classes = attrs.get('class', '').split()
-                    indent_level = 0
-                    for cls in classes:
-                        if cls.startswith('ql-indent-'):
-                            try:
-                                indent_level = int(cls.replace('ql-indent-', ''))
-                            except ValueError:
-                                pass
-                            break
-                    
-                    indent = '  ' * indent_level
-                    marker = '+' if self.context.in_ordered_list else '-'
-                    text = f'{indent}{marker} {text}'
-                    self.context.list_item_started = True
-                break
-        
-        # Handle blockquote
-        for tag, attrs in reversed(self.tag_stack):
-            if tag == 'blockquote':
-                text = f'> {text}'
-                break
-        
-        # Handle inline code
-        for tag, attrs in reversed(self.tag_stack):
-            if tag == 'code' and not self.context.in_pre:
-                text = f'`{text}`'
-                break
-        
-        # Handle links
-        for tag, attrs in reversed(self.tag_stack):
-            if tag == 'a':
-                href = attrs.get('href', '')
-                if href:
-                    text = f'#link("{href}")[{text}]'
-                elif self.context.debug:
-                    text = f'/* link without href */ {text}'
-                # else: text stays as is
-                break
-        
-        # Handle spans with styles
-        for tag, attrs in reversed(self.tag_stack):
-            if tag == 'span':
-                text = self.apply_span_styles(text, attrs)
-                break
-        
-        # Handle paragraph alignment
-        for tag, attrs in reversed(self.tag_stack):
-            if tag in ('p', 'div', 'li'):
-                classes = attrs.get('class', '').split()
-                align = None
-                for cls in classes:
-                    if cls.startswith('ql-align-'):
-                        align = cls.replace('ql-align-', '')
-                        break
-                
-                if not align:
-                    style_str = attrs.get('style', '')
-                    styles = self.parse_inline_styles(style_str)
-                    align = styles.get('text-align')
-                
-                if align in ('center', 'right'):
-                    # For list items with alignment, we handle it differently
-                    if tag == 'li':
-                        # Just note it in debug mode
-                        if self.context.debug and align not in ('left',):
-                            text = f'/* list item with alignment: {align} */ {text}'
-                    else:
-                        text = f'#align({align})[{text}]'
-                elif align and align != 'left' and self.context.debug:
-                    text = f'/* unknown alignment: {align} */ {text}'
-                break
+        Returns:
+            Typst code as a string
+        """
+        if len(html) < self.inline_threshold:
+            return translate_html_to_typst(html, debug)
         
-        # Add spacing to avoid Typst syntax errors and improve readability
-        # After a closing bracket ] or paren ), add a space before most text
-        if self.result and len(self.result) > 0:
-            last_stripped = self.result[-1].rstrip() if self.result[-1] else ''
-            last_char = last_stripped[-1:] if last_stripped else ''
-            first_stripped = text.lstrip() if text else ''
-            first_char = first_stripped[:1] if first_stripped else ''
-            first_two_chars = first_stripped[:2] if len(first_stripped) >= 2 else ''
-            
-            # Add space if last char is ] or ) and next text doesn't start with certain safe chars
-            # Safe chars after ]: newline, space (already handled by lstrip), and certain punctuation
-            if last_char in (']', ')') and first_char and first_char not in ('\n', ',', '.', ';', ':', '!', '?', ')', ']'):
-                self.result.append(' ')
-            
-            # Add space before block comments (/*) if previous char is * or /
-            # This prevents patterns like *//* which cause "unexpected end of block comment" errors
-            if first_two_chars == '/*' and last_char in ('*', '/'):
-                self.result.append(' ')
+        if timeout is None:
+            timeout = self.timeout
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(self._offload(loop, html, debug), timeout)
+    
+    async def _offload(self, loop: asyncio.AbstractEventLoop, html: str, debug: bool) -> str:
+        """Run a translation in the executor once a concurrency slot is free."""
+        semaphore = self._semaphore(loop)
+        await semaphore.acquire()
+        try:
+            job = loop.run_in_executor(self.executor, translate_html_to_typst, html, debug)
+        except BaseException:
+            semaphore.release()
+            raise
         
-        self.result.append(text)
+        def finished(job: asyncio.Future):
+            semaphore.release()
+            if not job.cancelled():
+                job.exception()  # Retrieved here in case the caller timed out
+        
+        # A timeout cannot stop the job once it runs, so the slot is only
+        # freed when the job itself finishes, not when the caller gives up
+        job.add_done_callback(finished)
+        return await asyncio.shield(job)
     
-    def apply_span_styles(self, content: str, attrs: Dict[str, str]) -> str:
-        """Apply span styles to content."""
-        if not content:
+    async def translate_many(self, htmls: Iterable[str], debug: bool = False,
+                             timeout: Optional[float] = None,
+                             return_exceptions: bool = False) -> List[Any]:
+        """
+        Translate several documents concurrently, returning results in input order.
+        
+        With return_exceptions=True a failing or timed-out document yields its
+        exception instead of aborting the batch.
+        """
+        return await asyncio.gather(
+            *(self.translate(html, debug, timeout) for html in htmls),
+            return_exceptions=return_exceptions,
+        )
+
+
+default_async_translator = AsyncTranslator()
+
+
+async def atranslate_html_to_typst(html: str, debug: bool = False,
+                                   timeout: Optional[float] = None,
+                                   translator: Optional[AsyncTranslator] = None) -> str:
+    """
+    Asynchronously translate HTML (generated by Quill.js) to Typst code.
+    
+    Uses ``default_async_translator`` unless another AsyncTranslator is given.
+    
+    Examples:
+        >>> asyncio.run(atranslate_html_to_typst("<p>Hello</p>"))
+        'Hello\\n\\n'
+    """
+    translator = translator or default_async_translator
+    return await translator.translate(html, debug, timeout)
+
+
+async def atranslate_many(htmls: Iterable[str], debug: bool = False,
+                          timeout: Optional[float] = None, return_exceptions: bool = False,
+                          translator: Optional[AsyncTranslator] = None) -> List[Any]:
+    """Asynchronously translate several documents, returning results in input order."""
+    translator = translator or default_async_translator
+    return await translator.translate_many(htmls, debug, timeout, return_exceptions)
+
+
+# A complete start or end tag, as the remainder after the last '<' of a chunk
+_COMPLETE_TAG_TAIL = re.compile(r'/?[a-zA-Z][^<>]*>\Z')
+
+
+class _StreamingParser(HTML2TypstParser):
+    """Parser variant that can be fed arbitrary chunks.
+    
+    HTMLParser reports text as soon as a chunk ends, so one text node could
+    arrive as several handle_data calls. Input is therefore only passed on up
+    to the last '<' of what has been fed (or entirely, when it ends with a
+    complete tag), so every text node reaches the parser whole and is
+    rendered exactly as in a one-shot parse. Chunks that cannot release
+    anything are only appended to the held list, so a long text node fed
+    in many chunks is joined once rather than once per chunk.
+    """
+    
+    def __init__(self, context: RenderContext):
+        super().__init__(context)
+        # Trailing input that may end mid-text, as fed; it never contains '<'
+        self.held: List[str] = []
+        # Whether held contains '>', so it cannot be the rest of a start tag
+        self.held_gt = False
+        self.block_end = 0  # Fragments in result that belong to closed blocks
+    
+    def feed(self, data: str):
+        """Pass on the input up to a point where no text node can be cut."""
+        if '<' not in data and (self.held_gt or not data.endswith('>')):
+            # No '<' to cut after, and no tag this chunk could complete
+            if data:
+                self.held.append(data)
+                self.held_gt = self.held_gt or '>' in data
+            return
+        if self.held:
+            data = ''.join(self.held) + data
+        cut = data.rfind('<') + 1
+        if cut and _COMPLETE_TAG_TAIL.match(data, cut):
+            cut = len(data)
+        rest = data[cut:]
+        self.held = [rest] if rest else []
+        self.held_gt = '>' in rest
+        if cut:
+            super().feed(data[:cut])
+    
+    def handle_endtag(self, tag: str):
+        """Handle the closing tag and mark where a block ended."""
+        super().handle_endtag(tag)
+        # Nothing inside a code block is flushed: its opening fence may
+        # still be lengthened when the block closes. Neither is a text run
+        # that a stray end tag left open to the next text node, nor a line
+        # it left unfinished, which the next text may have to be separated
+        # from.
+        result = self.result
+        if (tag in self.block_tags and not self.context.in_pre
+                and self.run_end != len(result)
+                and (not result or result[-1][-1:].isspace())):
+            self.block_end = len(result)
+    
+    def close(self):
+        """Feed the held input and flush the tokenizer."""
+        super().feed(''.join(self.held))
+        self.held = []
+        self.held_gt = False
+        super().close()
+        self.block_end = len(self.result)
+
+
+class StreamingTranslator:
+    """
+    Translate HTML fed in chunks, returning Typst as blocks complete.
+    
+    Output for a block is returned once its closing tag (``</p>``, ``</li>``,
+    ``</h1>``...``</h6>``, ``</pre>``, ``</blockquote>``, ``</div>``) has been
+    fed, so memory is bounded by the largest open block rather than the
+    document. The concatenated output equals translate_html_to_typst() on
+    the concatenated input.
+    
+    Examples:
+        >>> stream = StreamingTranslator()
+        >>> stream.feed("<p>Hello</p><p>wor")
+        'Hello\\n\\n'
+        >>> stream.feed("ld</p>") + stream.close()
+        'world\\n\\n'
+    """
+    
+    def __init__(self, debug: bool = False, assets: Optional[AssetStore] = None):
+        self.parser = _StreamingParser(RenderContext(debug=debug, assets=assets))
+        self.collapser = NewlineCollapser()
+    
+    def _take(self, end: int) -> str:
+        """Remove and return the first ``end`` output fragments."""
+        result = self.parser.result
+        text = ''.join(result[:end])
+        del result[:end]
+        self.parser.block_end = 0
+        self.parser.raw_fence -= end
+        self.parser.run_end -= end
+        self.parser.space_at -= end
+        return self.collapser.write(text)
+    
+    def feed(self, chunk: str) -> str:
+        """Feed an HTML chunk; return the Typst for blocks it completed."""
+        self.parser.feed(chunk)
+        if not self.parser.block_end:
             return ''
+        return self._take(self.parser.block_end)
+    
+    def close(self) -> str:
+        """Finish parsing and return the remaining Typst."""
+        self.parser.close()
+        return self._take(len(self.parser.result))
+
+
+def translate_stream(chunks: Iterable[str], debug: bool = False,
+                     assets: Optional[AssetStore] = None) -> Iterator[str]:
+    """
+    Translate an iterable of HTML chunks, yielding Typst pieces as blocks close.
+    
+    Args:
+        chunks: HTML text in pieces, e.g. read from a file or socket
+        debug: If True, include debug comments and warnings in output
+        assets: Optional AssetStore for images embedded as data: URIs
+    
+    Returns:
+        Iterator over non-empty Typst pieces
+    """
+    stream = StreamingTranslator(debug=debug, assets=assets)
+    for chunk in chunks:
+        text = stream.feed(chunk)
+        if text:
+            yield text
+    text = stream.close()
+    if text:
+        yield text
+
+
+# Size of the pieces the CLI reads from its input
+CLI_CHUNK_SIZE = 1 << 20
+
+
+def _read_file_chunks(path: str, chunk_size: int = CLI_CHUNK_SIZE) -> Iterator[str]:
+    """Yield the UTF-8 text of a file in chunks, memory-mapping it when possible."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files cannot be mapped
+            return
+        with data:
+            for start in range(0, len(data), chunk_size):
+                yield decoder.decode(data[start:start + chunk_size])
+    yield decoder.decode(b'', final=True)
+
+
+def convert_file(source: str, target: str, debug: bool = False,
+                 assets: Optional[AssetStore] = None) -> Tuple[int, int]:
+    """
+    Translate an HTML file into a Typst file, streaming both sides.
+    
+    Returns:
+        (input bytes, output characters)
+    """
+    written = 0
+    with open(target, 'w', encoding='utf-8') as out:
+        for piece in translate_stream(_read_file_chunks(source), debug=debug, assets=assets):
+            out.write(piece)
+            written += len(piece)
+    return os.path.getsize(source), written
+
+
+def _relative_assets(assets_dir: str, target: str) -> AssetStore:
+    """Return an AssetStore for assets_dir whose paths resolve from the Typst file target."""
+    relative = os.path.relpath(assets_dir, os.path.dirname(os.path.abspath(target)))
+    return AssetStore(assets_dir, prefix=relative.replace(os.sep, '/') + '/')
+
+
+def _convert_job(job: Tuple[str, str, bool, Optional[str]]) -> Tuple[str, int, int, Optional[str]]:
+    """Convert one file for convert_directory, capturing the error if it fails."""
+    source, target, debug, assets_dir = job
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        assets = None if assets_dir is None else _relative_assets(assets_dir, target)
+        size_in, size_out = convert_file(source, target, debug, assets)
+        return source, size_in, size_out, None
+    except Exception as exc:
+        return source, 0, 0, f'{type(exc).__name__}: {exc}'
+
+
+def convert_directory(source_dir: str, target_dir: str, debug: bool = False,
+                      workers: Optional[int] = None, pattern: str = '*.html',
+                      assets_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Translate every file matching ``pattern`` under ``source_dir``.
+    
+    The directory tree is mirrored under ``target_dir`` with ``.typ`` files.
+    Files are converted by a pool of ``workers`` processes (one per CPU when
+    None; 1 converts in-process). With ``assets_dir``, images embedded as
+    data: URIs are extracted there, one file per distinct image across the
+    whole tree, and referenced by paths relative to each Typst file.
+    
+    Returns:
+        Summary with 'files', 'bytes', 'seconds' and 'errors' (list of
+        (path, message) pairs)
+    """
+    jobs = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if fnmatch.fnmatch(name, pattern):
+                source = os.path.join(root, name)
+                relative = os.path.relpath(source, source_dir)
+                target = os.path.join(target_dir, os.path.splitext(relative)[0] + '.typ')
+                jobs.append((source, target, debug, assets_dir))
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1 or len(jobs) < 2:
+        outcomes = [_convert_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(jobs) // (workers * 8))
+            outcomes = list(executor.map(_convert_job, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    
+    return {
+        'files': sum(1 for outcome in outcomes if outcome[3] is None),
+        'bytes': sum(outcome[1] for outcome in outcomes),
+        'seconds': elapsed,
+        'errors': [(outcome[0], outcome[3]) for outcome in outcomes if outcome[3] is not None],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point: ``python -m html2typst``."""
+    parser = argparse.ArgumentParser(
+        prog='html2typst',
+        description='Convert Quill.js HTML to Typst. Converts a single file '
+                    '(or stdin) or, when INPUT is a directory, a whole tree.',
+    )
+    parser.add_argument('input', nargs='?', default='-',
+                        help='HTML file, directory, or - for stdin (default)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='Typst file, or output directory in directory mode '
+                             '(default: stdout)')
+    parser.add_argument('--debug', action='store_true',
+                        help='include debug comments and warnings in the output')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes in directory mode (default: one per CPU)')
+    parser.add_argument('--pattern', default='*.html',
+                        help='file name pattern in directory mode (default: *.html)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print a per-stage timing breakdown to stderr '
+                             '(reads the whole input instead of streaming it)')
+    parser.add_argument('--assets', metavar='DIR', default=None,
+                        help='extract images embedded as data: URIs into DIR, '
+                             'one file per distinct image')
+    args = parser.parse_args(argv)
+    
+    if os.path.isdir(args.input):
+        if args.output == '-':
+            parser.error('directory mode requires -o OUTPUT_DIR')
+        if args.profile:
+            parser.error('--profile works on a single file')
+        if args.workers is not None and args.workers < 1:
+            parser.error('--workers must be at least 1')
+        summary = convert_directory(args.input, args.output, debug=args.debug,
+                                    workers=args.workers, pattern=args.pattern,
+                                    assets_dir=args.assets)
+        for path, message in summary['errors']:
+            print(f'error: {path}: {message}', file=sys.stderr)
+        seconds = max(summary['seconds'], 1e-9)
+        megabytes = summary['bytes'] / 1e6
+        print(f"{summary['files']} files, {megabytes:.2f} MB in {seconds:.2f} s "
+              f"({summary['files'] / seconds:.1f} files/s, {megabytes / seconds:.2f} MB/s)",
+              file=sys.stderr)
+        return 1 if summary['errors'] else 0
+    
+    if args.input == '-':
+        chunks = iter(lambda: sys.stdin.read(CLI_CHUNK_SIZE), '')
+    else:
+        chunks = _read_file_chunks(args.input)
+    assets = None
+    if args.assets is not None:
+        assets = (AssetStore(args.assets) if args.output == '-'
+                  else _relative_assets(args.assets, args.output))
+    if args.profile:
+        result, stats = translate_html_to_typst(''.join(chunks), debug=args.debug, profile=True,
+                                                assets=assets)
+        print(stats.report(), file=sys.stderr)
+        pieces = iter([result])
+    else:
+        pieces = translate_stream(chunks, debug=args.debug, assets=assets)
+    if args.output == '-':
+        for piece in pieces:
+            sys.stdout.write(piece)
+        sys.stdout.flush()
+    else:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            for piece in pieces:
+                out.write(piece)
+    return 0
+
+
+# Closing tags that can end a top-level block of Quill output
+_TOP_LEVEL_BLOCK_END = re.compile(r'</(?:p|div|h[1-6]|ol|ul|pre|blockquote)\s*>', re.IGNORECASE)
+
+
+class IncrementalTranslator:
+    """
+    Re-translate a document after edits, reusing the Typst of unchanged blocks.
+    
+    Meant for live previews that resend the whole document on every change.
+    The input is split after top-level block closing tags; each block's Typst
+    is cached by its content together with the rendering state it starts in
+    (RenderContext flags and the last emitted character), and with the state
+    it leaves behind. Blocks are only cached when they end with no element
+    left open, so malformed markup is simply re-parsed. Output is identical
+    to translate_html_to_typst() on the same input.
+    
+    Examples:
+        >>> preview = IncrementalTranslator()
+        >>> preview.update("<p>One</p><p>Two</p>")
+        'One\\n\\nTwo\\n\\n'
+        >>> preview.update("<p>One</p><p>Two!</p>")  # Only the second block is parsed
+        'One\\n\\nTwo!\\n\\n'
+    """
+    
+    def __init__(self, debug: bool = False):
+        self.debug = debug
+        # (block html, entry state) -> (typst, exit state)
+        self.blocks: Dict[Tuple[str, Tuple], Tuple[str, Tuple]] = {}
+        self.reused = 0  # Blocks reused by the last update
+        self.translated = 0  # Blocks parsed by the last update
+    
+    def _parser(self, state: Tuple) -> '_StreamingParser':
+        """Create a parser that resumes rendering from a block boundary state."""
+        in_ordered_list, in_pre, list_item_started, last_char = state
+        context = RenderContext(debug=self.debug, in_ordered_list=in_ordered_list,
+                                in_pre=in_pre, list_item_started=list_item_started)
+        parser = _StreamingParser(context)
+        parser.last_char = last_char
+        return parser
+    
+    @staticmethod
+    def _state(parser: '_StreamingParser') -> Optional[Tuple]:
+        """Return the parser's state at a block boundary, or None if mid-element, mid-run or mid-line."""
+        # Output that does not end in whitespace was left by a stray end tag:
+        # the next text may have to be separated from its last fragment
+        if (parser.depth or parser.rawdata or parser.held or parser.cdata_elem
+                or parser.run_end == len(parser.result)
+                or (parser.result and not parser.result[-1][-1:].isspace())):
+            return None
+        context = parser.context
+        return (context.in_ordered_list, context.in_pre, context.list_item_started,
+                parser.last_char)
+    
+    def update(self, html: str) -> str:
+        """Translate the current version of the document."""
+        blocks = {}
+        # Cached blocks hold uncollapsed Typst; newline runs spanning block
+        # boundaries are collapsed as the pieces are written
+        pieces: List[str] = []
+        sink = OutputSink(pieces)
+        state = (False, False, False, '')
+        parser = None  # Live parser while inside an unfinished block
+        start = 0
+        reused = translated = 0
         
-        classes = attrs.get('class', '').split()
-        style_str = attrs.get('style', '')
-        styles = self.parse_inline_styles(style_str)
-        
-        result = content
-        wrappers = []
-        unsupported = []
-        
-        # Handle color
-        if 'color' in styles:
-            color = styles['color']
-            if color and color != 'windowtext':
-                wrappers.append(f'#text(fill: {color})')
-            elif color == 'windowtext' and self.context.debug:
-                unsupported.append(f'color: {color}')
-        
-        # Handle background-color
-        if 'background-color' in styles:
-            bgcolor = styles['background-color']
-            if bgcolor:
-                wrappers.append(f'#highlight(fill: {bgcolor})')
-        
-        # Handle font-size
-        size = None
-        for cls in classes:
-            if cls.startswith('ql-size-'):
-                size = cls.replace('ql-size-', '')
-                break
-        
-        if not size and 'font-size' in styles:
-            size = styles['font-size']
-        
-        if size:
-            size_map = {
-                'small': '0.75em',
-                'large': '1.5em',
-                'huge': '2.5em',
-            }
-            typst_size = size_map.get(size, size)
-            wrappers.append(f'#text(size: {typst_size})')
-        
-        # Handle font-family
-        font = None
-        for cls in classes:
-            if cls.startswith('ql-font-'):
-                font = cls.replace('ql-font-', '')
-                break
-        
-        if not font and 'font-family' in styles:
-            font = styles['font-family']
-        
-        if font:
-            font = font.strip('\'"')
-            wrappers.append(f'#text(font: "{font}")')
-        
-        # Handle font-weight (bold)
-        if 'font-weight' in styles:
-            weight = styles['font-weight']
-            if weight in ('bold', '700', '800', '900'):
-                result = f'*{result}*'
-            elif self.context.debug:
-                unsupported.append(f'font-weight: {weight}')
-        
-        # Handle font-style (italic)
-        if 'font-style' in styles:
-            style = styles['font-style']
-            if style == 'italic':
-                result = f'_{result}_'
-            elif self.context.debug:
-                unsupported.append(f'font-style: {style}')
-        
-        # Apply wrappers
-        for wrapper in reversed(wrappers):
-            result = f'{wrapper}[{result}]'
-        
-        # Add debug info
-        if unsupported and self.context.debug:
-            result = f'/* unsupported styles: {", ".join(unsupported)} */ {result}'
+        for match in _TOP_LEVEL_BLOCK_END.finditer(html):
+            segment = html[start:match.end()]
+            start = match.end()
+            if parser is None:
+                key = (segment, state)
+                cached = self.blocks.get(key)
+                if cached is not None:
+                    blocks[key] = cached
+                    sink.write(cached[0])
+                    state = cached[1]
+                    reused += 1
+                    continue
+                parser = self._parser(state)
+            else:
+                key = None  # Continuation of an earlier segment is not cached
+            
+            parser.feed(segment)
+            exit_state = self._state(parser)
+            if exit_state is None:
+                continue
+            typst = ''.join(parser.result)
+            if key is not None:
+                blocks[key] = (typst, exit_state)
+            sink.write(typst)
+            state = exit_state
+            parser = None
+            translated += 1
         
-        return result
+        # The tail (normally empty) always goes through close()
+        if parser is None:
+            parser = self._parser(state)
+        parser.feed(html[start:])
+        parser.close()
+        sink.write(''.join(parser.result))
+        
+        self.blocks = blocks
+        self.reused = reused
+        self.translated = translated
+        return ''.join(pieces)
+
+
+# Quill inline formats and the elements Quill renders them as, outermost first
+_DELTA_INLINE_FORMATS = (
+    ('code', lambda value: ('code', [])),
+    ('script', lambda value: ('sup' if value == 'super' else 'sub', [])),
+    ('bold', lambda value: ('strong', [])),
+    ('italic', lambda value: ('em', [])),
+    ('strike', lambda value: ('s', [])),
+    ('underline', lambda value: ('u', [])),
+    ('link', lambda value: ('a', [('href', str(value))])),
+)
+
+
+class _DeltaRenderer:
+    """
+    Feed Quill Delta lines to HTML2TypstParser as element events.
+    
+    Each line is turned into the start/end/data calls the parser would see
+    for Quill's HTML rendering of it (``<p>``, ``<h1>``, ``<li>`` in
+    ``<ol>``/``<ul>``, ``<pre class="ql-syntax">``, ``<blockquote>``;
+    inline formats as elements, with color, background, size and font on
+    the outermost one or else on a ``<span>``), so the Typst output is the
+    same as for the HTML path without serializing or tokenizing any HTML.
+    """
     
-    def parse_inline_styles(self, style_str: str) -> Dict[str, str]:
-        """Parse inline style string to dictionary."""
-        styles = {}
-        if not style_str:
-            return styles
+    def __init__(self, parser: HTML2TypstParser):
+        self.parser = parser
+        self.list_tag: Optional[str] = None  # Open 'ol'/'ul' container
+        self.code_lines: Optional[List[str]] = None  # Lines of an open code block
+    
+    def close_containers(self, keep_list: Optional[str] = None, keep_code: bool = False):
+        """Close an open list or code block that the next line does not continue."""
+        if self.list_tag is not None and self.list_tag != keep_list:
+            self.parser.handle_endtag(self.list_tag)
+            self.list_tag = None
+        if self.code_lines is not None and not keep_code:
+            self.parser.handle_starttag('pre', [('class', 'ql-syntax'), ('spellcheck', 'false')])
+            self.parser.handle_data('\n'.join(self.code_lines) + '\n')
+            self.parser.handle_endtag('pre')
+            self.code_lines = None
+    
+    def line(self, runs: List[Tuple[Any, Dict[str, Any]]], attributes: Dict[str, Any]):
+        """Render one line: inline runs followed by a newline with block attributes."""
+        parser = self.parser
+        if attributes.get('code-block'):
+            self.close_containers(keep_code=True)
+            if self.code_lines is None:
+                self.code_lines = []
+            self.code_lines.append(''.join(text for text, _ in runs if isinstance(text, str)))
+            return
         
-        for part in style_str.split(';'):
-            if ':' in part:
-                key, value = part.split(':', 1)
-                styles[key.strip().lower()] = value.strip()
-        return styles
+        classes = []
+        if attributes.get('align'):
+            classes.append(f"ql-align-{attributes['align']}")
+        if attributes.get('indent'):
+            classes.append(f"ql-indent-{attributes['indent']}")
+        block_attrs = [('class', ' '.join(classes))] if classes else []
+        
+        if attributes.get('header'):
+            tag = f"h{attributes['header']}"
+        elif attributes.get('list'):
+            tag = 'li'
+        elif attributes.get('blockquote'):
+            tag = 'blockquote'
+        else:
+            tag = 'p'
+        
+        list_tag = None
+        if tag == 'li':
+            list_tag = 'ol' if attributes['list'] == 'ordered' else 'ul'
+        self.close_containers(keep_list=list_tag)
+        if list_tag is not None and self.list_tag is None:
+            parser.handle_starttag(list_tag, [])
+            self.list_tag = list_tag
+        
+        parser.handle_starttag(tag, block_attrs)
+        if not runs:
+            parser.handle_starttag('br', [])
+        for insert, formats in runs:
+            if isinstance(insert, str):
+                self.text(insert, formats)
+            else:
+                self.embed(insert, formats)
+        parser.handle_endtag(tag)
     
-    def get_output(self) -> str:
-        """Get the final Typst output."""
-        return ''.join(self.result)
+    def text(self, text: str, formats: Dict[str, Any]):
+        """Render a text run inside its inline format elements."""
+        parser = self.parser
+        style_attrs = self.style_attrs(formats)
+        opened = []
+        for name, element in _DELTA_INLINE_FORMATS:
+            if formats.get(name):
+                tag, attrs = element(formats[name])
+                if not opened:
+                    attrs = attrs + style_attrs
+                parser.handle_starttag(tag, attrs)
+                opened.append(tag)
+        if style_attrs and not opened:
+            parser.handle_starttag('span', style_attrs)
+            opened.append('span')
+        
+        parser.handle_data(text)
+        for tag in reversed(opened):
+            parser.handle_endtag(tag)
+    
+    @staticmethod
+    def style_attrs(formats: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Return the class and style attributes Quill writes for a run's formats."""
+        classes = []
+        if formats.get('size'):
+            classes.append(f"ql-size-{formats['size']}")
+        if formats.get('font'):
+            classes.append(f"ql-font-{formats['font']}")
+        styles = []
+        if formats.get('color'):
+            styles.append(f"color: {formats['color']};")
+        if formats.get('background'):
+            styles.append(f"background-color: {formats['background']};")
+        attrs = []
+        if classes:
+            attrs.append(('class', ' '.join(classes)))
+        if styles:
+            attrs.append(('style', ' '.join(styles)))
+        return attrs
+    
+    def embed(self, insert: Dict[str, Any], formats: Dict[str, Any]):
+        """Render an embed: images as #image, formulas as their source text."""
+        if 'image' in insert:
+            attrs = [('src', str(insert['image'] or ''))]
+            if formats.get('alt'):
+                attrs.append(('alt', str(formats['alt'])))
+            self.parser.handle_startendtag('img', attrs)
+        elif 'formula' in insert:
+            self.text(str(insert['formula']), formats)
+        elif self.parser.context.debug:
+            names = ', '.join(sorted(insert))
+            self.parser.emit(f'/* unsupported embed: {names} */\n')
 
 
-def translate_html_to_typst(html: str, debug: bool = False) -> str:
+def translate_delta_to_typst(delta: Any, debug: bool = False) -> str:
     """
-    Translate HTML (generated by Quill.js) to Typst code.
+    Translate a Quill Delta (list of ops, or a dict with 'ops') to Typst code.
+    
+    Produces the same Typst as translate_html_to_typst() on Quill's HTML
+    rendering of the Delta, processing the ops line by line without building
+    HTML or a DOM.
     
     Args:
-        html: HTML string to convert
+        delta: Quill Delta ops, e.g. ``[{"insert": "Hello\\n"}]``
         debug: If True, include debug comments and warnings in output
     
     Returns:
         Typst code as a string
     
     Examples:
-        >>> translate_html_to_typst("<p>Hello <strong>world</strong></p>")
+        >>> translate_delta_to_typst([{"insert": "Hello "},
+        ...                           {"insert": "world", "attributes": {"bold": True}},
+        ...                           {"insert": "\\n"}])
         'Hello *world*\\n\\n'
-        
-        >>> translate_html_to_typst("<h1>Title</h1><p>Content</p>")
-        '= Title\\n\\nContent\\n\\n'
     """
-    # Create rendering context
-    context = RenderContext(debug=debug)
-    
-    # Create parser
-    parser = HTML2TypstParser(context)
-    
-    # Parse HTML
-    parser.feed(html)
-    parser.close()
+    ops = delta.get('ops', []) if isinstance(delta, dict) else delta
+    # Pieces arrive with newline runs already collapsed
+    pieces: List[str] = []
+    parser = HTML2TypstParser(RenderContext(debug=debug), OutputSink(pieces))
+    renderer = _DeltaRenderer(parser)
+    runs: List[Tuple[Any, Dict[str, Any]]] = []
     
-    # Get output
-    result = parser.get_output()
+    for op in ops:
+        insert = op.get('insert')
+        if insert is None:
+            continue  # retain/delete ops do not occur in documents
+        formats = op.get('attributes') or {}
+        if not isinstance(insert, str):
+            runs.append((insert, formats))
+            continue
+        
+        lines = insert.split('\n')
+        for i, text in enumerate(lines):
+            if text:
+                # Adjacent runs with equal formats form one text node in HTML
+                if runs and isinstance(runs[-1][0], str) and runs[-1][1] == formats:
+                    runs[-1] = (runs[-1][0] + text, formats)
+                else:
+                    runs.append((text, formats))
+            if i < len(lines) - 1:
+                renderer.line(runs, formats)
+                runs = []
     
-    # Clean up excessive newlines (but preserve structure)
-    result = re.sub(r'\n{4,}', '\n\n\n', result)
+    if runs:
+        renderer.line(runs, {})
+    renderer.close_containers()
+    parser.flush()
     
-    return result
+    return ''.join(pieces)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+Tests for the Quill Delta to Typst translation path.
+
+Each Delta comes with the HTML Quill renders it to, written out by hand,
+and the Typst expected for both: translate_delta_to_typst() on the Delta
+must produce the same Typst as translate_html_to_typst() on Quill's HTML.
+Random Deltas are checked against HTML built by Quill's rules for nesting
+inline formats and placing their attributes.
+"""
+
+import sys
+import os
+import random
+from html import escape
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from html2typst import translate_html_to_typst, translate_delta_to_typst
+
+
+# (Delta ops, Quill's HTML for them, expected Typst)
+CASES = [
+    ([{'insert': 'Hello world\n'}],
+     '<p>Hello world</p>',
+     'Hello world\n\n'),
+    ([{'insert': 'Bold', 'attributes': {'bold': True}}, {'insert': ' and '},
+      {'insert': 'italic', 'attributes': {'italic': True}}, {'insert': '\n'}],
+     '<p><strong>Bold</strong> and <em>italic</em></p>',
+     '*Bold* and _italic_\n\n'),
+    ([{'insert': 'both', 'attributes': {'bold': True, 'italic': True}}, {'insert': '\n'}],
+     '<p><strong><em>both</em></strong></p>',
+     '#emph[#strong[both]]\n\n'),
+    ([{'insert': 'E = mc'}, {'insert': '2', 'attributes': {'script': 'super'}},
+      {'insert': ' H'}, {'insert': '2', 'attributes': {'script': 'sub'}}, {'insert': 'O\n'}],
+     '<p>E = mc<sup>2</sup> H<sub>2</sub>O</p>',
+     'E = mc#super[2]  H#sub[2] O\n\n'),
+    ([{'insert': 'Title'}, {'insert': '\n', 'attributes': {'header': 1}},
+      {'insert': 'Sub'}, {'insert': '\n', 'attributes': {'header': 3, 'align': 'center'}}],
+     '<h1>Title</h1><h3 class="ql-align-center">Sub</h3>',
+     '= Title\n\n=== Sub\n\n'),
+    ([{'insert': 'One'}, {'insert': '\n', 'attributes': {'list': 'ordered'}},
+      {'insert': 'Nested'}, {'insert': '\n', 'attributes': {'list': 'ordered', 'indent': 1}},
+      {'insert': 'Bullet'}, {'insert': '\n', 'attributes': {'list': 'bullet'}},
+      {'insert': 'After\n'}],
+     '<ol><li>One</li><li class="ql-indent-1">Nested</li></ol><ul><li>Bullet</li></ul>'
+     '<p>After</p>',
+     '+ One\n  + Nested\n- Bullet\nAfter\n\n'),
+    ([{'insert': 'Centered'}, {'insert': '\n', 'attributes': {'align': 'center'}},
+      {'insert': 'Right'}, {'insert': '\n', 'attributes': {'align': 'right'}},
+      {'insert': 'Justified'}, {'insert': '\n', 'attributes': {'align': 'justify'}}],
+     '<p class="ql-align-center">Centered</p><p class="ql-align-right">Right</p>'
+     '<p class="ql-align-justify">Justified</p>',
+     '#align(center)[Centered]\n\n#align(right)[Right]\n\nJustified\n\n'),
+    ([{'insert': 'red', 'attributes': {'color': '#e60000'}}, {'insert': ' '},
+      {'insert': 'marked', 'attributes': {'background': 'rgb(255, 255, 0)'}}, {'insert': '\n'}],
+     '<p><span style="color: #e60000;">red</span> '
+     '<span style="background-color: rgb(255, 255, 0);">marked</span></p>',
+     '#text(fill: #e60000)[red] #highlight(fill: rgb(255, 255, 0))[marked]\n\n'),
+    ([{'insert': 'bold', 'attributes': {'bold': True, 'color': 'red'}}, {'insert': ' '},
+      {'insert': 'marked', 'attributes': {'italic': True, 'background': '#ffff00'}},
+      {'insert': '\n'}],
+     '<p><strong style="color: red;">bold</strong> '
+     '<em style="background-color: #ffff00;">marked</em></p>',
+     '#text(fill: red)[*bold*] #highlight(fill: #ffff00)[_marked_]\n\n'),
+    ([{'insert': 'link', 'attributes': {'link': 'https://example.com', 'color': 'red'}},
+      {'insert': ' '},
+      {'insert': 'big', 'attributes': {'bold': True, 'italic': True, 'size': 'large'}},
+      {'insert': '\n'}],
+     '<p><a href="https://example.com" rel="noopener noreferrer" target="_blank" '
+     'style="color: red;">link</a> <strong class="ql-size-large"><em>big</em></strong></p>',
+     '#text(fill: red)[#link("https://example.com")[link]] '
+     '#text(size: 1.5em)[#emph[#strong[big]]]\n\n'),
+    ([{'insert': 'big', 'attributes': {'size': 'large'}},
+      {'insert': 'serif', 'attributes': {'font': 'serif', 'size': 'small', 'color': 'red'}},
+      {'insert': '\n'}],
+     '<p><span class="ql-size-large">big</span>'
+     '<span class="ql-size-small ql-font-serif" style="color: red;">serif</span></p>',
+     '#text(size: 1.5em)[big] #text(fill: red, size: 0.75em, font: "serif")[serif]\n\n'),
+    ([{'insert': 'link', 'attributes': {'link': 'https://example.com/?a=1&b="2"'}},
+      {'insert': ' text\n'}],
+     '<p><a href="https://example.com/?a=1&amp;b=&quot;2&quot;" rel="noopener noreferrer" '
+     'target="_blank">link</a> text</p>',
+     '#link("https://example.com/?a=1&b=\\"2\\"")[link]  text\n\n'),
+    ([{'insert': 'def f(x):'}, {'insert': '\n', 'attributes': {'code-block': True}},
+      {'insert': '    return x * 2'}, {'insert': '\n', 'attributes': {'code-block': True}},
+      {'insert': 'Quoted'}, {'insert': '\n', 'attributes': {'blockquote': True}}],
+     '<pre class="ql-syntax" spellcheck="false">def f(x):\n    return x * 2\n</pre>'
+     '<blockquote>Quoted</blockquote>',
+     '```\ndef f(x):\n    return x * 2\n```\n\n> Quoted\n\n'),
+    ([{'insert': {'image': 'https://example.com/a.png'}}, {'insert': '\n'},
+      {'insert': 'caption '}, {'insert': {'image': 'b.png'}, 'attributes': {'alt': 'B'}},
+      {'insert': '\n'}],
+     '<p><img src="https://example.com/a.png"></p><p>caption <img src="b.png" alt="B"></p>',
+     '#image("https://example.com/a.png")\n\n\ncaption #image("b.png", alt: "B")\n\n\n'),
+    ([{'insert': 'inline '}, {'insert': 'code_sample', 'attributes': {'code': True}},
+      {'insert': ' and '}, {'insert': {'formula': 'e=mc^2'}}, {'insert': '\n'}],
+     '<p>inline <code>code_sample</code> and e=mc^2</p>',
+     'inline `code_sample` and e=mc^2\n\n'),
+    ([{'insert': '\n\n\n\nAfter blank lines\n'}],
+     '<p><br></p><p><br></p><p><br></p><p><br></p><p>After blank lines</p>',
+     '\\\n\n\n\\\n\n\n\\\n\n\n\\\n\n\nAfter blank lines\n\n'),
+    ([{'insert': 'a*b_c\\d <tag> & more'}, {'insert': '\n'}],
+     '<p>a*b_c\\d &lt;tag&gt; &amp; more</p>',
+     'a\\*b\\_c\\\\d \\<tag> & more\n\n'),
+    ([{'insert': 'no trailing newline', 'attributes': {'bold': True}}],
+     '<p><strong>no trailing newline</strong></p>',
+     '*no trailing newline*\n\n'),
+]
+
+
+def test_delta_formats():
+    """Test each supported Delta attribute against fixed Typst and Quill's HTML."""
+    print("Testing Delta formats...")
+    
+    for ops, html, expected in CASES:
+        result = translate_delta_to_typst(ops)
+        assert result == expected, f"\nops: {ops}\nexpected: {expected!r}\nresult: {result!r}"
+        assert translate_html_to_typst(html) == expected, html
+        debug = translate_html_to_typst(html, debug=True)
+        assert translate_delta_to_typst(ops, debug=True) == debug, html
+    
+    # Delta objects with an 'ops' key are accepted too
+    delta = {'ops': [{'insert': 'Hello '}, {'insert': 'world', 'attributes': {'bold': True}},
+                     {'insert': '\n'}]}
+    assert translate_delta_to_typst(delta) == 'Hello *world*\n\n'
+    
+    print("✓ Delta format tests passed")
+
+
+def random_delta(rng):
+    """Build a random but well-formed Delta document."""
+    inline = [{}, {'bold': True}, {'italic': True}, {'bold': True, 'italic': True},
+              {'script': 'super'}, {'script': 'sub'}, {'underline': True}, {'strike': True},
+              {'color': '#e60000'}, {'background': 'yellow', 'bold': True},
+              {'size': 'huge'}, {'font': 'monospace', 'color': 'blue'},
+              {'bold': True, 'color': 'red'}, {'italic': True, 'background': '#ffff00'},
+              {'link': 'https://example.com', 'color': 'red'}, {'underline': True, 'size': 'large'},
+              {'strike': True, 'italic': True, 'font': 'serif'}, {'code': True, 'color': 'green'},
+              {'link': 'https://example.com'}, {'link': 'x', 'italic': True}, {'code': True}]
+    block = [{}, {}, {'header': 1}, {'header': 2, 'align': 'right'}, {'list': 'ordered'},
+             {'list': 'bullet'}, {'list': 'bullet', 'indent': 2}, {'align': 'center'},
+             {'blockquote': True}, {'code-block': True}, {'indent': 1}]
+    words = ['Hello', 'world', ' ', 'a*b', 'x_y', '(paren)', '.', '!', 'end]', '/* c */',
+             'back\\slash', 'ünïcode', '1 < 2', 'AT&T']
+    ops = []
+    for _ in range(rng.randint(1, 12)):
+        for _ in range(rng.randint(0, 4)):
+            if rng.random() < 0.05:
+                ops.append({'insert': {'image': 'img.png'}})
+            else:
+                op = {'insert': rng.choice(words)}
+                formats = rng.choice(inline)
+                if formats:
+                    op['attributes'] = dict(formats)
+                ops.append(op)
+        newline = {'insert': '\n'}
+        formats = rng.choice(block)
+        if formats:
+            newline['attributes'] = dict(formats)
+        ops.append(newline)
+    return ops
+
+
+# Quill's inline formats as elements, outermost first
+QUILL_INLINE = [
+    ('code', lambda value: ('code', '')),
+    ('link', lambda value: ('a', f' href="{escape(value)}" rel="noopener noreferrer" '
+                                 'target="_blank"')),
+    ('script', lambda value: ('sup' if value == 'super' else 'sub', '')),
+    ('bold', lambda value: ('strong', '')),
+    ('italic', lambda value: ('em', '')),
+    ('strike', lambda value: ('s', '')),
+    ('underline', lambda value: ('u', '')),
+]
+
+
+def quill_elements(formats):
+    """Return the (tag, attributes) Quill nests a run's text in, outermost first."""
+    elements = [element(formats[name]) for name, element in QUILL_INLINE if formats.get(name)]
+    classes = [f'ql-{name}-{formats[name]}' for name in ('size', 'font') if formats.get(name)]
+    styles = [f'{prop}: {formats[name]};'
+              for name, prop in (('color', 'color'), ('background', 'background-color'))
+              if formats.get(name)]
+    attrs = ''
+    if classes:
+        attrs += f' class="{" ".join(classes)}"'
+    if styles:
+        attrs += f' style="{" ".join(styles)}"'
+    if attrs:
+        # Color, background, size and font go on the outermost element
+        tag, outer = elements[0] if elements else ('span', '')
+        elements[:1] = [(tag, outer + attrs)]
+    return elements
+
+
+def quill_html(ops):
+    """
+    Render a Delta as Quill's editor HTML, independently of html2typst.
+    
+    Adjacent runs share the elements their formats have in common, as Quill
+    merges them; code blocks keep text only.
+    """
+    lines = [([], {})]
+    for op in ops:
+        insert = op['insert']
+        formats = op.get('attributes', {})
+        if not isinstance(insert, str):
+            lines[-1][0].append((insert, formats))
+            continue
+        for i, text in enumerate(insert.split('\n')):
+            if i:
+                lines[-1] = (lines[-1][0], formats)
+                lines.append(([], {}))
+            if text:
+                lines[-1][0].append((text, formats))
+    if not lines[-1][0]:
+        lines.pop()
+    
+    html = []
+    container = None
+    for runs, block in lines:
+        if block.get('code-block'):
+            tag = 'pre'
+        elif block.get('list'):
+            tag = 'ol' if block['list'] == 'ordered' else 'ul'
+        else:
+            tag = None
+        if container is not None and container != tag:
+            html.append('\n</pre>' if container == 'pre' else f'</{container}>')
+            container = None
+        if tag == 'pre':
+            text = ''.join(insert for insert, _ in runs if isinstance(insert, str))
+            if container is None:
+                html.append('<pre class="ql-syntax" spellcheck="false">')
+            else:
+                html.append('\n')
+            html.append(escape(text, quote=False))
+            container = 'pre'
+            continue
+        if tag is not None and container is None:
+            html.append(f'<{tag}>')
+            container = tag
+        
+        if block.get('header'):
+            line_tag = f"h{block['header']}"
+        elif block.get('list'):
+            line_tag = 'li'
+        elif block.get('blockquote'):
+            line_tag = 'blockquote'
+        else:
+            line_tag = 'p'
+        classes = [f'ql-{name}-{block[name]}' for name in ('align', 'indent') if block.get(name)]
+        html.append(f'<{line_tag} class="{" ".join(classes)}">' if classes else f'<{line_tag}>')
+        if not runs:
+            html.append('<br>')
+        stack = []
+        for insert, formats in runs:
+            elements = quill_elements(formats) if isinstance(insert, str) else []
+            shared = 0
+            while shared < min(len(stack), len(elements)) and stack[shared] == elements[shared]:
+                shared += 1
+            while len(stack) > shared:
+                html.append(f'</{stack.pop()[0]}>')
+            for element in elements[shared:]:
+                html.append(f'<{element[0]}{element[1]}>')
+                stack.append(element)
+            if isinstance(insert, str):
+                html.append(escape(insert, quote=False))
+            elif 'image' in insert:
+                alt = f' alt="{escape(formats["alt"])}"' if formats.get('alt') else ''
+                html.append(f'<img src="{escape(insert["image"])}"{alt}>')
+        while stack:
+            html.append(f'</{stack.pop()[0]}>')
+        html.append(f'</{line_tag}>')
+    if container is not None:
+        html.append('\n</pre>' if container == 'pre' else f'</{container}>')
+    return ''.join(html)
+
+
+def test_delta_random_html():
+    """Test that random Deltas translate the same as Quill's HTML for them."""
+    print("Testing random Deltas against HTML...")
+    
+    for ops, html, _ in CASES:
+        if not any(isinstance(op['insert'], dict) and 'formula' in op['insert'] for op in ops):
+            assert quill_html(ops) == html, quill_html(ops)
+    
+    rng = random.Random(2025)
+    for _ in range(500):
+        ops = random_delta(rng)
+        html = quill_html(ops)
+        for debug in (False, True):
+            expected = translate_html_to_typst(html, debug=debug)
+            assert translate_delta_to_typst(ops, debug=debug) == expected, f"\n{ops}\n{html}"
+    
+    print("✓ Random Delta HTML tests passed")
+
+
+def split_inserts(ops, rng):
+    """Split text inserts into several ops with the same attributes."""
+    pieces = []
+    for op in ops:
+        insert = op['insert']
+        if not isinstance(insert, str) or len(insert) < 2:
+            pieces.append(op)
+            continue
+        cuts = sorted(rng.sample(range(1, len(insert)), rng.randint(1, len(insert) - 1)))
+        for start, end in zip([0] + cuts, cuts + [len(insert)]):
+            piece = dict(op)
+            piece['insert'] = insert[start:end]
+            pieces.append(piece)
+    return pieces
+
+
+def test_delta_random_split():
+    """Test that random Deltas translate the same however their inserts are split."""
+    print("Testing random Delta splits...")
+    
+    rng = random.Random(2024)
+    for _ in range(500):
+        ops = random_delta(rng)
+        for debug in (False, True):
+            expected = translate_delta_to_typst(ops, debug=debug)
+            assert translate_delta_to_typst(split_inserts(ops, rng), debug=debug) == expected, ops
+    
+    print("✓ Random Delta split tests passed")
+
+
+def run_all_tests():
+    """Run all tests."""
+    tests = [test_delta_formats, test_delta_random_html, test_delta_random_split]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+    print(f"\nDelta tests: {len(tests) - failed} passed, {failed} failed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -11,11 +11,31 @@ Tests cover:
 
 import sys
 import os
+import ast
+import asyncio
+import contextlib
+import dataclasses
+import io
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from html2typst import translate_html_to_typst
+from html2typst import (
+    translate_html_to_typst, translate_many, style_plan_cache,
+    AsyncTranslator, atranslate_html_to_typst, atranslate_many,
+    StreamingTranslator, translate_stream, IncrementalTranslator, main,
+    ResultCache, TranslationStore, cache_key,
+    HTML2TypstParser, RenderContext, feed_quill_subset, TranslationStats,
+    escape_markup, escape_string, Limits, LimitExceeded, TagHandler, tag_registry,
+    AssetStore, convert_directory,
+    ParsedDocument, parse_document, render_typst, render_plain_text,
+    save_document, load_document, DOCUMENT_FORMAT_VERSION,
+)
 
 
 def test_text_preservation():
@@ -788,6 +808,1274 @@ def test_issue_html_unclosed_delimiter():
     print("✓ Issue HTML unclosed delimiter test passed")
 
 
+def test_styles_decoded_once_per_element():
+    """Test that style and class attributes are decoded at the start tag only."""
+    print("Testing style decoding per element...")
+    
+    class CountingPlans:
+        """Style plan source that counts the plans elements ask for."""
+        
+        def __init__(self):
+            self.requests = 0
+        
+        def get(self, class_str, style_str, debug=False):
+            self.requests += 1
+            return style_plan_cache.get(class_str, style_str, debug)
+        
+        def nested(self, outer, inner):
+            return style_plan_cache.nested(outer, inner)
+    
+    class CountingParser(HTML2TypstParser):
+        style_plans = CountingPlans()
+    
+    runs = '<br>'.join(f'run {i}' for i in range(200))
+    html = (f'<p style="text-align: center;"><span class="ql-size-large" '
+            f'style="color: red; font-family: Arial;">{runs}</span></p>')
+    parser = CountingParser(RenderContext())
+    parser.feed(html)
+    parser.close()
+    result = parser.get_output()
+    
+    # One plan for the paragraph, one for the span, however many text nodes
+    assert CountingParser.style_plans.requests == 2, (
+        f"Plans requested {CountingParser.style_plans.requests} times")
+    assert result.count('#text(fill: red, size: 1.5em, font: "Arial")[run ') == 200
+    assert result.count('#align(center)[') == 200
+    
+    print("✓ Style decoding per element tests passed")
+
+
+def test_style_plan_cache():
+    """Test that style and class attributes are decoded once and cached across documents."""
+    print("Testing style plan cache...")
+    
+    style_plan_cache.clear()
+    runs = '<br>'.join(f'run {i}' for i in range(200))
+    html = (f'<p style="text-align: center;"><span class="ql-size-large" '
+            f'style="color: red; font-family: Arial;">{runs}</span></p>')
+    result = translate_html_to_typst(html)
+    
+    # One plan for the paragraph, one for the span
+    assert style_plan_cache.misses == 2, f"Compiled {style_plan_cache.misses} plans"
+    assert style_plan_cache.hits == 0
+    assert result.count('#text(fill: red, size: 1.5em, font: "Arial")[run ') == 200
+    assert result.count('#align(center)[') == 200
+    
+    # A second document reuses the compiled plans
+    assert translate_html_to_typst(html) == result
+    assert style_plan_cache.misses == 2
+    assert style_plan_cache.hits == 2
+    
+    # Debug plans are cached separately from production plans
+    html = '<span style="color: windowtext; font-weight: 400;">text</span>'
+    assert translate_html_to_typst(html) == 'text'
+    assert translate_html_to_typst(html, debug=True) == (
+        '/* unsupported styles: color: windowtext, font-weight: 400 */ text')
+    assert style_plan_cache.info()['debug']['misses'] == 1
+    
+    style_plan_cache.clear()
+    assert style_plan_cache.hits == 0 and style_plan_cache.misses == 0
+    
+    print("✓ Style plan cache tests passed")
+
+
+def test_translate_many():
+    """Test batch translation order, laziness and error capture."""
+    print("Testing batch translation...")
+    
+    documents = [f"<p>Document <strong>{i}</strong></p>" for i in range(50)]
+    expected = [translate_html_to_typst(html) for html in documents]
+    
+    # In-process and pooled runs return results in input order
+    assert list(translate_many(documents)) == expected
+    assert list(translate_many(iter(documents), workers=2, chunksize=7)) == expected
+    
+    # Generator input is consumed lazily
+    consumed = []
+    
+    def generate():
+        for html in documents:
+            consumed.append(html)
+            yield html
+    
+    results = translate_many(generate())
+    assert next(results) == expected[0]
+    assert len(consumed) == 1
+    
+    # One bad document does not abort the batch when errors are captured
+    batch = ["<p>ok</p>", None, "<em>fine</em>"]
+    results = list(translate_many(batch, return_exceptions=True))
+    assert results[0] == "ok\n\n" and results[2] == "_fine_"
+    assert isinstance(results[1], TypeError)
+    results = list(translate_many(batch * 5, workers=2, chunksize=2, return_exceptions=True))
+    assert [isinstance(r, TypeError) for r in results] == [False, True, False] * 5
+    
+    # Without capture the error propagates
+    try:
+        list(translate_many(batch))
+        assert False, "Expected TypeError"
+    except TypeError:
+        pass
+    
+    print("✓ Batch translation tests passed")
+
+
+def test_async_translation():
+    """Test the asyncio API: inline fast path, offloading, concurrency limit and timeouts."""
+    print("Testing async translation...")
+    
+    class CountingExecutor(ThreadPoolExecutor):
+        """Thread pool that records how many jobs were running at once."""
+        
+        def __init__(self):
+            super().__init__(max_workers=8)
+            self.lock = threading.Lock()
+            self.running = 0
+            self.peak = 0
+            self.submitted = 0
+            self.delay = 0.01  # Seconds each job takes on top of its translation
+        
+        def submit(self, fn, *args, **kwargs):
+            def tracked():
+                with self.lock:
+                    self.running += 1
+                    self.peak = max(self.peak, self.running)
+                try:
+                    time.sleep(self.delay)
+                    return fn(*args, **kwargs)
+                finally:
+                    with self.lock:
+                        self.running -= 1
+            self.submitted += 1
+            return super().submit(tracked)
+    
+    small = "<p>Hello <strong>world</strong></p>"
+    large = "<p>" + "<em>word</em> " * 2000 + "</p>"
+    executor = CountingExecutor()
+    translator = AsyncTranslator(executor=executor, max_concurrency=2, inline_threshold=1024)
+    
+    # Small documents run inline, large ones go through the executor
+    result = asyncio.run(atranslate_html_to_typst(small, translator=translator))
+    assert result == translate_html_to_typst(small)
+    assert executor.submitted == 0
+    result = asyncio.run(atranslate_html_to_typst(large, debug=True, translator=translator))
+    assert result == translate_html_to_typst(large, debug=True)
+    assert executor.submitted == 1
+    
+    # Batch results keep input order and respect the concurrency limit
+    documents = [large.replace("word", f"w{i}") for i in range(6)] + [small]
+    results = asyncio.run(atranslate_many(documents, translator=translator))
+    assert results == [translate_html_to_typst(html) for html in documents]
+    assert executor.peak <= 2
+    
+    # Timeouts surface as asyncio.TimeoutError, or are captured per item
+    try:
+        asyncio.run(atranslate_html_to_typst(large, timeout=0, translator=translator))
+        assert False, "Expected TimeoutError"
+    except asyncio.TimeoutError:
+        pass
+    results = asyncio.run(atranslate_many([small, large], timeout=0, return_exceptions=True,
+                                          translator=translator))
+    assert results[0] == translate_html_to_typst(small)
+    assert isinstance(results[1], asyncio.TimeoutError)
+    
+    # Jobs that outlive their caller's timeout keep their slot until they end
+    executor.delay = 0.2
+    executor.peak = 0
+    
+    async def abandon_slow_jobs():
+        for _ in range(6):
+            try:
+                await translator.translate(large, timeout=0.02)
+                assert False, "Expected TimeoutError"
+            except asyncio.TimeoutError:
+                pass
+        return await translator.translate(large)  # Waits for an abandoned job to end
+    
+    assert asyncio.run(abandon_slow_jobs()) == translate_html_to_typst(large)
+    assert executor.peak <= 2, executor.peak
+    executor.shutdown()
+    
+    print("✓ Async translation tests passed")
+
+
+def test_streaming_translation():
+    """Test that chunked streaming matches one-shot translation and flushes per block."""
+    print("Testing streaming translation...")
+    
+    html = ('<h1>Title</h1><p>Some <strong>bold</strong> and <em>italic</em> text &amp; more</p>'
+            '<ol><li class="ql-indent-1">One</li><li>Two</li></ol>'
+            '<p><br></p><p><br></p><p><br></p>'
+            '<pre>code_block *raw*</pre><blockquote>Quote</blockquote>'
+            '<p class="ql-align-center"><span style="color: red;">Red</span> tail</p>'
+            '<p>1 < 2 and 3 > 2</p>')
+    for debug in (False, True):
+        expected = translate_html_to_typst(html, debug=debug)
+        for size in (1, 2, 7, 64, len(html)):
+            chunks = [html[i:i + size] for i in range(0, len(html), size)]
+            result = ''.join(translate_stream(chunks, debug=debug))
+            assert result == expected, f"Chunk size {size}: {result!r} != {expected!r}"
+    
+    # Output is returned as soon as a block closes
+    stream = StreamingTranslator()
+    assert stream.feed("<p>First <strong>para") == ""
+    assert stream.feed("graph</strong></p><p>Sec") == "First *paragraph*\n\n"
+    assert stream.feed("ond</p>") == "Second\n\n"
+    assert stream.close() == ""
+    
+    # A stray end tag after inline text leaves the line open
+    html = '<img alt="z"/></h1><b>a</b>'
+    assert ''.join(translate_stream([html[:20], html[20:]])) == translate_html_to_typst(html)
+    
+    # A long text node fed in small chunks is held, not re-joined per chunk
+    stream = StreamingTranslator()
+    assert stream.feed("<p>") == ""
+    for i in range(1000):
+        assert stream.feed("word ") == ""
+    assert len(stream.parser.held) == 1000
+    assert stream.feed("</p>") == translate_html_to_typst("<p>" + "word " * 1000 + "</p>")
+    assert stream.parser.held == []
+    
+    # Buffered output stays bounded by the open block
+    stream = StreamingTranslator()
+    for i in range(1000):
+        stream.feed(f"<p>Paragraph <em>{i}</em></p>")
+        assert len(stream.parser.result) == 0
+    
+    print("✓ Streaming translation tests passed")
+
+
+def test_command_line():
+    """Test the command-line converter in single-file and directory mode."""
+    print("Testing command line...")
+    
+    html = '<h1>Title</h1><p>Some <strong>bold</strong> text ünïcode</p>'
+    expected = translate_html_to_typst(html)
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = os.path.join(tmp, 'in')
+        os.makedirs(os.path.join(source_dir, 'nested'))
+        for name in ('a.html', os.path.join('nested', 'b.html'), 'skip.txt'):
+            with open(os.path.join(source_dir, name), 'w', encoding='utf-8') as f:
+                f.write(html)
+        
+        # Single file
+        target = os.path.join(tmp, 'a.typ')
+        assert main([os.path.join(source_dir, 'a.html'), '-o', target]) == 0
+        with open(target, encoding='utf-8') as f:
+            assert f.read() == expected
+        
+        # Directory tree is mirrored, with a throughput summary on stderr
+        output_dir = os.path.join(tmp, 'out')
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            assert main([source_dir, '-o', output_dir, '--workers', '2', '--debug']) == 0
+        assert "2 files" in stderr.getvalue() and "files/s" in stderr.getvalue()
+        with open(os.path.join(output_dir, 'nested', 'b.typ'), encoding='utf-8') as f:
+            assert f.read() == translate_html_to_typst(html, debug=True)
+        assert not os.path.exists(os.path.join(output_dir, 'skip.typ'))
+    
+    print("✓ Command line tests passed")
+
+
+def test_result_cache():
+    """Test the content-addressed result cache and its byte-size eviction."""
+    print("Testing result cache...")
+    
+    html = "<p>Cached <strong>document</strong></p>"
+    cache = ResultCache()
+    first = translate_html_to_typst(html, cache=cache)
+    assert first == translate_html_to_typst(html)
+    assert translate_html_to_typst(html, cache=cache) is first
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    
+    # Debug output is cached under its own key
+    assert translate_html_to_typst(html, debug=True, cache=cache) == translate_html_to_typst(html, debug=True)
+    assert cache_key(html) != cache_key(html, debug=True)
+    assert len(cache) == 2
+    
+    # Eviction is bounded by total bytes, least recently used first
+    documents = [f"<p>Document {i} " + "text " * 200 + "</p>" for i in range(10)]
+    entry_size = ResultCache._entry_size(cache_key(documents[0]), translate_html_to_typst(documents[0]))
+    cache = ResultCache(max_bytes=entry_size * 3 + 10)
+    for html in documents[:3]:
+        translate_html_to_typst(html, cache=cache)
+    translate_html_to_typst(documents[0], cache=cache)  # Refresh the oldest entry
+    translate_html_to_typst(documents[3], cache=cache)
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['entries'] == 3
+    assert stats['bytes'] <= stats['max_bytes']
+    assert cache.get(cache_key(documents[1])) is None
+    assert cache.get(cache_key(documents[0])) is not None
+    
+    # Concurrent use from several threads stays consistent
+    def worker():
+        for html in documents:
+            assert translate_html_to_typst(html, cache=cache) == translate_html_to_typst(html)
+    
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats['bytes'] <= stats['max_bytes'] and stats['entries'] <= 3
+    
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()['hits'] == 0
+    
+    print("✓ Result cache tests passed")
+
+
+def _fill_store(path, start):
+    """Translate documents into a shared store from a worker process."""
+    store = TranslationStore(path)
+    for i in range(start, start + 20):
+        translate_html_to_typst(f"<p>Shared {i}</p>", cache=store)
+    store.close()
+    return True
+
+
+def test_translation_store():
+    """Test the persistent SQLite store: reuse, versions, GC and multi-process use."""
+    print("Testing translation store...")
+    
+    html = "<p>Persistent <em>result</em></p>"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'translations.db')
+        store = TranslationStore(path)
+        result = translate_html_to_typst(html, cache=store)
+        assert result == translate_html_to_typst(html)
+        store.close()
+        
+        # A new store on the same file (e.g. after a restart) starts warm
+        store = TranslationStore(path)
+        assert translate_html_to_typst(html, cache=store) == result
+        assert store.stats()['hits'] == 1 and store.stats()['misses'] == 0
+        
+        # Hits only write the access time back once it is TOUCH_INTERVAL old
+        def accessed():
+            connection = sqlite3.connect(path)
+            value = connection.execute('SELECT accessed FROM translations').fetchone()[0]
+            connection.close()
+            return value
+        stamp = accessed()
+        assert store.get(cache_key(html)) == result
+        assert accessed() == stamp
+        store.TOUCH_INTERVAL = 0.0
+        time.sleep(0.01)
+        assert store.get(cache_key(html)) == result
+        assert accessed() > stamp
+        
+        # Entries from another translator version survive opening the store,
+        # so workers of two versions can share it during a rolling deploy
+        connection = sqlite3.connect(path)
+        connection.execute("INSERT INTO translations VALUES ('old:0:abc', 'old', 'stale', 5, ?)",
+                           (time.time() + 3600,))
+        connection.commit()
+        connection.close()
+        store.close()
+        store = TranslationStore(path)
+        assert len(store) == 2
+        
+        # Sizes are counted in UTF-8 bytes, not characters
+        store.put('utf8', 'é' * 10)
+        assert store.stats()['bytes'] == len(result) + 5 + 20
+        
+        # Size-based garbage collection removes entries of other versions
+        # first, however recent, then the least recently used; every hit
+        # refreshes the access time while TOUCH_INTERVAL is 0
+        store.TOUCH_INTERVAL = 0.0
+        store.max_bytes = 400
+        for i in range(20):
+            translate_html_to_typst(f"<p>Document {i} " + "x" * 40 + "</p>", cache=store)
+        translate_html_to_typst(html, cache=store)  # Keep this one fresh
+        assert store.gc() > 0
+        stats = store.stats()
+        assert stats['bytes'] <= stats['max_bytes']
+        assert store.get(cache_key(html)) == result
+        connection = sqlite3.connect(path)
+        assert connection.execute("SELECT COUNT(*) FROM translations WHERE version = 'old'"
+                                  ).fetchone()[0] == 0
+        connection.close()
+        store.clear()
+        store.close()
+        
+        # Several processes can write to the same store concurrently
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            assert all(executor.map(_fill_store, [path] * 3, [0, 10, 20]))
+        store = TranslationStore(path)
+        assert len(store) == 40
+        assert store.get(cache_key("<p>Shared 25</p>")) == "Shared 25\n\n"
+        store.close()
+    
+    print("✓ Translation store tests passed")
+
+
+def test_incremental_translation():
+    """Test that incremental re-translation matches full runs and reuses unchanged blocks."""
+    print("Testing incremental translation...")
+    
+    paragraphs = [f'<p>Paragraph <strong>{i}</strong></p>' for i in range(20)]
+    lists = '<ol><li>First</li><li class="ql-indent-1">Nested</li></ol><ul><li>Bullet</li></ul>'
+    code = '<pre>code_block</pre>'
+    html = ''.join(paragraphs[:10]) + lists + code + ''.join(paragraphs[10:])
+    
+    for debug in (False, True):
+        preview = IncrementalTranslator(debug=debug)
+        assert preview.update(html) == translate_html_to_typst(html, debug=debug)
+        
+        # Editing one paragraph re-translates only that block
+        edited = html.replace('Paragraph <strong>15</strong>', 'Paragraph <strong>15</strong> edited')
+        assert preview.update(edited) == translate_html_to_typst(edited, debug=debug)
+        assert preview.translated == 1
+        assert preview.reused == 22
+    
+    # State carried across blocks (ordered lists, markup delimiters) stays correct
+    preview = IncrementalTranslator()
+    steps = [
+        '<ol><li>One</li></ol><p><em>a</em></p>',
+        '<ol><li>One</li><li>Two</li></ol><p><em>a</em></p>',
+        '<p><strong>x</strong></p><p><em>a</em></p>',
+        '<p><strong>x</p><p><em>a</em></p><p>unclosed',  # Malformed input is re-parsed
+        '<p><strong>x</strong></p><p><br></p><p><br></p><p>b</p>',
+        '<img alt="z"/></p><b>a</b>',  # A stray end tag is no block boundary
+    ]
+    for html in steps:
+        assert preview.update(html) == translate_html_to_typst(html), html
+    
+    # Newline runs spanning reused blocks are collapsed like in a full run
+    preview = IncrementalTranslator()
+    html = '<p>x</p>' + '<p></p>' * 5 + '<pre>\n\n\n</pre><div><br><br></div><p>y</p>'
+    first = preview.update(html)
+    assert preview.update(html) == first == translate_html_to_typst(html)
+    assert preview.reused > 0 and '\n\n\n\n' not in first
+    
+    print("✓ Incremental translation tests passed")
+
+
+def _html_corpus():
+    """Collect every HTML string literal used by the tests and examples."""
+    root = os.path.join(os.path.dirname(__file__), '..')
+    paths = [os.path.join(root, 'examples', 'demo.py')]
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    paths += [os.path.join(tests_dir, name) for name in sorted(os.listdir(tests_dir))
+              if name.endswith('.py')]
+    corpus = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and '<' in node.value:
+                corpus.append(node.value)
+    return corpus
+
+
+def test_quill_tokenizer():
+    """Test that the Quill subset tokenizer matches HTMLParser on the whole corpus."""
+    print("Testing Quill subset tokenizer...")
+    
+    corpus = _html_corpus()
+    assert len(corpus) > 100
+    fast = 0
+    for html in corpus:
+        fast += feed_quill_subset(HTML2TypstParser(RenderContext()), html)
+        for debug in (False, True):
+            expected = translate_html_to_typst(html, debug=debug)
+            assert translate_html_to_typst(html, debug=debug, tokenizer='quill') == expected, html
+    # Most of the corpus is well-formed Quill output and takes the fast path
+    assert fast > len(corpus) // 2
+    
+    # Input outside the subset falls back to HTMLParser
+    for html in ['<p>1 < 2</p>', '<!-- note --><p>x</p>', "<p class='ql-align-center'>x</p>",
+                 '<p class=ql-indent-1>x</p>', '<script>a<b</script><p>c</p>', '<!DOCTYPE html><p>x</p>']:
+        assert not feed_quill_subset(HTML2TypstParser(RenderContext()), html), html
+        assert translate_html_to_typst(html, tokenizer='quill') == translate_html_to_typst(html), html
+    
+    # Case, entities and whitespace inside tags are normalised like HTMLParser does
+    html = '<P CLASS="ql-align-center">A &amp; B&nbsp;</P ><a href="x?a=1&amp;b=2">l</a><br />'
+    assert feed_quill_subset(HTML2TypstParser(RenderContext()), html)
+    assert translate_html_to_typst(html, tokenizer='quill') == translate_html_to_typst(html)
+    
+    try:
+        translate_html_to_typst('<p>x</p>', tokenizer='lxml')
+        assert False, "Unknown tokenizer accepted"
+    except ValueError:
+        pass
+    
+    print("✓ Quill subset tokenizer tests passed")
+
+
+def test_profiling():
+    """Test that profile=True returns the same output with a per-stage breakdown."""
+    print("Testing profiling...")
+    
+    html = ('<p class="ql-align-center">Intro <strong>bold <em>both</em></strong> '
+            '<span style="color: red; font-size: 31px;">styled</span></p>'
+            '<ul><li>One</li><li>Two<br/></li></ul>')
+    for tokenizer in ('html.parser', 'quill'):
+        style_plan_cache.clear()
+        result, stats = translate_html_to_typst(html, profile=True, tokenizer=tokenizer)
+        assert isinstance(stats, TranslationStats)
+        assert result == translate_html_to_typst(html)
+        
+        assert stats.calls['handle_starttag'] == 7
+        assert stats.calls['handle_endtag'] == 7
+        assert stats.calls['handle_startendtag'] == 1
+        assert stats.calls['handle_data'] == stats.text_nodes == 7
+        assert stats.calls['apply_span_styles'] == 1
+        assert stats.calls['parse_inline_styles'] == 2  # One compile per distinct attribute pair
+        assert stats.calls['tokenize'] == stats.calls['postprocess'] == 1
+        assert stats.max_depth == 3
+        assert stats.bytes_in == len(html) and stats.bytes_out == len(result)
+        assert all(seconds >= 0 for seconds in stats.seconds.values())
+        assert stats.total_seconds > 0
+        assert 'handle_data' in stats.report()
+    
+    # Cached style plans are not counted as parses
+    _, stats = translate_html_to_typst(html, profile=True)
+    assert 'parse_inline_styles' not in stats.calls
+    
+    # Nested spans combine their plans as usual
+    nested = '<span style="color: red;"><span style="font-size: 2em;">x</span></span>'
+    assert translate_html_to_typst(nested, profile=True)[0] == translate_html_to_typst(nested)
+    
+    # The profiling parser hands back the frame of each element it opens
+    from html2typst import _ProfilingParser
+    for parser_class in (HTML2TypstParser, _ProfilingParser):
+        parser = parser_class(RenderContext())
+        frame = parser.handle_starttag('strong', [])
+        assert frame is not None and frame is parser.open_tags['strong'][-1]
+        assert parser.handle_starttag('br', []) is None
+    
+    # Profiling leaves the regular parser untouched
+    assert translate_html_to_typst(html, debug=True) == translate_html_to_typst(html, debug=True, profile=True)[0]
+    
+    # Command line prints the breakdown to stderr
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'in.html')
+        target = os.path.join(tmp, 'out.typ')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write(html)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            assert main([source, '-o', target, '--profile']) == 0
+        assert 'handle_starttag' in stderr.getvalue() and 'max depth 3' in stderr.getvalue()
+        with open(target, encoding='utf-8') as f:
+            assert f.read() == translate_html_to_typst(html)
+    
+    print("✓ Profiling tests passed")
+
+
+def test_escaping():
+    """Test that Typst-significant characters are escaped for their context."""
+    print("Testing escaping...")
+    
+    # Plain text is returned as is, without copying
+    text = "Plain text, with punctuation: (a) 3.14 and e-mail!"
+    assert escape_markup(text) is text
+    
+    # Characters that are markup anywhere
+    result = translate_html_to_typst('<p>a*b_c\\d `e` #f $g @h 1 &lt; 2 [i] ~j</p>')
+    assert result == 'a\\*b\\_c\\\\d \\`e\\` \\#f \\$g \\@h 1 \\< 2 \\[i\\] \\~j\n\n', result
+    
+    # Markers only count at the start of a line
+    assert escape_markup('- item') == '\\- item'
+    assert escape_markup('+ item') == '\\+ item'
+    assert escape_markup('== Heading') == '\\== Heading'
+    assert escape_markup('12. item') == '\\12. item'
+    assert escape_markup('/ Term: x') == '\\/ Term: x'
+    assert escape_markup('one\n  - two') == 'one\n  \\- two'
+    assert escape_markup('a - b + c = d') == 'a - b + c = d'
+    assert escape_markup('-5 and 3.14') == '-5 and 3.14'
+    
+    # Comment delimiters, including those formed with neighbouring fragments
+    assert escape_markup('a//b') == 'a\\//b'
+    assert escape_markup('http://x.y/z') == 'http:\\//x.y/z'
+    assert escape_markup('/* c */') == '\\/\\* c \\*\\/'
+    assert escape_markup('and/or') == 'and/or'
+    result = translate_html_to_typst('<p><strong>/x/</strong></p>')
+    assert result == '*\\/x\\/*\n\n', result
+    
+    # Headings keep their escapes
+    result = translate_html_to_typst('<h2>Price: $5 #1</h2>')
+    assert result == '== Price: \\$5 \\#1\n\n', result
+    
+    # String literals: link URLs, image paths and alt text, font names
+    assert escape_string('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+    result = translate_html_to_typst('<a href="https://x.y/?q=&quot;a&quot;">q</a>')
+    assert result == '#link("https://x.y/?q=\\"a\\"")[q]', result
+    result = translate_html_to_typst('<img src="C:\\img\\a.png" alt="say &quot;hi&quot;"/>')
+    assert result == '#image("C:\\\\img\\\\a.png", alt: "say \\"hi\\"")\n\n', result
+    result = translate_html_to_typst('<span style="font-family: &quot;Fira \\ Sans&quot;">f</span>')
+    assert result == '#text(font: "Fira \\\\ Sans")[f]', result
+    result = translate_html_to_typst('<img alt="#1 pick"/>')
+    assert result == '\\#1 pick', result
+    
+    # Inline code is raw; a backtick switches to a raw() call
+    result = translate_html_to_typst('<p><code>a*b_c</code> and <code>x`y</code></p>')
+    assert result == '`a*b_c` and #raw("x`y")\n\n', result
+    result = translate_html_to_typst('<p><strong><code>x</code></strong></p>')
+    assert result == '*`x`*\n\n', result
+    
+    # Code blocks are raw: verbatim, whitespace kept, fences outgrow backtick runs
+    result = translate_html_to_typst('<pre class="ql-syntax">a*b // c\n  _d_\n</pre>')
+    assert result == '```\na*b // c\n  _d_\n```\n\n', result
+    result = translate_html_to_typst('<pre><span>def</span> <span>f</span><br>x</pre>')
+    assert result == '```\ndef f\nx```\n\n', result
+    result = translate_html_to_typst('<pre>a ``` b\n</pre>')
+    assert result == '````\na ``` b\n````\n\n', result
+    result = translate_html_to_typst('<pre>tick`</pre>')
+    assert result == '```\ntick`\n```\n\n', result
+    
+    print("✓ Escaping tests passed")
+
+
+def test_output_sink():
+    """Test that out= receives the same output, written as blocks close."""
+    print("Testing output sink...")
+    
+    for html in _html_corpus()[:200]:
+        expected = translate_html_to_typst(html)
+        for tokenizer in ('html.parser', 'quill'):
+            pieces = []
+            assert translate_html_to_typst(html, out=pieces, tokenizer=tokenizer) is None
+            assert ''.join(pieces) == expected, html
+        buffer = io.StringIO()
+        translate_html_to_typst(html, out=buffer)
+        assert buffer.getvalue() == expected, html
+    
+    # Each closed block is written as soon as it closes
+    written = []
+    html = '<p>One</p><ul><li>Two</li></ul><pre>a ``` b</pre><p>Three'
+    translate_html_to_typst(html, out=lambda piece: written.append(piece))
+    assert written == ['One\n\n', '- Two\n', '````\na ``` b````\n\n', 'Three'], written
+    
+    # Newline runs are collapsed across pieces
+    pieces = []
+    html = '<p>a</p><p><br></p><p></p><p></p><p>b</p><pre></pre><pre></pre>'
+    translate_html_to_typst(html, out=pieces)
+    assert ''.join(pieces) == translate_html_to_typst(html)
+    assert '\n\n\n\n' not in ''.join(pieces)
+    
+    # Unclosed code blocks are still written out
+    buffer = io.StringIO()
+    translate_html_to_typst('<p>x</p><pre>code', out=buffer)
+    assert buffer.getvalue() == 'x\n\n```\ncode', buffer.getvalue()
+    
+    # Cached and profiled translations write to out as well
+    cache = ResultCache()
+    for _ in range(2):
+        buffer = io.StringIO()
+        assert translate_html_to_typst('<p>cached</p>', cache=cache, out=buffer) is None
+        assert buffer.getvalue() == 'cached\n\n'
+    assert cache.stats()['hits'] == 1
+    buffer = io.StringIO()
+    result, stats = translate_html_to_typst('<p>é</p>', profile=True, out=buffer)
+    assert result is None and buffer.getvalue() == 'é\n\n'
+    assert stats.bytes_out == 4
+    
+    # Files on disk
+    with tempfile.TemporaryDirectory() as tmp:
+        target = os.path.join(tmp, 'out.typ')
+        with open(target, 'w', encoding='utf-8') as f:
+            translate_html_to_typst('<h1>Title</h1><p>Body</p>', out=f)
+        with open(target, encoding='utf-8') as f:
+            assert f.read() == '= Title\n\nBody\n\n'
+    
+    try:
+        translate_html_to_typst('<p>x</p>', out=42)
+        assert False, "Invalid out accepted"
+    except TypeError:
+        pass
+    
+    print("✓ Output sink tests passed")
+
+
+def test_malformed_end_tags():
+    """Test recovery from misnested, unclosed and stray end tags."""
+    print("Testing malformed end tags...")
+    
+    # An end tag closes the innermost element of its name and nothing else
+    result = translate_html_to_typst('<p><b><i>x</b>y</i>z</p>')
+    assert result == '#emph[#strong[x]] #emph[y] z\n\n', result
+    result = translate_html_to_typst('<p><b>a</p>b</b>c')
+    assert result == '*a*\n\n*b*#[]c', result
+    
+    # End tags that match no open element are ignored
+    result = translate_html_to_typst('<p><span style="color: red;">a</em>b</p>')
+    assert result == '#text(fill: red)[ab]\n\n', result
+    result = translate_html_to_typst('<ul><li><span>one</li></span></li><li>two</li></ul>')
+    assert result == '- one\n- two\n', result
+    
+    # Closing an element buried under unclosed ones leaves them open
+    result = translate_html_to_typst('<div><strong><font>a</div>b</font>c</strong>')
+    assert result == '*a*\n\n*bc*', result
+    parser = HTML2TypstParser(RenderContext())
+    parser.feed('<div><strong><font>a</div>')
+    assert parser.depth == 2 and not parser.open_tags['div']
+    assert [frame.tag for frame in parser.open_roles['strong']] == ['strong']
+    
+    # Thousands of unclosed elements and stray end tags stay cheap
+    html = '<p>' + '<span>w </em>' * 20000 + '</p>' + '<div>' * 2000 + '<font>x' * 2000 + '</div>' * 2000
+    start = time.perf_counter()
+    result = translate_html_to_typst(html)
+    assert time.perf_counter() - start < 5.0
+    assert result.count('w') == 20000 and result.count('x') == 2000
+    
+    print("✓ Malformed end tag tests passed")
+
+
+def test_limits():
+    """Test resource budgets with both exceed policies."""
+    print("Testing limits...")
+    
+    html = '<h1>Title</h1><p>One <strong>two</strong> <em>three</em><br>four</p><ul><li>- five</li></ul>'
+    expected = translate_html_to_typst(html)
+    plain = 'Title\n\nOne two three\\\nfour\n\n\\- five\n\n'
+    
+    # Budgets that hold leave the output unchanged
+    roomy = Limits(max_input_bytes=len(html), max_depth=2, max_output_bytes=len(expected),
+                   max_seconds=60.0)
+    assert translate_html_to_typst(html, limits=roomy) == expected
+    for tokenizer in ('html.parser', 'quill'):
+        assert translate_html_to_typst(html, limits=roomy, tokenizer=tokenizer) == expected
+    
+    budgets = [
+        ('max_input_bytes', Limits(max_input_bytes=len(html) - 1)),
+        ('max_depth', Limits(max_depth=1)),
+        ('max_output_bytes', Limits(max_output_bytes=len(expected) - 1)),
+        ('max_seconds', Limits(max_seconds=0.0)),
+    ]
+    for name, limits in budgets:
+        try:
+            translate_html_to_typst(html, limits=limits)
+            assert False, f"{name} not enforced"
+        except LimitExceeded as exc:
+            assert exc.limit == name, exc
+        
+        # Degrading keeps every text node, escaped, as plain paragraphs
+        degrade = dataclasses.replace(limits, on_exceed='plain_text')
+        result = translate_html_to_typst(html, limits=degrade)
+        assert result == plain, result
+        buffer = io.StringIO()
+        assert translate_html_to_typst(html, limits=degrade, out=buffer) is None
+        assert buffer.getvalue() == plain
+    
+    # Input size counts UTF-8 bytes, not characters
+    assert translate_html_to_typst('<p>é</p>', limits=Limits(max_input_bytes=9)) == 'é\n\n'
+    try:
+        translate_html_to_typst('<p>é</p>', limits=Limits(max_input_bytes=8))
+        assert False, "Multi-byte input not counted in bytes"
+    except LimitExceeded:
+        pass
+    
+    # Void elements do not count towards the depth
+    assert translate_html_to_typst('<p>a<br>b<br>c</p>', limits=Limits(max_depth=1)) == 'a\\\nb\\\nc\n\n'
+    
+    # A deeply nested document is stopped early
+    deep = '<span>' * 100000 + 'x'
+    try:
+        translate_html_to_typst(deep, limits=Limits(max_depth=64))
+        assert False, "Deep nesting not stopped"
+    except LimitExceeded as exc:
+        assert exc.maximum == 64
+    assert translate_html_to_typst(deep, limits=Limits(max_depth=64, on_exceed='plain_text')) == 'x'
+    
+    # Fallbacks are not cached; complete translations are
+    cache = ResultCache()
+    degrade = Limits(max_depth=1, on_exceed='plain_text')
+    assert translate_html_to_typst(html, cache=cache, limits=degrade) == plain
+    assert len(cache) == 0
+    assert translate_html_to_typst(html, cache=cache, limits=roomy) == expected
+    assert translate_html_to_typst(html, cache=cache) == expected
+    assert cache.stats()['hits'] == 1
+    
+    for bad in ({'on_exceed': 'ignore'}, {'max_depth': -1}):
+        try:
+            Limits(**bad)
+            assert False, f"Invalid limits accepted: {bad}"
+        except ValueError:
+            pass
+    
+    print("✓ Limits tests passed")
+
+
+def test_tag_registry():
+    """Test custom tags registered on the tag registry."""
+    print("Testing tag registry...")
+    
+    class Formula(TagHandler):
+        roles = ('formula',)
+        
+        def data(self, parser, frame, role, text, source):
+            return f'${source}$'
+        
+        def self_closing(self, parser, attrs):
+            parser.emit(f"${dict(attrs)['data-value']}$")
+    
+    class Mention(TagHandler):
+        roles = ('mention',)
+        
+        def start(self, parser, frame, attrs):
+            frame.extra = dict(attrs).get('data-id', '')
+        
+        def data(self, parser, frame, role, text, source):
+            return f'#link(<{frame.extra}>)[{text}]'
+    
+    class Callout(TagHandler):
+        block = True
+        
+        def start(self, parser, frame, attrs):
+            parser.emit('#block[')
+        
+        def end(self, parser, frame):
+            parser.emit(']\n\n')
+    
+    html = ('<p>Hi <mention data-id="bob">@Bob</mention>, see <strong><formula>a_1^2</formula></strong> '
+            'and <formula data-value="x_2"/>.</p><callout>Note</callout>')
+    before = translate_html_to_typst(html)
+    tag_registry.register(['formula', 'math'], Formula())
+    tag_registry.register('mention', Mention())
+    tag_registry.register('callout', Callout())
+    try:
+        expected = ('Hi #link(<bob>)[\\@Bob], see *$a_1^2$* and $x_2$.\n\n'
+                    '#block[Note]\n\n')
+        assert translate_html_to_typst(html) == expected, translate_html_to_typst(html)
+        assert translate_html_to_typst(html, tokenizer='quill') == expected
+        assert ''.join(translate_stream([html[:40], html[40:]])) == expected
+        assert translate_html_to_typst('<p><math>x_1</math></p>') == '$x_1$\n\n'
+        
+        # Custom blocks are written out as they close
+        pieces = []
+        translate_html_to_typst('<callout>a</callout><p>b', out=pieces)
+        assert pieces == ['#block[a]\n\n', ' b'], pieces
+    finally:
+        for tag in ('formula', 'math', 'mention', 'callout'):
+            tag_registry.unregister(tag)
+    assert translate_html_to_typst(html) == before
+    
+    # Built-in tags can be replaced too, and restored afterwards
+    html = '<p><em><strong>x</strong></em> y</p>'
+    default = translate_html_to_typst(html)
+    assert default == '#emph[#strong[x]]  y\n\n', default
+    original = tag_registry.get('strong')
+    assert original is not None
+    
+    class Bold(TagHandler):
+        roles = ('bold',)
+        
+        def data(self, parser, frame, role, text, source):
+            return f'#strong[{text}]'
+    
+    tag_registry.register('strong', Bold())
+    try:
+        for tokenizer in ('html.parser', 'quill'):
+            result = translate_html_to_typst(html, tokenizer=tokenizer)
+            assert result == '_#strong[x]_ y\n\n', result
+        # Only the replaced tag changes
+        assert translate_html_to_typst('<b>x</b>') == '*x*'
+    finally:
+        tag_registry.register('strong', original)
+    assert tag_registry.get('strong') is original
+    assert translate_html_to_typst(html) == default
+    
+    # Only h1-h6 are headings now, so results stored by 0.3.0 are not served
+    html = '<h7>Deep</h7><p>x</p>'
+    stale_key = '0.3.0:' + cache_key(html).split(':', 1)[1]
+    assert stale_key != cache_key(html)
+    cache = ResultCache()
+    cache.put(stale_key, '======= Deepx\n\n')
+    assert translate_html_to_typst(html, cache=cache) == 'Deepx\n\n'
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TranslationStore(os.path.join(tmp, 'store.db'))
+        store.put(stale_key, '======= Deepx\n\n')
+        assert translate_html_to_typst(html, cache=store) == 'Deepx\n\n'
+        store.close()
+    
+    print("✓ Tag registry tests passed")
+
+
+def test_image_assets():
+    """Test extracting data: URI images into content-hashed asset files."""
+    print("Testing image assets...")
+    
+    png = 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAADElEQVR4nGP4z8AAAAMBAQDJ/pLvAAAAAElFTkSuQmCC'
+    html = f'<p><img src="{png}" alt="Dot"></p><p>Text<img src="{png}"></p>'
+    
+    # Images written the way Quill writes them, without a slash, are kept
+    result = translate_html_to_typst('<p><img src="a.png" alt="A"></p>')
+    assert result.startswith('#image("a.png", alt: "A")'), result
+    assert translate_html_to_typst('<p>x<img alt="A">y</p>') == 'xAy\n\n'
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, 'assets')
+        store = AssetStore(directory)
+        for tokenizer in ('html.parser', 'quill'):
+            result = translate_html_to_typst(html, tokenizer=tokenizer, assets=store)
+            names = os.listdir(directory)
+            assert len(names) == 1 and names[0].endswith('.png'), names
+            reference = directory.replace(os.sep, '/') + '/' + names[0]
+            assert result.count(f'#image("{reference}"') == 2, result
+            assert 'alt: "Dot"' in result and 'base64' not in result
+        assert (store.stored, store.reused) == (1, 3)
+        with open(os.path.join(directory, names[0]), 'rb') as f:
+            assert f.read().startswith(b'\x89PNG')
+        
+        # Images met before the quill tokenizer falls back are only counted once
+        store = AssetStore(directory)
+        fallback = html + '<!-- leaves the Quill subset -->'
+        result = translate_html_to_typst(fallback, tokenizer='quill', assets=store)
+        assert (store.stored, store.reused) == (1, 1)
+        assert result == translate_html_to_typst(fallback, assets=AssetStore(directory))
+        
+        # A later store finds the file already there and leaves it alone
+        path = os.path.join(directory, names[0])
+        mtime = os.stat(path).st_mtime_ns
+        streamed = ''.join(translate_stream([html[:40], html[40:]], assets=AssetStore(directory)))
+        assert streamed == result
+        assert os.stat(path).st_mtime_ns == mtime
+        
+        # Directory mode references the shared directory from each file
+        source = os.path.join(tmp, 'html')
+        os.makedirs(os.path.join(source, 'sub'))
+        for name in ('a.html', os.path.join('sub', 'b.html')):
+            with open(os.path.join(source, name), 'w', encoding='utf-8') as f:
+                f.write(html)
+        shared = os.path.join(tmp, 'shared')
+        summary = convert_directory(source, os.path.join(tmp, 'typst'), workers=1, assets_dir=shared)
+        assert summary['files'] == 2 and len(os.listdir(shared)) == 1
+        with open(os.path.join(tmp, 'typst', 'sub', 'b.typ'), encoding='utf-8') as f:
+            assert f'#image("../../shared/{names[0]}"' in f.read()
+    
+    # A callback receives each distinct image once
+    saved = []
+    store = AssetStore(prefix='img/', save=lambda name, data: saved.append((name, data)))
+    svg = 'data:image/svg+xml,%3Csvg%20xmlns%3D%22http%3A%2F%2Fwww.w3.org%2F2000%2Fsvg%22%2F%3E'
+    result = translate_html_to_typst(html + f'<p><img src="{svg}"></p>', assets=store)
+    assert [name[-4:] for name, _ in saved] == ['.png', '.svg'], saved
+    assert saved[1][1] == b'<svg xmlns="http://www.w3.org/2000/svg"/>'
+    assert result.count('#image("img/') == 3, result
+    
+    # Other media types and undecodable payloads are left in place
+    for src in ('data:text/plain;base64,QQ==', 'data:image/png;base64,A', 'image.png'):
+        result = translate_html_to_typst(f'<p><img src="{src}"></p>', assets=store)
+        assert f'#image("{src}")' in result, result
+    assert len(saved) == 2
+    
+    for bad in ({}, {'directory': 'x', 'save': print}):
+        try:
+            AssetStore(**bad)
+            assert False, f"Invalid store accepted: {bad}"
+        except ValueError:
+            pass
+    try:
+        translate_html_to_typst(html, assets=store, cache=ResultCache())
+        assert False, "assets combined with cache"
+    except ValueError:
+        pass
+    
+    print("✓ Image asset tests passed")
+
+
+def test_run_coalescing():
+    """Test that adjacent text formatted alike is rendered as one run."""
+    print("Testing run coalescing...")
+    
+    red = '<span style="color: red;">'
+    cases = [
+        ('<p><strong>Hel</strong><strong>lo</strong></p>', '*Hello*\n\n'),
+        ('<p><em>a</em> <em>b</em></p>', '_a b_\n\n'),
+        ('<p><strong>a</strong>   <strong>b</strong> c</p>', '*a b* c\n\n'),
+        (f'<p>{red}a</span>{red}b</span></p>', '#text(fill: red)[ab]\n\n'),
+        ('<p><a href="x">a</a><a href="x">b</a><a href="y">c</a></p>',
+         '#link("x")[ab] #link("y")[c]\n\n'),
+        ('<p><strong><em>a</em></strong><strong><em>b</em></strong></p>',
+         '#emph[#strong[ab]]\n\n'),
+        # Different formatting, block boundaries and line breaks end a run
+        (f'<p>{red}a</span><span style="color: blue;">b</span></p>',
+         '#text(fill: red)[a] #text(fill: blue)[b]\n\n'),
+        ('<p><strong>a</strong></p><p><strong>b</strong></p>', '*a*\n\n*b*\n\n'),
+        ('<p><strong>a</strong><br><strong>b</strong></p>', '*a*\\\n*b*\n\n'),
+        ('<p><strong>a</strong>x<strong>b</strong></p>', '*a*#[]x#[]*b*\n\n'),
+    ]
+    for html, expected in cases:
+        for tokenizer in ('html.parser', 'quill'):
+            result = translate_html_to_typst(html, tokenizer=tokenizer)
+            assert result == expected, f"{html}: {result!r}"
+        assert ''.join(translate_stream([html[:9], html[9:]])) == expected, html
+        assert IncrementalTranslator().update(html + html) == expected * 2, html
+    
+    # Split runs shrink the output, and streaming keeps them whole
+    html = '<p>' + '<strong>w</strong>' * 200 + '</p>' + f'<p>{red}x </span>' * 50 + '</p>'
+    result = translate_html_to_typst(html)
+    assert result == '*' + 'w' * 200 + '*\n\n#text(fill: red)[' + 'x ' * 50 + ']\n\n', result
+    assert ''.join(translate_stream(html[i:i + 7] for i in range(0, len(html), 7))) == result
+    
+    # Handlers that do not declare wraps render each node on its own
+    class Tag(TagHandler):
+        roles = ('tag',)
+        
+        def data(self, parser, frame, role, text, source):
+            return f'#tag("{source}")'
+    
+    tag_registry.register('tag', Tag())
+    try:
+        result = translate_html_to_typst('<p><tag>a</tag><tag>b</tag></p>')
+        assert result == '#tag("a") #tag("b")\n\n', result
+    finally:
+        tag_registry.unregister('tag')
+    
+    print("✓ Run coalescing tests passed")
+
+
+def test_span_wrappers():
+    """Test that span styles share one #text() call, and nested spans merge them."""
+    print("Testing span wrappers...")
+    
+    cases = [
+        ('color: red; font-size: 14pt; font-family: Arial',
+         '#text(fill: red, size: 14pt, font: "Arial")[x]'),
+        ('background-color: yellow; color: red',
+         '#highlight(fill: yellow)[#text(fill: red)[x]]'),
+        ('background-color: yellow', '#highlight(fill: yellow)[x]'),
+        ("font-family: 'Fira Sans'; font-weight: bold", '#text(font: "Fira Sans")[*x*]'),
+    ]
+    for style, expected in cases:
+        result = translate_html_to_typst(f'<span style="{style}">x</span>')
+        assert result == expected, result
+    
+    # A span nested in others renders as one span with their combined styles
+    equivalents = [
+        ('<span style="color: red;"><span style="font-size: 14pt;">x</span></span>',
+         '<span style="color: red; font-size: 14pt;">x</span>'),
+        ('<span style="color: red; background-color: yellow;"><span style="color: blue;">x</span></span>',
+         '<span style="color: blue; background-color: yellow;">x</span>'),
+        ('<span style="font-weight: bold;"><span><span style="font-family: serif;">x</span></span></span>',
+         '<span style="font-family: serif; font-weight: bold;">x</span>'),
+        ('<span class="ql-size-huge"><span class="ql-size-large">x</span></span>',
+         '<span style="font-size: 3.75em;">x</span>'),
+        ('<span style="font-size: 10pt;"><span class="ql-size-small">x</span></span>',
+         '<span style="font-size: 10pt * 0.75;">x</span>'),
+    ]
+    for nested, flat in equivalents:
+        expected = translate_html_to_typst(flat)
+        for tokenizer in ('html.parser', 'quill'):
+            assert translate_html_to_typst(nested, tokenizer=tokenizer) == expected, nested
+    
+    # The outer span keeps its own styles for its own text
+    html = '<p><span style="color: red;">a <span style="font-size: 14pt;">b</span> c</span></p>'
+    result = translate_html_to_typst(html)
+    assert result == '#text(fill: red)[a ] #text(fill: red, size: 14pt)[b] #text(fill: red)[ c]\n\n', result
+    
+    # Only the inner span's unsupported styles are reported with its text
+    html = '<span style="font-weight: 400;">a<span style="font-style: oblique;">b</span></span>'
+    result = translate_html_to_typst(html, debug=True)
+    assert result == ('/* unsupported styles: font-weight: 400 */ a'
+                      '/* unsupported styles: font-style: oblique */ b'), result
+    
+    # Formatting elements carrying a span's styles are wrapped like a span
+    styled = [
+        ('<strong style="color: red;">x</strong>', '#text(fill: red)[*x*]'),
+        ('<em class="ql-size-large">x</em>', '#text(size: 1.5em)[_x_]'),
+        ('<a href="u" style="color: red;">x</a>', '#text(fill: red)[#link("u")[x]]'),
+        ('<span style="color: red;"><strong style="font-size: 14pt;">x</strong></span>',
+         '#text(fill: red, size: 14pt)[*x*]'),
+        ('<strong style="font-weight: bold;">x</strong>', '*x*'),
+    ]
+    for html, expected in styled:
+        for tokenizer in ('html.parser', 'quill'):
+            result = translate_html_to_typst(html, tokenizer=tokenizer)
+            assert result == expected, result
+    
+    print("✓ Span wrapper tests passed")
+
+
+def test_inline_spacing():
+    """Test the space between inline elements and the separation of delimiters from words."""
+    print("Testing inline spacing...")
+    
+    cases = [
+        # Whitespace between two inline elements is kept as one space
+        ('<p><strong>a</strong> <em>b</em></p>', '*a* _b_\n\n'),
+        ('<p><strong>a</strong>\n<em>b</em></p>', '*a* _b_\n\n'),
+        ('<p><b>a</b> </p>', '*a*\n\n'),
+        # A delimiter touching a letter or digit is closed off with #[]
+        ('<p><strong>alpha</strong>beta</p>', '*alpha*#[]beta\n\n'),
+        ('<p>x<strong>b</strong></p>', 'x#[]*b*\n\n'),
+        ('<p><em>a</em>2</p>', '_a_#[]2\n\n'),
+        ('<p><strong>a</strong>, b</p>', '*a*, b\n\n'),
+        # An escaped delimiter is text and needs no separator
+        ('<p>a_<em>b</em></p>', 'a\\_#emph[b]\n\n'),
+    ]
+    for html, expected in cases:
+        result = translate_html_to_typst(html)
+        assert result == expected, (html, result)
+        assert ''.join(translate_stream([html[:9], html[9:]])) == expected, html
+        assert IncrementalTranslator().update(html) == expected, html
+    
+    print("✓ Inline spacing tests passed")
+
+
+def test_style_hoisting():
+    """Test hoisting shared fonts and sizes and repeated wrappers into a preamble."""
+    print("Testing style hoisting...")
+    
+    base = 'font-family: Calibri; font-size: 11pt;'
+    html = ''.join(f'<p><span style="{base} color: red;">Note {i}:</span> '
+                   f'<span style="{base}">text {i}</span></p>' for i in range(5))
+    result = translate_html_to_typst(html, hoist_styles=True)
+    assert result == ('#set text(font: "Calibri", size: 11pt)\n'
+                      '#let s1(body) = text(fill: red, body)\n\n'
+                      + ''.join(f'#s1[Note {i}:] text {i}\n\n' for i in range(5))), result
+    assert len(result) < len(translate_html_to_typst(html)) / 2
+    assert translate_html_to_typst(html, hoist_styles=True, tokenizer='quill') == result
+    pieces = []
+    translate_html_to_typst(html, hoist_styles=True, out=pieces)
+    assert ''.join(pieces) == result
+    
+    # Nested spans combine the original plans before hoisting
+    nested = f'<p><span style="{base}"><span style="color: blue;">a</span> b</span></p>'
+    result = translate_html_to_typst(nested, hoist_styles=True)
+    assert result == '#set text(font: "Calibri", size: 11pt)\n\n#text(fill: blue)[a]  b\n\n', result
+    
+    # Text without the font keeps the default one, so nothing is set
+    mixed = html + '<p>plain</p>'
+    result = translate_html_to_typst(mixed, hoist_styles=True)
+    assert '#set' not in result and '#let s1(body) = text(fill: red, size: 11pt, font: "Calibri", body)' in result
+    
+    # Headings scale the text size, so sizes stay on the runs
+    heading = f'<h1><span style="{base}">Title</span></h1>' + html
+    result = translate_html_to_typst(heading, hoist_styles=True)
+    assert result.startswith('#set text(font: "Calibri")\n'), result
+    assert '#s2[Note 0:] #s1[text 0]' in result, result
+    
+    # With nothing worth hoisting the output is unchanged
+    for plain in ('<p>Hello <strong>world</strong></p>', '<p><span style="color: red;">once</span></p>'):
+        assert translate_html_to_typst(plain, hoist_styles=True) == translate_html_to_typst(plain)
+    
+    # Hoisted results are cached apart from regular ones
+    cache = ResultCache()
+    assert translate_html_to_typst(html, cache=cache) != translate_html_to_typst(html, cache=cache, hoist_styles=True)
+    assert len(cache) == 2
+    
+    for options in ({'profile': True}, {'limits': Limits()}):
+        try:
+            translate_html_to_typst(html, hoist_styles=True, **options)
+            assert False, f"hoist_styles combined with {options}"
+        except ValueError:
+            pass
+    
+    print("✓ Style hoisting tests passed")
+
+
+def test_parsed_documents():
+    """Test that one parse renders like a full translation, as often as needed."""
+    print("Testing parsed documents...")
+    
+    plain_text = Limits(max_input_bytes=0, on_exceed='plain_text')
+    for html in _html_corpus()[:200]:
+        document = parse_document(html)
+        assert render_plain_text(document) == translate_html_to_typst(html, limits=plain_text), html
+        for debug in (False, True):
+            expected = translate_html_to_typst(html, debug=debug)
+            assert render_typst(document, debug=debug) == expected, html
+            assert render_typst(parse_document(html, 'quill'), debug=debug) == expected, html
+            assert (render_typst(document, debug=debug, hoist_styles=True)
+                    == translate_html_to_typst(html, debug=debug, hoist_styles=True)), html
+    
+    # Tag names, attribute lists and text are interned
+    html = ''.join(f'<p><span style="color: red;">word</span> {i % 3}</p>' for i in range(50))
+    document = parse_document(html)
+    assert isinstance(document, ParsedDocument)
+    assert len(document) == 50 * 6
+    assert document.tags == ['p', 'span']
+    assert document.attr_lists == [[], [('style', 'color: red;')]]
+    assert document.texts == ['word', ' 0', ' 1', ' 2']
+    
+    # Production and debug output from the same parse
+    document = parse_document('<p><span style="font-weight: 300;">Hi</span></p>')
+    assert render_typst(document) == 'Hi\n\n'
+    assert render_typst(document, debug=True) == '/* unsupported styles: font-weight: 300 */ Hi\n\n'
+    assert render_plain_text(document) == 'Hi\n\n'
+    out = []
+    assert render_typst(document, out=out) is None
+    assert ''.join(out) == 'Hi\n\n'
+    
+    try:
+        parse_document('<p>x</p>', tokenizer='lxml')
+        assert False, "Unknown tokenizer accepted"
+    except ValueError:
+        pass
+    
+    print("✓ Parsed document tests passed")
+
+
+def test_serialized_documents():
+    """Test that parsed documents round-trip through bytes and files."""
+    print("Testing serialized documents...")
+    
+    def fields(document):
+        return (document.kinds, document.args, document.tags, document.attr_lists, document.texts)
+    
+    corpus = _html_corpus()[:200] + [
+        '',
+        '<p a b="" c="&lt;é&gt;">\u00e9\U0001f600 \ud800<br/>x</p><img src="data:,">',
+    ]
+    for html in corpus:
+        document = parse_document(html)
+        loaded = ParsedDocument.from_bytes(document.to_bytes())
+        assert fields(loaded) == fields(document), html
+        for debug in (False, True):
+            assert render_typst(loaded, debug=debug) == translate_html_to_typst(html, debug=debug), html
+    
+    # Files are memory-mapped back in
+    html = ''.join(f'<p><span style="color: red;">Run {i}</span> text</p>' for i in range(100))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'document.h2td')
+        save_document(parse_document(html), path)
+        assert os.listdir(tmp) == ['document.h2td']
+        assert render_typst(load_document(path)) == translate_html_to_typst(html)
+        
+        empty = os.path.join(tmp, 'empty')
+        open(empty, 'wb').close()
+        try:
+            load_document(empty)
+            assert False, "Empty file loaded"
+        except ValueError:
+            pass
+    
+    # Other data, other format versions and damaged data are rejected
+    data = parse_document(html).to_bytes()
+    other_version = data[:4] + (DOCUMENT_FORMAT_VERSION + 1).to_bytes(2, 'little') + data[6:]
+    for bad in (b'', b'<p>x</p>', other_version, data[:-8], data[:len(data) // 2], data + b'\0' * 8):
+        try:
+            ParsedDocument.from_bytes(bad)
+            assert False, f"Loaded {bad[:16]!r}"
+        except ValueError:
+            pass
+    
+    # Each argument is checked against its own table, not just the longest one
+    document = parse_document('<p>a</p>b<i>c</i>d e f')
+    assert len(document.texts) > 3 > len(document.tags)
+    for position, value in ((0, 3), (1, len(document.attr_lists)), (2, len(document.texts))):
+        tampered = parse_document('<p>a</p>b<i>c</i>d e f')
+        tampered.args[position] = value
+        try:
+            ParsedDocument.from_bytes(tampered.to_bytes())
+            assert False, f"Loaded args[{position}] = {value}"
+        except ValueError:
+            pass
+    tampered = parse_document('<p>a</p>')
+    tampered.kinds[0] = 9
+    try:
+        ParsedDocument.from_bytes(tampered.to_bytes())
+        assert False, "Loaded an unknown event kind"
+    except ValueError:
+        pass
+    
+    print("✓ Serialized document tests passed")
+
+
 def run_all_tests():
     """Run all tests."""
     print("\n" + "="*60)
@@ -820,6 +2108,29 @@ def run_all_tests():
         test_nested_formatting,
         test_literal_delimiters_in_plain_text,
         test_issue_html_unclosed_delimiter,
+        test_styles_decoded_once_per_element,
+        test_style_plan_cache,
+        test_translate_many,
+        test_async_translation,
+        test_streaming_translation,
+        test_command_line,
+        test_result_cache,
+        test_translation_store,
+        test_incremental_translation,
+        test_quill_tokenizer,
+        test_profiling,
+        test_escaping,
+        test_output_sink,
+        test_malformed_end_tags,
+        test_limits,
+        test_tag_registry,
+        test_image_assets,
+        test_run_coalescing,
+        test_span_wrappers,
+        test_inline_spacing,
+        test_style_hoisting,
+        test_parsed_documents,
+        test_serialized_documents,
     ]
     
     passed = 0